@@ -0,0 +1,462 @@
+'''
+Module to hold the raw files downloaded from the file endpoints of an analysis.
+'''
+from collections.abc import Mapping
+from pathlib import Path
+import functools
+import inspect
+import io
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import pandas as pd
+import streamlit as st
+import logging
+from requests import HTTPError
+
+from modules.memory import deep_size, get_memory_governor
+
+logger = logging.getLogger(__name__)
+
+DATAFRAME_EXTENSIONS = ('.csv', '.parquet')
+ARTIFACT_CACHE_ENTRIES = 32
+# Directory to persist downloaded artifacts between restarts, disabled if unset
+ARTIFACT_CACHE_DIR_ENV = 'OASIS_UI_CACHE_DIR'
+# Size in MB the persisted artifacts are pruned to, least recently used first
+ARTIFACT_CACHE_MAX_MB_ENV = 'OASIS_UI_CACHE_MAX_MB'
+ARTIFACT_CACHE_MAX_MB = 10 * 1024
+# Seconds after which temporary files left in the cache by failed writes are removed
+TEMP_FILE_MAX_AGE = 3600
+# Seconds the check that a user can get an analysis is reused for
+ANALYSIS_ACCESS_TTL = 60
+# Memory governor key of the raw contents, alongside the dataframe names
+CONTENT_KEY = '<content>'
+
+
+class AnalysisArtifact:
+    '''
+    Raw `tar.gz` contents of a file endpoint, e.g. the `input_file` or
+    `output_file` of an analysis.
+
+    Members are only listed, extracted or parsed when requested, so a single
+    download backs the raw file, individual member downloads and the parsed
+    dataframes.
+
+    Parsed dataframes are tracked by the `MemoryGovernor` and parsed again if
+    released to stay within the memory budget. The contents are released too
+    if the artifact was persisted to `path`, and read again from it on access.
+    Contents only held in memory are kept, as downloading them again mid
+    render would thrash when the budget is smaller than the working set.
+
+    Artifacts are shared between sessions and the cache warmer, so members
+    are listed and parsed under a lock.
+
+    Parameters
+    ----------
+    content : bytes
+              Contents of the `tar.gz` file.
+    path : Path
+           Path the contents are persisted to, if any.
+    label : str
+            Description of the artifact in the memory usage report.
+    '''
+    def __init__(self, content, path=None, label='artifact'):
+        self._content = content
+        self._size = len(content)
+        self.path = path
+        self.label = label
+        self._members = None
+        self._dataframes = {}
+        self._lock = threading.RLock()
+
+        self._governor = get_memory_governor()
+        self._token = uuid.uuid4().hex
+        weakref.finalize(self, self._governor.forget_prefix, self._token)
+        self._track(CONTENT_KEY, self._size)
+
+    @classmethod
+    def from_response(cls, response):
+        '''Create the artifact from a `requests.Response` of a file endpoint.
+        '''
+        return cls(response.content)
+
+    def _track(self, name, size):
+        # Only contents which can be read again from disk are released
+        releasable = name != CONTENT_KEY or self.path is not None
+        ref = weakref.ref(self)
+
+        def release():
+            artifact = ref()
+            if artifact is not None:
+                artifact._release(name)
+
+        self._governor.track((self._token, name), f'{self.label} {name}', size,
+                             release if releasable else None)
+
+    def _release(self, name):
+        if name == CONTENT_KEY:
+            self._content = None
+        else:
+            self._dataframes.pop(name, None)
+
+    @property
+    def content(self):
+        '''Contents of the `tar.gz` file, read again from `path` if released.
+        '''
+        content = self._content
+        if content is not None:
+            self._governor.touch((self._token, CONTENT_KEY))
+            return content
+
+        with self._lock:
+            content = self._content
+            if content is None:
+                logger.info(f"Reloading {self.label} from {self.path}.")
+                content = self._content = read_persisted_bytes(self.path)
+                self._track(CONTENT_KEY, len(content))
+        return content
+
+    def _open(self):
+        return tarfile.open(fileobj=io.BytesIO(self.content), mode='r:*')
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def members(self):
+        '''
+        Dict of file basename to path within the tar for every file in the
+        artifact.
+        '''
+        if self._members is None:
+            with self._lock:
+                if self._members is None:
+                    with self._open() as tar:
+                        self._members = {os.path.basename(m.name): m.name
+                                         for m in tar.getmembers() if m.isfile()}
+        return self._members
+
+    def names(self):
+        '''Sorted list of the file names in the artifact.
+        '''
+        return sorted(self.members.keys())
+
+    def dataframe_names(self):
+        '''List of the file names which can be read as dataframes.
+        '''
+        return [n for n in self.names() if n.endswith(DATAFRAME_EXTENSIONS)]
+
+    def member_bytes(self, name):
+        '''Raw bytes of the member `name`.
+        '''
+        with self._open() as tar:
+            return tar.extractfile(self.members[name]).read()
+
+    @staticmethod
+    def _read_dataframe(name, fileobj):
+        if name.endswith('.parquet'):
+            return pd.read_parquet(fileobj)
+        return pd.read_csv(fileobj)
+
+    def dataframe(self, name):
+        '''
+        Dataframe of the member `name`, parsed on first access. Returns
+        `None` if the member does not exist.
+        '''
+        df = self._dataframes.get(name)
+        if df is not None:
+            self._governor.touch((self._token, name))
+            return df
+
+        if name not in self.members:
+            return None
+        with self._lock:
+            df = self._dataframes.get(name)
+            if df is None:
+                df = self._read_dataframe(name, io.BytesIO(self.member_bytes(name)))
+                self._store(name, df)
+        return df
+
+    def _store(self, name, df):
+        self._dataframes[name] = df
+        self._track(name, deep_size(df))
+
+    def dataframes(self):
+        '''
+        Dict of every csv and parquet member as a dataframe, keyed by the file
+        basename as in `FileEndpoint.get_dataframe`. The tar is read in a
+        single pass.
+
+        The dict holds every dataframe in memory regardless of the memory
+        budget, prefer `frames` where only some are used.
+        '''
+        with self._lock:
+            frames = {n: self._dataframes.get(n) for n in self.dataframe_names()}
+            paths = {self.members[n]: n for n, df in frames.items() if df is None}
+            for name, df in frames.items():
+                if df is not None:
+                    self._governor.touch((self._token, name))
+
+            if paths:
+                with self._open() as tar:
+                    for member in tar:
+                        name = paths.get(member.name)
+                        if name is not None:
+                            frames[name] = self._read_dataframe(name, tar.extractfile(member))
+                            self._store(name, frames[name])
+        return frames
+
+    def frames(self):
+        '''Read only mapping of file name to dataframe, parsed on first access.
+        '''
+        return ArtifactDataFrames(self)
+
+
+class ArtifactDataFrames(Mapping):
+    '''
+    Mapping of file name to dataframe backed by an `AnalysisArtifact`, which
+    can be passed to an `OutputInterface` so only the output files which are
+    viewed get parsed.
+    '''
+    def __init__(self, artifact):
+        self.artifact = artifact
+
+    def __getitem__(self, name):
+        if not name.endswith(DATAFRAME_EXTENSIONS) or name not in self.artifact.members:
+            raise KeyError(name)
+        return self.artifact.dataframe(name)
+
+    def __iter__(self):
+        return iter(self.artifact.dataframe_names())
+
+    def __len__(self):
+        return len(self.artifact.dataframe_names())
+
+
+def artifact_cache_path(cache_dir, analysis_id, filename, modified, suffix='.tar.gz'):
+    '''
+    Path of a persisted artifact, `analysis_{id}_{filename}_{modified}.tar.gz`
+    with non-alphanumeric characters removed from `modified`.
+    '''
+    stamp = re.sub(r'[^0-9A-Za-z]', '', str(modified))
+    return Path(cache_dir) / f'analysis_{analysis_id}_{filename}_{stamp}{suffix}'
+
+
+def artifact_cache_dir():
+    '''Directory artifacts are persisted to, or `None` if disabled.
+    '''
+    return os.environ.get(ARTIFACT_CACHE_DIR_ENV) or None
+
+
+def read_persisted_bytes(path):
+    '''
+    Contents of the persisted file `path`, marking it as recently used so it
+    is pruned last.
+    '''
+    content = path.read_bytes()
+    try:
+        path.touch()
+    except OSError:
+        pass
+    return content
+
+
+def _read_persisted(path, label):
+    if path is None or not path.is_file():
+        return None
+    return AnalysisArtifact(read_persisted_bytes(path), path=path, label=label)
+
+
+def prune_artifact_cache(cache_dir, max_bytes=None, keep=None):
+    '''
+    Remove the least recently used files persisted to `cache_dir` until they
+    total at most `max_bytes`, by default `OASIS_UI_CACHE_MAX_MB`. Temporary
+    files older than `TEMP_FILE_MAX_AGE`, left by interrupted writes, are
+    removed too.
+
+    Parameters
+    ----------
+    cache_dir : str or Path
+    max_bytes : int
+    keep : Path
+           File which is never removed, e.g. the one just persisted.
+
+    Returns
+    -------
+    list of the removed `Path`s.
+    '''
+    if max_bytes is None:
+        max_bytes = float(os.environ.get(ARTIFACT_CACHE_MAX_MB_ENV, ARTIFACT_CACHE_MAX_MB)) * 2**20
+
+    removed = []
+    for path in Path(cache_dir).glob('*.tmp'):
+        try:
+            if time.time() - path.stat().st_mtime > TEMP_FILE_MAX_AGE:
+                path.unlink()
+                removed.append(path)
+        except OSError as e:
+            logger.warning(f"Failed to prune {path}: {e}")
+
+    files = []
+    for path in Path(cache_dir).glob('analysis_*'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files, key=lambda f: f[0]):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except OSError as e:
+            logger.warning(f"Failed to prune {path}: {e}")
+            continue
+        total -= size
+        removed.append(path)
+
+    if removed:
+        logger.info(f"Pruned {len(removed)} files from artifact cache {cache_dir}.")
+    return removed
+
+
+def persist_bytes(path, content):
+    '''
+    Write `content` to `path` atomically, returning whether it succeeded. The
+    cache directory is then pruned to `OASIS_UI_CACHE_MAX_MB`.
+    '''
+    tmp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to persist {path}: {e}")
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        return False
+
+    prune_artifact_cache(path.parent, keep=path)
+    return True
+
+
+class _Unavailable(Exception):
+    '''Raised within a `cache_shared` function so a `None` result is not cached.
+    '''
+
+
+def has_analysis_access(client_interface, analysis_id):
+    '''
+    Whether the user of `client_interface` can get the analysis, checked
+    before serving files shared by another session.
+    '''
+    try:
+        client_interface.analyses.get(analysis_id)
+    except HTTPError as e:
+        logger.error(f"Analysis {analysis_id} not accessible: {e}")
+        return False
+    return True
+
+
+# Access is checked on every call to a shared cache, so granted access is reused briefly
+@st.cache_data(ttl=ANALYSIS_ACCESS_TTL, show_spinner=False)
+def _check_access(user_key, analysis_id, _client_interface):
+    if not has_analysis_access(_client_interface, analysis_id):
+        raise _Unavailable
+    return True
+
+
+def cache_shared(**cache_kwargs):
+    '''
+    Decorator caching `func(client_interface, analysis_id, ...)` process wide
+    with `st.cache_resource`, keyed on every argument but the client
+    interface. A single copy is therefore held however many users view an
+    analysis, while each call first checks the caller can get the analysis
+    and returns `None` if not. Granted access is reused for
+    `ANALYSIS_ACCESS_TTL` seconds per user.
+
+    `None` results are not cached, so a file which is not available yet is
+    fetched again on the next call. The `clear` method of the underlying
+    cache is available on the decorated function.
+
+    Parameters
+    ----------
+    **cache_kwargs
+        Keyword arguments of `st.cache_resource`.
+    '''
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cached(_client_interface, *args):
+            result = func(_client_interface, *args)
+            if result is None:
+                raise _Unavailable
+            return result
+
+        # Streamlit keys its caches by the function name
+        cached.__module__ = func.__module__
+        cached.__qualname__ = func.__qualname__
+        cached = st.cache_resource(**cache_kwargs)(cached)
+
+        @functools.wraps(func)
+        def wrapper(client_interface, *args, **kwargs):
+            bound = signature.bind(client_interface, *args, **kwargs)
+            bound.apply_defaults()
+            try:
+                _check_access(client_interface.user_key, bound.args[1], client_interface)
+                return cached(*bound.args)
+            except _Unavailable:
+                return None
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+# Artifacts are read only, so a single copy is shared rather than unpickled per rerun
+@cache_shared(show_spinner=False, max_entries=ARTIFACT_CACHE_ENTRIES)
+def get_analysis_artifact(client_interface, analysis_id, filename, modified=None):
+    '''
+    Retrieve the `AnalysisArtifact` of a file endpoint of an analysis, shared
+    by every session of the users who can get the analysis. `modified` is
+    only used as part of the cache key so a modified analysis is downloaded
+    again. Returns `None` if the file is not available.
+
+    If `OASIS_UI_CACHE_DIR` is set, artifacts are also persisted to that
+    directory, bounded to `OASIS_UI_CACHE_MAX_MB`, and read from it before
+    downloading. Persisted artifacts release their contents when over the
+    memory budget and read them again from disk.
+    '''
+    cache_dir = artifact_cache_dir()
+    path = None
+    if cache_dir and modified is not None:
+        path = artifact_cache_path(cache_dir, analysis_id, filename, modified)
+    label = f'analysis {analysis_id} {filename}'
+
+    artifact = _read_persisted(path, label)
+    if artifact is not None:
+        logger.info(f"Loaded {filename} for analysis {analysis_id} from {path}.")
+        return artifact
+
+    logger.info(f"Fetching {filename} for analysis {analysis_id}.")
+    artifact = client_interface.analyses.get_artifact(analysis_id, filename)
+    if artifact is None:
+        return None
+    if path is not None and not persist_bytes(path, artifact.content):
+        path = None
+    return AnalysisArtifact(artifact.content, path=path, label=label)
@@ -0,0 +1,82 @@
+'''
+Module to load the static assets of the UI once per process.
+
+The assets never change while the server runs so each is loaded into a
+shared read only structure with `st.cache_resource`. `start_warm_up` loads
+the cheap ones in a background thread when the first page is imported, so no
+user interaction waits on their disk reads. The country geometries and OED
+schema need geopandas and ods_tools, which would compete with the first
+render, so they are left to load on first use.
+'''
+import threading
+import time
+import logging
+
+import pandas as pd
+import streamlit as st
+
+from modules.config import get_ui_config, ui_config_path
+from modules.settings import get_settings_registry
+
+logger = logging.getLogger(__name__)
+
+ZOOM_LEVELS_CSV = './assets/zoom_levels_reduced.csv'
+
+
+@st.cache_resource(show_spinner=False)
+def get_zoom_levels():
+    '''
+    Retrieve the width in longitudes of a single map tile at each zoom
+    level, indexed by zoom level, as a read only array.
+    '''
+    widths = pd.read_csv(ZOOM_LEVELS_CSV)['tile_width_longitudes'].to_numpy(copy=True)
+    widths.flags.writeable = False
+    return widths
+
+
+WARM_UP_LOADERS = [
+    ('ui config', lambda: get_ui_config(ui_config_path())),
+    ('zoom levels', get_zoom_levels),
+    ('default settings', lambda: get_settings_registry().find()),
+]
+
+
+def warm_up(loaders=None):
+    '''
+    Load every static asset, logging the time taken by each.
+
+    Parameters
+    ----------
+    loaders : list[tuple]
+              List of `(name, callable)` pairs, defaults to `WARM_UP_LOADERS`.
+
+    Returns
+    -------
+    dict
+        Seconds taken to load each asset. Failed loads are logged and omitted.
+    '''
+    if loaders is None:
+        loaders = WARM_UP_LOADERS
+
+    timings = {}
+    for name, loader in loaders:
+        start = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            logger.error(f"Failed to load {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+        logger.info(f"Loaded {name} in {timings[name]:.3f}s.")
+
+    logger.info(f"Warm up completed in {sum(timings.values()):.3f}s.")
+    return timings
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    '''Start `warm_up` in a background thread, once per process.
+    '''
+    thread = threading.Thread(target=warm_up, name='asset-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,10 @@
 import pandas as pd
+from modules.artifacts import AnalysisArtifact
+from modules.profiling import is_enabled, profiled, track_transfers
 from oasislmf.platform_api.client import APIClient
 import tempfile
 import os
+import uuid
 from requests import HTTPError
 import logging
 
@@ -12,8 +15,10 @@ class JsonEndpointInterface:
     Abstract class for handling a endpoint of the Oasis APIClient restricted to json output.
     '''
     def __init__(self, client, endpoint_name='portfolios'):
+        self.endpoint_name = endpoint_name
         self.endpoint = getattr(client, endpoint_name)
 
+    @profiled('{self.endpoint_name}.get')
     def get(self, ID=None):
         return self.endpoint.get(ID=ID).json()
 
@@ -24,17 +29,21 @@ class EndpointInterface:
     handling both file and json endpoints.
     '''
     def __init__(self, client, endpoint_name='portfolios'):
+        self.endpoint_name = endpoint_name
         self.endpoint = getattr(client, endpoint_name)
 
+    @profiled('{self.endpoint_name}.get')
     def get(self, ID=None, df=False):
         data = self.endpoint.get(ID=ID).json()
         if df:
             data = pd.json_normalize(data)
         return data
 
+    @profiled('{self.endpoint_name}.search')
     def search(self, metadata={}):
         return self.endpoint.search(metadata=metadata).json()
 
+    @profiled('{self.endpoint_name}.get_file')
     def get_file(self, ID, filename, df=False):
         file_available = self.get(ID).get(filename, None)
         if file_available is None:
@@ -48,6 +57,17 @@ class EndpointInterface:
             data = data.get(ID)
         return data
 
+    @profiled('{self.endpoint_name}.get_artifact')
+    def get_artifact(self, ID, filename):
+        '''
+        Download a `tar.gz` file endpoint as an `AnalysisArtifact`, or `None` if
+        the file is not available.
+        '''
+        response = self.get_file(ID, filename)
+        if response is None:
+            return None
+        return AnalysisArtifact.from_response(response)
+
 
 class ModelsEndpointInterface(EndpointInterface):
     '''
@@ -66,6 +86,7 @@ class AnalysesEndpointInterface(EndpointInterface):
         super().__init__(client, endpoint_name='analyses')
         self.settings = JsonEndpointInterface(self.endpoint, endpoint_name='settings')
 
+    @profiled('{self.endpoint_name}.get_traceback')
     def get_traceback(self, ID, error_type='input_generation'):
         '''
         Get the contents of the traceback file if it exists
@@ -110,6 +131,7 @@ class PortfoliosEndpointInterface(EndpointInterface):
     def get_reinsurance_scope_file(self, ID, df=False):
         return self.get_file(ID, "reinsurance_scope_file", df)
 
+    @profiled('{self.endpoint_name}.create')
     def create(self, name, location_file = None, accounts_file = None,
                reinsurance_info_file = None, reinsurance_scope_file = None):
         '''
@@ -152,6 +174,9 @@ class ClientInterface:
         portfolios: Interface for managing portfolios.
         analyses: Interface for managing analyses.
         models: Interface for managing models.
+        user_key: Identity of the authenticated user, keying the caches
+            shared between sessions. Unique to the interface if the client
+            was created elsewhere.
     '''
     def __init__(self, client=None, username=None, password=None):
         api_url = os.environ.get('API_URL', 'http://localhost:8000')
@@ -162,6 +187,10 @@ class ClientInterface:
         assert client is not None, 'Client not set'
 
         self.client = client
+        self.user_key = username if username is not None else uuid.uuid4().hex
+        if is_enabled() and hasattr(client, 'api'):
+            track_transfers(client.api)
+
         self.portfolios = PortfoliosEndpointInterface(client)
         self.analyses = AnalysesEndpointInterface(client)
         self.models = ModelsEndpointInterface(client)
@@ -174,10 +203,16 @@ class ClientInterface:
 
         return resp
 
-    def create_and_generate_analysis(self, portfolio_id, model_id, analysis_name):
+    def create_and_generate_analysis(self, portfolio_id, model_id, analysis_name, wait=True):
         '''Create the analysis and run input generation.
+
+        If `wait` is `True` blocks until input generation finishes and returns
+        whether it succeeded, otherwise returns the analysis once generation
+        is queued.
         '''
         resp = self.create_analysis(portfolio_id, model_id, analysis_name)
+        if not wait:
+            return self.client.analyses.generate(resp["id"]).json()
         resp = self.client.run_generate(resp["id"])
         return resp
 
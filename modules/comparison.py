@@ -0,0 +1,325 @@
+'''
+Module to align and compare the outputs of multiple analyses.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from modules.artifacts import get_analysis_artifact
+from modules.profiling import submit_in_context
+from modules.results import get_result_store
+from modules.visualisation import OutputInterface
+
+
+def align_results(results, names, keys, value_col='mean', fill_value=0):
+    '''
+    Align the results of several analyses on shared keys.
+
+    Each result is summed over `keys` and the results are outer joined on the
+    resulting index, so a key missing from an analysis (e.g. an event with no
+    loss) is filled with `fill_value`.
+
+    Parameters
+    ----------
+    results : list[pd.DataFrame]
+              Output dataframes, one per analysis.
+    names : list[str]
+            Unique name of each analysis, used as the column names.
+    keys : list[str]
+           Columns to align on, e.g. `['event_id', 'LocNumber']`.
+    value_col : str
+                Column compared between the analyses.
+    fill_value : float
+                 Value for keys missing from an analysis.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by `keys` with one `value_col` column per analysis.
+    '''
+    assert len(results) == len(names), 'Number of names does not match results.'
+    assert len(set(names)) == len(names), 'Analysis names must be unique.'
+
+    aligned = [r.groupby(keys, dropna=False)[value_col].sum() for r in results]
+    aligned = pd.concat(aligned, axis=1, keys=names, join='outer')
+    return aligned.fillna(fill_value)
+
+
+def compute_deltas(aligned, baseline=None):
+    '''
+    Compute the absolute and relative difference of every analysis in an
+    aligned frame from a baseline analysis.
+
+    Parameters
+    ----------
+    aligned : pd.DataFrame
+              Output of `align_results`.
+    baseline : str
+               Column of the baseline analysis. Defaults to the first column.
+
+    Returns
+    -------
+    pd.DataFrame
+        `aligned` with a `{name}_delta` and `{name}_relative_delta` column
+        added for each analysis. Relative deltas are fractions of the
+        baseline and `NaN` where the baseline is zero.
+    '''
+    if baseline is None:
+        baseline = aligned.columns[0]
+
+    names = aligned.columns.tolist()
+    values = aligned.to_numpy(dtype='float64')
+    base = aligned[baseline].to_numpy(dtype='float64')[:, None]
+
+    delta = values - base
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(base != 0, delta / base, np.nan)
+
+    deltas = pd.DataFrame(np.hstack((delta, relative)), index=aligned.index,
+                          columns=[f'{n}_delta' for n in names] + [f'{n}_relative_delta' for n in names])
+    return pd.concat((aligned, deltas), axis=1)
+
+
+def compare_results(results, names, keys, value_col='mean', baseline=None):
+    '''
+    Align the results of several analyses on `keys` and compute the
+    differences from `baseline`. See `align_results` and `compute_deltas`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Comparison frame with `keys` as columns.
+    '''
+    aligned = align_results(results, names, keys, value_col=value_col)
+    return compute_deltas(aligned, baseline=baseline).reset_index()
+
+
+def unique_names(names):
+    '''
+    Make analysis names unique by appending a count to repeated names.
+    '''
+    seen = {}
+    output = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        output.append(name if count == 0 else f'{name} ({count + 1})')
+    return output
+
+
+def return_period_grid(results, rp_col='return_period', n_points=50):
+    '''
+    Log-spaced return period grid covering the return periods of all the
+    `results`.
+    '''
+    min_rp = min(r[rp_col].min() for r in results)
+    max_rp = max(r[rp_col].max() for r in results)
+    return np.geomspace(min_rp, max_rp, n_points)
+
+
+def interpolate_ep_curves(groups, return_periods, losses, grid):
+    '''
+    Linearly interpolate the EP curves of several groups onto a common
+    return period grid in log return period space.
+
+    All groups are interpolated in a single `np.searchsorted` call by
+    offsetting each group's log return periods so the groups occupy disjoint
+    ranges of one sorted array.
+
+    Parameters
+    ----------
+    groups : np.ndarray
+             Integer group code of each point, in `0..n_groups-1`.
+    return_periods : np.ndarray
+                     Return period of each point.
+    losses : np.ndarray
+             Loss of each point.
+    grid : np.ndarray
+           Return periods to interpolate onto.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape `(n_groups, len(grid))`. Points outside the range of a
+        group's curve are `NaN`.
+    '''
+    n_groups = groups.max() + 1 if len(groups) > 0 else 0
+    x = np.log(return_periods.astype('float64'))
+    log_grid = np.log(np.asarray(grid, dtype='float64'))
+
+    span = max(x.max(), log_grid.max()) - min(x.min(), log_grid.min()) + 1 if len(x) > 0 else 1
+    x = x + groups * span
+    order = np.lexsort((x, groups))
+    x = x[order]
+    y = losses.astype('float64')[order]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    query = log_grid[None, :] + (np.arange(n_groups) * span)[:, None]
+    group_starts = np.broadcast_to(starts[:, None], query.shape)
+    group_ends = np.broadcast_to(ends[:, None], query.shape)
+
+    right = np.searchsorted(x, query, side='right')
+    right = np.clip(right, group_starts + 1, np.maximum(group_ends - 1, group_starts + 1))
+    right = np.minimum(right, len(x) - 1)
+    left = np.maximum(right - 1, group_starts)
+
+    x0, x1 = x[left], x[right]
+    y0, y1 = y[left], y[right]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(x1 > x0, (query - x0) / (x1 - x0), 0)
+    interpolated = y0 + t * (y1 - y0)
+
+    first = x[np.minimum(group_starts, len(x) - 1)]
+    last = x[np.maximum(group_ends - 1, 0)]
+    in_range = (query >= first) & (query <= last) & (group_ends > group_starts)
+    return np.where(in_range, interpolated, np.nan)
+
+
+def resample_ep_curves(results, names, group_col, grid, rp_col='return_period',
+                       loss_col='loss'):
+    '''
+    Resample the EP curves of several analyses onto a common return period
+    grid.
+
+    Parameters
+    ----------
+    results : list[pd.DataFrame]
+              EP curves with `group_col`, `rp_col` and `loss_col` columns and
+              one row per group and return period.
+    names : list[str]
+            Unique name of each analysis.
+    group_col : str
+                Column identifying each curve, e.g. `summary_id`.
+    grid : np.ndarray
+           Return periods to resample onto, see `return_period_grid`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by `(group_col, rp_col)` with one loss column per analysis.
+    '''
+    all_groups = pd.unique(pd.concat([r[group_col] for r in results]))
+    index = pd.MultiIndex.from_product([all_groups, grid], names=[group_col, rp_col])
+
+    resampled = {}
+    for result, name in zip(results, names):
+        codes = pd.Categorical(result[group_col], categories=all_groups).codes
+        # Ensure every group is represented so codes line up with all_groups
+        curves = np.full((len(all_groups), len(grid)), np.nan)
+        valid = codes >= 0
+        if valid.any():
+            interpolated = interpolate_ep_curves(codes[valid],
+                                                 result[rp_col].to_numpy()[valid],
+                                                 result[loss_col].to_numpy()[valid],
+                                                 grid)
+            curves[:interpolated.shape[0]] = interpolated
+        resampled[name] = curves.ravel()
+
+    return pd.DataFrame(resampled, index=index)
+
+
+def pairwise_comparison(aligned):
+    '''
+    Differences and ratios between every pair of analyses in an aligned frame.
+
+    Parameters
+    ----------
+    aligned : pd.DataFrame
+              Frame with one column per analysis, e.g. the output of
+              `align_results` or `resample_ep_curves`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Long frame with the index of `aligned` as columns and `analysis`,
+        `reference`, `difference` (analysis - reference) and `ratio`
+        (analysis / reference) columns.
+    '''
+    names = aligned.columns.tolist()
+    values = aligned.to_numpy(dtype='float64')
+
+    difference = values[:, :, None] - values[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(values[:, None, :] != 0, values[:, :, None] / values[:, None, :], np.nan)
+
+    n_rows, n = values.shape
+    index = aligned.index.to_frame(index=False)
+    index = index.loc[index.index.repeat(n * n)].reset_index(drop=True)
+    index['analysis'] = np.tile(np.repeat(names, n), n_rows)
+    index['reference'] = np.tile(names, n * n_rows)
+    index['difference'] = difference.ravel()
+    index['ratio'] = ratio.ravel()
+
+    return index[index['analysis'] != index['reference']].reset_index(drop=True)
+
+
+class ComparisonSession:
+    '''
+    Settings, inputs and outputs of the analyses being compared. Every file
+    is fetched once, concurrently across analyses, through the shared
+    `get_analysis_artifact` cache and the
+    `OutputInterface` of each analysis is only built when first requested,
+    reading its results from the shared `get_result_store`.
+
+    Parameters
+    ----------
+    client_interface : ClientInterface
+    analyses : list[dict]
+               Analyses to compare as returned by the analyses endpoint.
+    max_workers : int
+                  Maximum number of concurrent downloads.
+    '''
+    def __init__(self, client_interface, analyses, max_workers=8):
+        self.analyses = list(analyses)
+        self.analysis_ids = [a['id'] for a in self.analyses]
+        self.key = self.session_key(self.analyses)
+
+        def fetch(analysis, filename):
+            return get_analysis_artifact(client_interface, analysis['id'], filename,
+                                         analysis.get('modified'))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            settings = [submit_in_context(executor, client_interface.analyses.settings.get, ID)
+                        for ID in self.analysis_ids]
+            inputs = [submit_in_context(executor, fetch, a, 'input_file') for a in self.analyses]
+            stores = [submit_in_context(executor, get_result_store, client_interface, a['id'],
+                                        a.get('modified'))
+                      for a in self.analyses]
+
+            self.settings = [f.result() for f in settings]
+            self.inputs = [f.result() for f in inputs]
+            self.result_stores = [f.result() for f in stores]
+
+        self._outputs = {}
+
+    @staticmethod
+    def session_key(analyses):
+        '''Key identifying a set of analyses and their last modification.
+        '''
+        return tuple((a['id'], a.get('modified')) for a in analyses)
+
+    def locations(self):
+        '''List of `location.csv` dataframes, `None` where not available.
+        '''
+        return [inputs.dataframe('location.csv') if inputs is not None else None
+                for inputs in self.inputs]
+
+    def outputs(self, perspective):
+        '''
+        List of `OutputInterface` for each analysis with the OED fields set for
+        `perspective`.
+        '''
+        outputs = []
+        for i, (store, settings) in enumerate(zip(self.result_stores, self.settings)):
+            if i not in self._outputs:
+                self._outputs[i] = store.output_interface() if store is not None else OutputInterface({})
+            output = self._outputs[i]
+
+            if perspective not in output.oed_fields:
+                oed_fields = settings.get(f'{perspective}_summaries', [{}])[0].get('oed_fields', None)
+                if oed_fields is not None:
+                    output.set_oed_fields(perspective, oed_fields)
+            outputs.append(output)
+        return outputs
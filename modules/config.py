@@ -3,6 +3,8 @@ import os
 import streamlit as st
 import logging
 
+from modules.settings import freeze
+
 logger = logging.getLogger(__name__)
 OASIS_UI_CONFIG = "ui-config.json"
 
@@ -16,9 +18,17 @@ class UIConfig():
         model_map: dict where the key is the model name and the value is a list
         of exposure sets the model should correspond to.
         skip_login (bool): If True skip the login redirection.
+        cache_warmer (bool): If True prefetch the outputs of analyses in the
+        background once their run completes.
+        profiling (bool): If True record the timings of fragments, API calls
+        and outputs and show them in a sidebar debug panel.
+        memory_budget_mb (int): Memory in MB the cached dataframes of all
+        sessions may hold before the least recently used are released, or
+        null for no limit. Defaults to 1024.
     """
-    def __init__(self):
-        config_path = os.getenv("OASIS_UI_CONFIG", OASIS_UI_CONFIG)
+    def __init__(self, config_path=None):
+        if config_path is None:
+            config_path = os.getenv("OASIS_UI_CONFIG", OASIS_UI_CONFIG)
 
         if os.path.isfile(config_path):
             with open(config_path, 'r') as f:
@@ -27,22 +37,39 @@ class UIConfig():
             logger.warning(f"OASIS_UI_CONFIG: {config_path} not found.")
             config = {}
 
-        self.pages = config.get('pages', [])
+        self.pages = freeze(config.get('pages', []))
         self.post_login_page = config.get('post_login_page')
-        self.model_map = config.get('model_map', {})
+        self.model_map = freeze(config.get('model_map', {}))
         self.skip_login = config.get('skip_login', False)
+        self.cache_warmer = config.get('cache_warmer', False)
+        self.profiling = config.get('profiling', False)
+        self.memory_budget_mb = config.get('memory_budget_mb', 1024)
+
+
+def ui_config_path():
+    '''Path of the ui config file set by the `OASIS_UI_CONFIG` environment variable.
+    '''
+    return os.getenv("OASIS_UI_CONFIG", OASIS_UI_CONFIG)
+
+
+@st.cache_resource(show_spinner=False)
+def get_ui_config(config_path):
+    '''Retrieve the process wide `UIConfig` loaded from `config_path`.
+    '''
+    logger.info(f"Loading ui-config from {config_path}.")
+    return UIConfig(config_path)
 
 
 def retrieve_ui_config():
     '''Retrieve ui config.
 
-    First checks `session_state` and if not present loads from file.
+    First checks `session_state` and if not present uses the process wide
+    config from `get_ui_config`.
     '''
     if 'ui-config' in st.session_state:
         logger.info("Loading ui-config from session_state.")
         return st.session_state['ui-config']
 
-    logger.info("Loading ui-config from file.")
-    ui_config = UIConfig()
+    ui_config = get_ui_config(ui_config_path())
     st.session_state['ui-config'] = ui_config
     return ui_config
@@ -0,0 +1,100 @@
+'''
+Module to serve country geometries for choropleth maps.
+'''
+import numpy as np
+import streamlit as st
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Source: geojson.xyz naturalearth-3.3.0 admin_0_countries
+COUNTRIES_GEOJSON = "./assets/ne_50m_admin_0_countries.geojson"
+
+# (maximum zoom level, simplification tolerance in degrees)
+SIMPLIFICATION_TIERS = [
+    (2, 0.25),
+    (5, 0.05),
+    (8, 0.01),
+    (None, 0),
+]
+
+
+class CountryGeometries:
+    '''
+    Country shapes keyed by ISO 3166-1 alpha-2 code, loaded once with
+    pre-simplified geometries for each tier in `SIMPLIFICATION_TIERS` and
+    precomputed centroids and bounds.
+
+    Parameters
+    ----------
+    path : str
+           Path to the country GeoJSON. Features require an `iso_a2` property.
+    tiers : list[tuple]
+            List of `(max_zoom, tolerance)` pairs in ascending zoom order. The
+            last tier should have `max_zoom` set to `None`.
+    '''
+    def __init__(self, path=COUNTRIES_GEOJSON, tiers=None):
+        if tiers is None:
+            tiers = SIMPLIFICATION_TIERS
+        self.tiers = tiers
+
+        import geopandas
+        countries = geopandas.read_file(path, columns=['iso_a2'])
+        countries = countries[countries['iso_a2'] != '-99']
+
+        projected_centroids = countries.geometry.to_crs(epsg=3857).centroid.to_crs(epsg=4326)
+        self.centroids = {iso: (pt.y, pt.x) for iso, pt in zip(countries['iso_a2'], projected_centroids)}
+        self.bounds = {iso: b for iso, b in zip(countries['iso_a2'], countries.geometry.bounds.to_numpy())}
+
+        self.features = []
+        for _, tolerance in tiers:
+            tier = countries
+            if tolerance:
+                tier = countries.set_geometry(countries.geometry.simplify(tolerance))
+            self.features.append({f['properties']['iso_a2']: f for f in tier.__geo_interface__['features']})
+
+    def _tier_index(self, zoom):
+        for i, (max_zoom, _) in enumerate(self.tiers):
+            if max_zoom is None or zoom <= max_zoom:
+                return i
+        return len(self.tiers) - 1
+
+    def geojson(self, iso_codes, zoom=3):
+        '''
+        GeoJSON `FeatureCollection` restricted to the countries in
+        `iso_codes`, simplified for the `zoom` level.
+        '''
+        features = self.features[self._tier_index(zoom)]
+        return {
+            'type': 'FeatureCollection',
+            'features': [features[c] for c in iso_codes if c in features]
+        }
+
+    def center(self, iso_codes):
+        '''
+        Mean centroid of the countries in `iso_codes` as a `{'lat', 'lon'}`
+        dict. Returns `None` if no countries are found.
+        '''
+        centroids = [self.centroids[c] for c in iso_codes if c in self.centroids]
+        if len(centroids) == 0:
+            return None
+        lat, lon = np.mean(centroids, axis=0)
+        return {'lat': lat, 'lon': lon}
+
+    def lon_range(self, iso_codes):
+        '''
+        Longitude range covered by the countries in `iso_codes`.
+        '''
+        bounds = [self.bounds[c] for c in iso_codes if c in self.bounds]
+        if len(bounds) == 0:
+            return 360
+        bounds = np.array(bounds)
+        return bounds[:, 2].max() - bounds[:, 0].min()
+
+
+@st.cache_resource(show_spinner=False)
+def get_country_geometries():
+    '''Retrieve the process wide `CountryGeometries`.
+    '''
+    logger.info("Loading country geometries.")
+    return CountryGeometries()
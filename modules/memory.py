@@ -0,0 +1,261 @@
+'''
+Module to account for and bound the memory held by cached dataframes.
+
+Parsed artifact dataframes and raw artifact contents are tracked by a process
+wide `MemoryGovernor` in least recently used order, attributed to the
+session which loaded them. Registered `st.cache_data` functions are counted
+using the Streamlit cache statistics. When the total exceeds the budget set
+by `memory_budget_mb` in the ui config, the least recently used entries are
+released: dataframes are parsed again from the artifact and contents are read
+again from the disk cache on next use. If that is not enough, the largest
+registered data cache is cleared.
+'''
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+import logging
+import sys
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Internal Streamlit API, data caches are not counted if it moves
+try:
+    from streamlit.runtime.caching import get_data_cache_stats_provider
+except ImportError:
+    get_data_cache_stats_provider = None
+
+from modules.config import get_ui_config, ui_config_path
+
+logger = logging.getLogger(__name__)
+
+MB = 2**20
+# Seconds the data cache sizes are reused for between budget checks
+DATA_CACHE_STATS_INTERVAL = 1.0
+
+# Registered `st.cache_data` functions keyed by the name used in their cache stats
+_data_caches = {}
+
+
+def deep_size(obj):
+    '''Approximate memory in bytes held by a dataframe, bytes or container of them.
+    '''
+    if isinstance(obj, pd.DataFrame):
+        try:
+            return int(obj.memory_usage(deep=True).sum())
+        except ValueError:
+            # pandas cannot measure read only object columns, e.g. of shared results
+            return sum(deep_size(obj.iloc[:, i]) for i in range(obj.shape[1])) + obj.index.nbytes
+    if isinstance(obj, pd.Series):
+        try:
+            return int(obj.memory_usage(deep=True))
+        except ValueError:
+            return int(obj.memory_usage(index=False)) + sum(map(sys.getsizeof, obj.to_numpy()))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(deep_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(deep_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def current_session_id():
+    '''Id of the session of the running script, or `None` outside a script run.
+    '''
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def register_data_cache(func):
+    '''
+    Decorator counting the entries of an `st.cache_data` function towards the
+    memory budget. Registered caches are cleared as a last resort when over
+    budget.
+    '''
+    _data_caches[f'{func.__module__}.{func.__qualname__}'] = func
+    return func
+
+
+class MemoryEntry(NamedTuple):
+    name: str
+    size: int
+    session_id: str
+    release: Callable
+    last_used: float
+
+
+class MemoryGovernor:
+    '''
+    Least recently used accounting of cached dataframes with a memory budget.
+
+    Parameters
+    ----------
+    budget : int
+             Memory budget in bytes, `None` for no limit.
+    '''
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self.evictions = 0
+        self._data_cache_sizes = {}
+        self._data_cache_checked = None
+
+    def track(self, key, name, size, release=None):
+        '''
+        Track `size` bytes under `key` as most recently used and enforce the
+        budget.
+
+        Parameters
+        ----------
+        key : hashable
+        name : str
+               Description shown in the usage report.
+        size : int
+        release : Callable
+                  Frees the memory, or `None` if the entry cannot be evicted.
+        '''
+        with self._lock:
+            self._entries[key] = MemoryEntry(name, size, current_session_id(), release, time.time())
+            self._entries.move_to_end(key)
+        self.enforce(keep=key)
+
+    def touch(self, key):
+        '''Mark `key` as most recently used.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(last_used=time.time())
+                self._entries.move_to_end(key)
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def forget_prefix(self, prefix):
+        '''Forget every tuple key starting with `prefix`, e.g. on garbage collection of its owner.
+        '''
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == prefix]:
+                del self._entries[key]
+
+    def data_cache_sizes(self):
+        '''Dict of registered data cache name to bytes held.
+        '''
+        sizes = dict.fromkeys(_data_caches, 0)
+        if get_data_cache_stats_provider is None or not sizes:
+            return sizes
+        try:
+            stats = get_data_cache_stats_provider().get_stats()
+        except Exception as e:
+            logger.warning(f"Failed to read data cache stats: {e}")
+            return sizes
+
+        for stat in stats:
+            if stat.cache_name in sizes:
+                sizes[stat.cache_name] += stat.byte_length
+        self._data_cache_sizes = sizes
+        self._data_cache_checked = time.monotonic()
+        return sizes
+
+    def tracked_size(self):
+        with self._lock:
+            return sum(e.size for e in self._entries.values())
+
+    def total_size(self):
+        return self.tracked_size() + sum(self.data_cache_sizes().values())
+
+    def _recent_data_cache_sizes(self):
+        # Walking every data cache on each track is slow, so the sizes are reused briefly
+        checked = self._data_cache_checked
+        if checked is None or time.monotonic() - checked > DATA_CACHE_STATS_INTERVAL:
+            return self.data_cache_sizes()
+        return self._data_cache_sizes
+
+    def enforce(self, keep=None):
+        '''
+        Release least recently used entries, other than `keep`, until within
+        budget. Clears the largest registered data cache if releasing entries
+        is not enough.
+        '''
+        if self.budget is None:
+            return
+
+        excess = self.tracked_size() + sum(self._recent_data_cache_sizes().values()) - self.budget
+        while excess > 0:
+            with self._lock:
+                key = next((k for k, e in self._entries.items()
+                            if k != keep and e.release is not None), None)
+                entry = self._entries.pop(key) if key is not None else None
+
+            if entry is None:
+                break
+            entry.release()
+            excess -= entry.size
+            self.evictions += 1
+            logger.info(f"Evicted {entry.name} ({entry.size / MB:.1f}MB) to stay within memory budget.")
+
+        if excess > 0:
+            sizes = self._recent_data_cache_sizes()
+            if sizes and max(sizes.values()) > 0:
+                name = max(sizes, key=sizes.get)
+                _data_caches[name].clear()
+                self._data_cache_sizes = {**sizes, name: 0}
+                self.evictions += 1
+                logger.info(f"Cleared data cache {name} ({sizes[name] / MB:.1f}MB) to stay within memory budget.")
+
+    def usage(self):
+        '''
+        Dataframe of the memory held by each tracked entry and registered data
+        cache with the `session_id` which loaded it, most recently used first.
+        '''
+        with self._lock:
+            entries = list(self._entries.values())[::-1]
+        rows = [{'name': e.name, 'session_id': e.session_id, 'bytes': e.size,
+                 'last_used': pd.Timestamp(e.last_used, unit='s')} for e in entries]
+        rows += [{'name': name, 'session_id': None, 'bytes': size, 'last_used': None}
+                 for name, size in self.data_cache_sizes().items()]
+        return pd.DataFrame(rows, columns=['name', 'session_id', 'bytes', 'last_used'])
+
+    def session_usage(self):
+        '''Bytes held by the tracked entries loaded by each session.
+        '''
+        usage = self.usage()
+        return usage.groupby(usage['session_id'].fillna('process'))['bytes'].sum()
+
+
+@st.cache_resource(show_spinner=False)
+def get_memory_governor():
+    '''Retrieve the process wide `MemoryGovernor` with the ui config budget.
+    '''
+    budget_mb = get_ui_config(ui_config_path()).memory_budget_mb
+    return MemoryGovernor(budget_mb * MB if budget_mb is not None else None)
+
+
+def session_state_size():
+    '''Bytes held by the dataframes stored directly in `st.session_state`.
+    '''
+    return sum(deep_size(v) for v in st.session_state.values()
+               if isinstance(v, (pd.DataFrame, pd.Series)))
+
+
+def memory_panel():
+    '''Sidebar panel of the memory held by the process and this session.
+    '''
+    governor = get_memory_governor()
+    usage = governor.usage()
+    session = usage.loc[usage['session_id'] == current_session_id(), 'bytes'].sum()
+
+    with st.expander('Memory', expanded=False):
+        budget = f'{governor.budget / MB:.0f}MB' if governor.budget is not None else 'unlimited'
+        st.caption(f'Process: {usage["bytes"].sum() / MB:.1f}MB of {budget}, '
+                   f'{governor.evictions} evictions')
+        st.caption(f'This session: {session / MB:.1f}MB loaded, '
+                   f'{session_state_size() / MB:.1f}MB in session state')
+        if len(usage) > 0:
+            st.dataframe(usage.assign(MB=usage['bytes'] / MB).drop(columns=['bytes']),
+                         hide_index=True)
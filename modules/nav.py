@@ -1,6 +1,10 @@
+from modules.assets import start_warm_up
 from modules.config import retrieve_ui_config
+from modules.memory import memory_panel
+from modules.profiling import debug_panel, is_enabled
 import streamlit as st
 
+start_warm_up()
 ui_config = retrieve_ui_config()
 
 def SidebarNav(no_client=False):
@@ -10,6 +14,10 @@ def SidebarNav(no_client=False):
                 st.page_link(page_config['path'], label=page_config['label'])
         else:
             st.page_link('app.py', label="Login")
+
+        if is_enabled():
+            debug_panel()
+            memory_panel()
     # Add logo
     st.logo(image="images/oasis_logo_bg.png",
             size="large")
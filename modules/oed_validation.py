@@ -0,0 +1,282 @@
+'''
+Module to validate OED portfolio files before they are uploaded.
+
+Files are streamed in chunks and every check is vectorised over a chunk so
+large location files are validated in seconds without being held in memory.
+Required fields, data types, value ranges and peril codes are taken from the
+OED schema shipped with `ods_tools`.
+'''
+from pathlib import Path
+from typing import NamedTuple
+import logging
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200_000
+MAX_REPORTED_ROWS = 5
+
+# Portfolio form keys to OED schema file types
+OED_FILE_TYPES = {
+    'location_file': 'Loc',
+    'accounts_file': 'Acc',
+    'reinsurance_info_file': 'ReinsInfo',
+    'reinsurance_scope_file': 'ReinsScope',
+}
+NUMERIC_TYPES = ['int', 'tinyint', 'smallint', 'bigint', 'float', 'decimal']
+PERIL_FIELDS = ['locperilscovered', 'locperil', 'polperilscovered', 'polperil',
+                'accperil', 'condperil', 'reinsperil']
+# Fields which must be unique together in each file type
+UNIQUE_FIELDS = {
+    'Loc': ['portnumber', 'accnumber', 'locnumber'],
+}
+
+
+class OedIssue(NamedTuple):
+    '''A failed check of an OED file.
+
+    Attributes:
+        file: Name of the file.
+        column: Column the check failed on, or `None` for file level issues.
+        message: Description of the issue.
+        count: Number of rows failing the check.
+        rows: First failing row numbers, counting from 1 after the header.
+    '''
+    file: str
+    column: str
+    message: str
+    count: int = 0
+    rows: tuple = ()
+
+
+class OedField(NamedTuple):
+    name: str
+    required: bool
+    numeric: bool
+    valid_range: tuple
+
+
+@st.cache_resource(show_spinner=False)
+def get_oed_schema():
+    '''Retrieve the process wide OED schema of `ods_tools`, imported on first use.
+    '''
+    from ods_tools.oed import OedSchema
+    return OedSchema.from_oed_schema_info(None).schema
+
+
+@st.cache_resource(show_spinner=False)
+def get_oed_fields(file_type):
+    '''
+    Retrieve the fields of an OED file type from the `ods_tools` schema.
+
+    Returns
+    -------
+    dict
+        Lower case field name to `OedField`.
+    '''
+    schema = get_oed_schema()
+    fields = {}
+    for key, info in schema['input_fields'][file_type].items():
+        valid_range = info.get('Valid value range')
+        fields[key] = OedField(name=info['Input Field Name'],
+                               required=info.get('Property field status') == 'R',
+                               numeric=info['Data Type'].split('(')[0] in NUMERIC_TYPES,
+                               valid_range=tuple(valid_range) if isinstance(valid_range, list) else ())
+    return fields
+
+
+@st.cache_resource(show_spinner=False)
+def get_peril_codes():
+    '''Set of valid OED peril and peril group codes.
+    '''
+    schema = get_oed_schema()
+    return frozenset(schema['perils']['info'].keys())
+
+
+def _in_range(values, valid_range):
+    valid = np.zeros(len(values), dtype=bool)
+    for option in valid_range:
+        if 'enum' in option:
+            valid |= values.isin(option['enum']).to_numpy()
+            continue
+        option_valid = np.ones(len(values), dtype=bool)
+        if 'min' in option:
+            option_valid &= (values >= option['min']).to_numpy()
+        if 'max' in option:
+            option_valid &= (values <= option['max']).to_numpy()
+        valid |= option_valid
+    return valid
+
+
+def _invalid_perils(values, peril_codes):
+    '''Mask of peril strings, e.g. `WTC;WSS`, containing an unknown code.
+    '''
+    uniques = values.dropna().unique()
+    invalid = [v for v in uniques
+               if not all(code.strip() in peril_codes for code in str(v).split(';'))]
+    return values.isin(invalid).to_numpy()
+
+
+def _read_chunks(file, name, columns, dtype, chunksize):
+    if Path(name).suffix.lower() == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(file, usecols=columns, dtype=dtype, chunksize=chunksize,
+                           encoding_errors='replace')
+
+
+def _read_header(file, name):
+    if Path(name).suffix.lower() == '.parquet':
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(file).names)
+    return list(pd.read_csv(file, nrows=0).columns)
+
+
+class _IssueCounter:
+    def __init__(self, name):
+        self.name = name
+        self.issues = {}
+
+    def add(self, column, message, mask, offset):
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return
+        count, sample = self.issues.get((column, message), (0, []))
+        if len(sample) < MAX_REPORTED_ROWS:
+            sample = sample + [int(r) + offset + 1 for r in rows[:MAX_REPORTED_ROWS - len(sample)]]
+        self.issues[(column, message)] = (count + len(rows), sample)
+
+    def to_list(self):
+        return [OedIssue(self.name, column, message, count, tuple(rows))
+                for (column, message), (count, rows) in self.issues.items()]
+
+
+def validate_oed_file(file, file_type, name=None, chunksize=CHUNK_SIZE):
+    '''
+    Validate an OED csv or parquet file in chunks.
+
+    Checks required fields are present and populated, numeric fields parse
+    and are within the OED valid ranges (e.g. latitude, longitude and
+    non-negative TIVs), peril codes are valid and locations are unique.
+
+    Parameters
+    ----------
+    file : str | Path | file-like
+           File to validate. File-like objects are rewound afterwards.
+    file_type : str
+                OED file type, one of `Loc`, `Acc`, `ReinsInfo` or `ReinsScope`.
+    name : str
+           Name used in the issues, defaults to the file name.
+    chunksize : int
+                Number of rows validated at once.
+
+    Returns
+    -------
+    list[OedIssue]
+        Empty if the file is valid.
+    '''
+    if name is None:
+        name = getattr(file, 'name', str(file))
+
+    try:
+        return _validate_oed_file(file, file_type, name, chunksize)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError, OSError) as e:
+        logger.info(f'Failed to read {name}: {e}')
+        return [OedIssue(name, None, f'File could not be read: {e}')]
+    finally:
+        if hasattr(file, 'seek'):
+            file.seek(0)
+
+
+def _validate_oed_file(file, file_type, name, chunksize):
+    fields = get_oed_fields(file_type)
+    peril_codes = get_peril_codes()
+
+    header = _read_header(file, name)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    columns = {c.lower(): c for c in header}
+
+    missing = [f.name for k, f in fields.items() if f.required and k not in columns]
+    if missing:
+        return [OedIssue(name, None, f"Missing required columns: {', '.join(missing)}")]
+
+    required = [columns[k] for k, f in fields.items() if f.required]
+    numeric = {columns[k]: f for k, f in fields.items() if f.numeric and k in columns}
+    perils = [columns[k] for k in PERIL_FIELDS if k in columns and k in fields]
+    unique = [columns[k] for k in UNIQUE_FIELDS.get(file_type, []) if k in columns]
+
+    used = list(dict.fromkeys(required + list(numeric) + perils + unique))
+    dtype = {c: str for c in used if c not in numeric}
+
+    issues = _IssueCounter(name)
+    hashes = []
+    offset = 0
+    for chunk in _read_chunks(file, name, used, dtype, chunksize):
+        for c in required:
+            issues.add(c, 'Missing required value', chunk[c].isna().to_numpy(), offset)
+
+        for c, field in numeric.items():
+            values = chunk[c]
+            if not pd.api.types.is_numeric_dtype(values):
+                parsed = pd.to_numeric(values, errors='coerce')
+                issues.add(c, 'Value is not a number',
+                           (parsed.isna() & values.notna()).to_numpy(), offset)
+                values = parsed
+            if field.valid_range:
+                invalid = values.notna().to_numpy() & ~_in_range(values, field.valid_range)
+                issues.add(c, 'Value out of range', invalid, offset)
+
+        for c in perils:
+            issues.add(c, 'Invalid peril code', _invalid_perils(chunk[c], peril_codes), offset)
+
+        if unique:
+            hashes.append(pd.util.hash_pandas_object(chunk[unique], index=False).to_numpy())
+
+        offset += len(chunk)
+
+    if hashes:
+        duplicated = pd.Series(np.concatenate(hashes)).duplicated().to_numpy()
+        issues.add(', '.join(unique), 'Duplicate location', duplicated, 0)
+
+    return issues.to_list()
+
+
+def validate_portfolio_files(files, chunksize=CHUNK_SIZE):
+    '''
+    Validate the OED files of a portfolio.
+
+    Parameters
+    ----------
+    files : dict
+            Portfolio file keys, e.g. `location_file`, to files. `None` values
+            are skipped.
+
+    Returns
+    -------
+    list[OedIssue]
+    '''
+    issues = []
+    for key, file_type in OED_FILE_TYPES.items():
+        file = files.get(key)
+        if file is not None:
+            issues += validate_oed_file(file, file_type, chunksize=chunksize)
+    return issues
+
+
+def issues_dataframe(issues):
+    '''Display ready dataframe of a list of `OedIssue`.
+    '''
+    return pd.DataFrame({
+        'File': [i.file for i in issues],
+        'Column': [i.column or '' for i in issues],
+        'Issue': [i.message for i in issues],
+        'Rows': [i.count for i in issues],
+        'Example Rows': [', '.join(str(r) for r in i.rows) for i in issues],
+    })
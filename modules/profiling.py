@@ -0,0 +1,237 @@
+'''
+Module to record the timings of fragments, API calls and outputs.
+
+Profiling is opt-in with `"profiling": true` in the ui config. When enabled
+each `profiled` call or `span` block records its wall time, the bytes
+received from the API while it ran and the size of any returned dataframe.
+Records are logged and kept in the session for the sidebar `debug_panel`.
+
+Bytes are counted in the context of the thread reading the response. Work
+submitted to a thread pool with `submit_in_context` counts towards the
+spans of the submitting thread, other worker threads such as the cache
+warmer are not attributed to any span.
+'''
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from types import SimpleNamespace
+import datetime
+import logging
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from modules.config import get_ui_config, ui_config_path
+from modules.logging import get_session_logger
+
+logger = logging.getLogger(__name__)
+
+MAX_RECORDS = 500
+PROFILING_KEY = 'profiling_records'
+
+
+class _Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.value += n
+
+
+_received = ContextVar('profiling_received')
+
+
+def is_enabled():
+    '''Whether profiling is enabled in the process wide ui config.
+    '''
+    return get_ui_config(ui_config_path()).profiling
+
+
+def _counter():
+    counter = _received.get(None)
+    if counter is None:
+        counter = _Counter()
+        _received.set(counter)
+    return counter
+
+
+def bytes_received():
+    '''Total bytes received from the API in the current context.
+    '''
+    return _counter().value
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    '''
+    Submit `fn` to `executor` so the bytes it receives count towards the
+    spans of the calling thread.
+    '''
+    # The copied context shares the counter, so it must exist beforehand
+    _counter()
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def _count_response(response, *args, **kwargs):
+    size = response.headers.get('Content-Length')
+    if size is not None:
+        _counter().add(int(size))
+        return
+
+    # Count chunked bodies as they are read rather than reading them here,
+    # which would load streamed downloads into memory
+    iter_content = response.iter_content
+
+    def counting_iter_content(*args, **kwargs):
+        for chunk in iter_content(*args, **kwargs):
+            _counter().add(len(chunk))
+            yield chunk
+
+    response.iter_content = counting_iter_content
+
+
+def track_transfers(session):
+    '''Count the bytes of every response of a `requests.Session`.
+    '''
+    hooks = session.hooks.setdefault('response', [])
+    if _count_response not in hooks:
+        hooks.append(_count_response)
+
+
+def _frame_size(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=False).sum())
+    return None, None
+
+
+def _record(record):
+    message = (f"{record['name']}({record['detail']}): {record['seconds']:.3f}s, "
+               f"{record['received']} bytes received")
+    if record['rows'] is not None:
+        message += f", {record['rows']} rows ({record['frame_bytes']} bytes)"
+
+    if get_script_run_ctx() is None:
+        logger.info(message)
+        return
+
+    get_session_logger().info(message)
+    if PROFILING_KEY not in st.session_state:
+        st.session_state[PROFILING_KEY] = deque(maxlen=MAX_RECORDS)
+    st.session_state[PROFILING_KEY].append(record)
+
+
+@contextmanager
+def span(name, detail=''):
+    '''
+    Context manager recording the time of a block when profiling is enabled.
+    Set `result` on the yielded object to record the size of a dataframe.
+
+    Parameters
+    ----------
+    name : str
+    detail : str
+             Extra context shown with the name, e.g. the call arguments.
+
+    Example
+    -------
+    >>> with span('merge locations') as s:
+    ...     s.result = merge_locations(*locations)
+    '''
+    block = SimpleNamespace(result=None)
+    if not is_enabled():
+        yield block
+        return
+
+    received = bytes_received()
+    start = time.perf_counter()
+    try:
+        yield block
+    finally:
+        rows, frame_bytes = _frame_size(block.result)
+        _record({
+            'time': datetime.datetime.now(),
+            'name': name,
+            'detail': detail,
+            'seconds': time.perf_counter() - start,
+            'received': bytes_received() - received,
+            'rows': rows,
+            'frame_bytes': frame_bytes,
+        })
+
+
+def _describe_args(args, kwargs):
+    values = [repr(a) for a in args if isinstance(a, (str, int, float, bool))]
+    values += [f'{k}={v!r}' for k, v in kwargs.items() if isinstance(v, (str, int, float, bool))]
+    return ', '.join(values)
+
+
+def profiled(name=None):
+    '''
+    Decorator recording each call of a function with `span`.
+
+    Parameters
+    ----------
+    name : str
+           Name of the records, defaults to the function's qualified name.
+           `{self...}` fields are formatted with the first argument, e.g.
+           `'{self.endpoint_name}.get'` on a method.
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+
+            span_name = name or func.__qualname__
+            if '{self' in span_name and args:
+                span_name = span_name.format(self=args[0])
+
+            with span(span_name, _describe_args(args, kwargs)) as s:
+                s.result = func(*args, **kwargs)
+            return s.result
+        return wrapper
+    return decorator
+
+
+def records_dataframe(records):
+    '''Dataframe of a list of profiling records.
+    '''
+    columns = ['time', 'name', 'detail', 'seconds', 'received', 'rows', 'frame_bytes']
+    return pd.DataFrame(list(records), columns=columns)
+
+
+def summarise_records(records):
+    '''Calls, total and mean time and bytes received of each record name, slowest first.
+    '''
+    df = records_dataframe(records)
+    summary = df.groupby('name').agg(calls=('seconds', 'size'),
+                                     total_seconds=('seconds', 'sum'),
+                                     mean_seconds=('seconds', 'mean'),
+                                     received=('received', 'sum'))
+    return summary.sort_values('total_seconds', ascending=False).reset_index()
+
+
+@st.fragment
+def debug_panel():
+    '''Sidebar panel of the profiling records of the session.
+    '''
+    records = st.session_state.get(PROFILING_KEY, [])
+
+    with st.expander('Profiling', expanded=False):
+        cols = st.columns(2)
+        cols[0].button('Refresh', key='profiling_refresh', use_container_width=True)
+        if cols[1].button('Clear', key='profiling_clear', use_container_width=True):
+            st.session_state[PROFILING_KEY] = deque(maxlen=MAX_RECORDS)
+            records = []
+
+        if len(records) == 0:
+            st.caption('No records.')
+            return
+
+        st.dataframe(summarise_records(records), hide_index=True)
+        st.dataframe(records_dataframe(records).iloc[::-1], hide_index=True)
@@ -4,8 +4,9 @@ class RefreshHandler:
     q_name = "refresh_1"
     refresh_bool = "refreshing"
 
-    def __init__(self, client_interface, interval=None):
+    def __init__(self, client_interface, interval=None, warmer=None):
         self.client_interface = client_interface
+        self.warmer = warmer
 
         if interval is None:
             interval = '5s'
@@ -69,6 +70,10 @@ class RefreshHandler:
                 return []
 
             id, required_statuses = q.pop(0)
-            if (self.client_interface.analyses.get(id)['status'] not in required_statuses):
+            analysis = self.client_interface.analyses.get(id)
+            if (analysis['status'] not in required_statuses):
                 q.insert(0, (id, required_statuses))
                 return q
+
+            if self.warmer is not None:
+                self.warmer.warm(self.client_interface, analysis)
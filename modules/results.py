@@ -0,0 +1,145 @@
+'''
+Module to share the processed outputs of an analysis between sessions.
+
+`OutputInterface.get` joins the OED fields onto an output file and maps its
+type codes, producing a new dataframe on every call. Backed by a
+`ResultStore`, each result is instead built once per process for an
+analysis, frozen and shared by every session viewing it. Callers receive
+shallow views which share the frozen numpy column arrays, so adding or
+replacing columns of a view leaves the shared result untouched and writing
+into its values raises `ValueError`. Extension array columns, e.g.
+categoricals, cannot be made read only and are copied into each view.
+'''
+import logging
+import threading
+import uuid
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from modules.artifacts import ARTIFACT_CACHE_ENTRIES, cache_shared, get_analysis_artifact
+from modules.memory import deep_size, get_memory_governor
+from modules.visualisation import OutputInterface
+
+logger = logging.getLogger(__name__)
+
+
+def freeze_dataframe(df):
+    '''
+    Dataframe sharing the column arrays of `df` with writes into numpy backed
+    columns disabled. Extension array columns are shared as is.
+    '''
+    columns = {}
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        values = column.to_numpy()
+        if isinstance(values, np.ndarray) and values.dtype == column.dtype:
+            values = values.view()
+            values.flags.writeable = False
+            columns[i] = values
+        else:
+            columns[i] = column.array
+
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.columns = df.columns
+    return frozen
+
+
+def frozen_view(frozen):
+    '''
+    Shallow copy of a `freeze_dataframe` result which cannot change it. The
+    read only numpy columns are shared and extension array columns copied.
+    '''
+    view = frozen.copy(deep=False)
+    for i, dtype in enumerate(view.dtypes):
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            view.isetitem(i, view.iloc[:, i].copy())
+    return view
+
+
+class ResultStore:
+    '''
+    Process wide store of the frozen results of an analysis, keyed by the
+    `OutputInterface.get` request.
+
+    Stored results are tracked by the `MemoryGovernor` and built again if
+    released to stay within the memory budget.
+
+    Parameters
+    ----------
+    artifact : AnalysisArtifact
+               `output_file` artifact of the analysis.
+    label : str
+            Description of the analysis in the memory usage report.
+    '''
+    def __init__(self, artifact, label='results'):
+        self.artifact = artifact
+        self.label = label
+        self._results = {}
+        self._building = {}
+        self._lock = threading.Lock()
+
+        self._governor = get_memory_governor()
+        self._token = uuid.uuid4().hex
+        weakref.finalize(self, self._governor.forget_prefix, self._token)
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key, build):
+        '''
+        View of the result `key`, frozen from `build()` on first request.
+        Concurrent first requests for a key build it once.
+        '''
+        result = self._results.get(key)
+        if result is None:
+            with self._lock:
+                key_lock = self._building.setdefault(key, threading.Lock())
+
+            try:
+                with key_lock:
+                    result = self._results.get(key)
+                    if result is None:
+                        built = build()
+                        # Measured before freezing, as pandas cannot deeply measure read only object columns
+                        size = deep_size(built)
+                        result = freeze_dataframe(built)
+                        self._results[key] = result
+                        self._track(key, size)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        else:
+            self._governor.touch((self._token, key))
+        return frozen_view(result)
+
+    def _track(self, key, size):
+        ref = weakref.ref(self)
+
+        def release():
+            store = ref()
+            if store is not None:
+                store._results.pop(key, None)
+
+        self._governor.track((self._token, key), f'{self.label} {key[0]}', size, release)
+
+    def output_interface(self):
+        '''`OutputInterface` of the analysis outputs reading results from the store.
+        '''
+        return OutputInterface(self.artifact.frames(), result_store=self)
+
+
+# Stores are read only and shared, so a single copy serves every session
+@cache_shared(show_spinner=False, max_entries=ARTIFACT_CACHE_ENTRIES)
+def get_result_store(client_interface, analysis_id, modified=None):
+    '''
+    Retrieve the process wide `ResultStore` of an analysis, or `None` if its
+    outputs are not available or the user cannot get the analysis.
+    `modified` is only used as part of the cache key so the results of a
+    modified analysis are built again.
+    '''
+    outputs = get_analysis_artifact(client_interface, analysis_id, 'output_file', modified)
+    if outputs is None:
+        return None
+    return ResultStore(outputs, label=f'analysis {analysis_id} results')
@@ -1,26 +1,221 @@
+from collections.abc import Mapping
+from itertools import product
 from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple
+import json
+import logging
 import re
+import threading
+import streamlit as st
 
-def get_analyses_settings(defaults_path=None, model_id=None, model_name_id=None,
-                          supplier_id=None):
-    if defaults_path is None:
-        defaults_path = 'defaults/'
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS_PATH = 'defaults/'
+SETTINGS_FILE_PATTERN = re.compile(r'(?P<model_id>\d+)_(?P<model_name_id>[\w-]+)_(?P<supplier_id>[A-Za-z0-9-]+)'
+                                   r'-analysis_settings\.json$', re.IGNORECASE)
+PERSPECTIVES = ['gul', 'il', 'ri']
+
+
+def freeze(obj):
+    '''Convert parsed json into read only mappings and tuples.
+    '''
+    if isinstance(obj, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    '''Convert frozen settings back into mutable dicts and lists.
+    '''
+    if isinstance(obj, Mapping):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def validate_settings(settings):
+    '''
+    Check parsed analysis settings enable at least one perspective and every
+    enabled perspective has summaries with an `id`.
+
+    Returns
+    -------
+    `str` describing the first problem found or `None` if valid.
+    '''
+    if not isinstance(settings, dict):
+        return 'Settings must be a json object.'
+
+    enabled = [p for p in PERSPECTIVES if settings.get(f'{p}_output', False)]
+    if len(enabled) == 0:
+        return 'No output perspective enabled.'
+
+    for p in enabled:
+        summaries = settings.get(f'{p}_summaries')
+        if not isinstance(summaries, list) or len(summaries) == 0:
+            return f'Missing {p}_summaries.'
+        if not all(isinstance(s, dict) and 'id' in s for s in summaries):
+            return f'Invalid {p}_summaries.'
+    return None
+
+
+class DefaultSettings(NamedTuple):
+    model_id: str
+    model_name_id: str
+    supplier_id: str
+    path: str
+    settings: Mapping
+
+
+def _normalise(value):
+    if value is None:
+        return None
+    return str(value).replace(' ', '-').lower()
+
+
+class _StaleHandler(FileSystemEventHandler):
+    # Only changes mark the registry stale, as reading the files in `load`
+    # emits open and close events
+    def __init__(self, registry):
+        self.registry = registry
+
+    def on_created(self, event):
+        self.registry.mark_stale()
 
-    defaults_path = Path(defaults_path)
+    on_deleted = on_modified = on_moved = on_created
 
-    if model_id is None:
-        model_id = r'\d+'
-    if model_name_id is None:
-        model_name_id = r'[\w-]+'
-    if supplier_id is None:
-        supplier_id = r'[\w-]+'
 
-    # Format model name and supplier name
-    model_name_id = model_name_id.replace(' ', '-')
-    supplier_id = supplier_id.replace(' ', '-')
+class SettingsRegistry:
+    '''
+    Default analysis settings in `defaults_path`, parsed and validated once
+    and indexed by `(model_id, model_name_id, supplier_id)`.
 
-    settings_pattern = f'{model_id}_{model_name_id}_{supplier_id}' + r'-analysis_settings\.json'
+    Settings files are named `{model_id}_{model_name_id}_{supplier_id}-analysis_settings.json`.
+    Lookups accept any combination of the three keys and are a single dict
+    lookup. The directory is watched for changes if `watchdog` is installed
+    and the registry reloads on the next lookup after a change.
 
-    settings_files = [str(p) for p in defaults_path.iterdir() if re.search(settings_pattern, str(p), re.IGNORECASE)]
+    Parameters
+    ----------
+    defaults_path : str
+                    Directory of the default settings files.
+    watch : bool
+            If `True` reload when the directory changes.
+    '''
+    def __init__(self, defaults_path=DEFAULTS_PATH, watch=True):
+        self.defaults_path = Path(defaults_path)
+        self._lock = threading.Lock()
+        self._stale = True
+        self._index = {}
+        self._observer = None
 
-    return settings_files
+        if watch:
+            self._watch()
+
+    def _watch(self):
+        if Observer is None or not self.defaults_path.is_dir():
+            return
+        try:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.schedule(_StaleHandler(self), str(self.defaults_path))
+            self._observer.start()
+        except OSError as e:
+            logger.warning(f'Failed to watch {self.defaults_path}: {e}')
+            self._observer = None
+
+    def mark_stale(self):
+        self._stale = True
+
+    def load(self):
+        '''Parse every settings file and rebuild the index.
+        '''
+        # Cleared first so a change while loading triggers another load
+        self._stale = False
+        index = {}
+        paths = sorted(self.defaults_path.iterdir()) if self.defaults_path.is_dir() else []
+        for path in paths:
+            match = SETTINGS_FILE_PATTERN.search(path.name)
+            if match is None:
+                continue
+
+            try:
+                with open(path, 'r') as f:
+                    settings = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f'Skipping settings file {path}: {e}')
+                continue
+
+            error = validate_settings(settings)
+            if error is not None:
+                logger.warning(f'Skipping settings file {path}: {error}')
+                continue
+
+            keys = tuple(_normalise(match[k]) for k in ['model_id', 'model_name_id', 'supplier_id'])
+            entry = DefaultSettings(*keys, str(path), freeze(settings))
+
+            # Index every combination of known and wildcard keys
+            for mask in product([True, False], repeat=3):
+                key = tuple(k if m else None for k, m in zip(keys, mask))
+                index.setdefault(key, []).append(entry)
+
+        self._index = {k: tuple(v) for k, v in index.items()}
+        logger.info(f'Loaded {len(self._index.get((None, None, None), ()))} default settings.')
+
+    def _ensure_loaded(self):
+        if self._stale:
+            with self._lock:
+                if self._stale:
+                    self.load()
+
+    def find(self, model_id=None, model_name_id=None, supplier_id=None):
+        '''Tuple of every `DefaultSettings` matching the given keys.
+        '''
+        self._ensure_loaded()
+        key = (_normalise(model_id), _normalise(model_name_id), _normalise(supplier_id))
+        return self._index.get(key, ())
+
+    def get(self, model_id=None, model_name_id=None, supplier_id=None):
+        '''First `DefaultSettings` matching the given keys or `None`.
+        '''
+        matches = self.find(model_id, model_name_id, supplier_id)
+        return matches[0] if matches else None
+
+
+@st.cache_resource(show_spinner=False)
+def get_settings_registry(defaults_path=DEFAULTS_PATH):
+    '''Retrieve the process wide `SettingsRegistry` of `defaults_path`.
+    '''
+    return SettingsRegistry(defaults_path)
+
+
+def get_default_settings(model_id=None, model_name_id=None, supplier_id=None,
+                         defaults_path=DEFAULTS_PATH):
+    '''
+    Mutable copy of the first default analysis settings matching the keys or
+    `None` if there are none.
+    '''
+    entry = get_settings_registry(defaults_path).get(model_id, model_name_id, supplier_id)
+    if entry is None:
+        return None
+    return thaw(entry.settings)
+
+
+def get_analyses_settings(defaults_path=None, model_id=None, model_name_id=None,
+                          supplier_id=None):
+    '''List of the paths of the default settings files matching the keys.
+    '''
+    if defaults_path is None:
+        defaults_path = DEFAULTS_PATH
+    matches = get_settings_registry(str(defaults_path)).find(model_id, model_name_id, supplier_id)
+    return [m.path for m in matches]
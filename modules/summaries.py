@@ -0,0 +1,251 @@
+'''
+Module to materialise compact summaries of the results of an analysis.
+'''
+import io
+import json
+import pandas as pd
+import logging
+
+from modules.artifacts import (artifact_cache_dir, artifact_cache_path, cache_shared,
+                               get_analysis_artifact, persist_bytes, read_persisted_bytes)
+from modules.visualisation import TYPE_MAP
+
+logger = logging.getLogger(__name__)
+
+TOP_N_EVENTS = 10
+# Version of the persisted summary layout, files of other versions are built again
+SUMMARY_FORMAT = 1
+BREAKDOWN_FIELDS = ['CountryCode', 'LocNumber']
+PERSPECTIVES = ['gul', 'il', 'ri']
+
+# Output files in order of preference: (file suffix, summary id, event id, type, loss)
+AAL_FILES = [
+    ('aalcalc', 'summary_id', None, 'type', 'mean'),
+    ('altmeanonly', 'SummaryId', None, 'SampleType', 'MeanLoss'),
+]
+EVENT_LOSS_FILES = [
+    ('eltcalc', 'summary_id', 'event_id', 'type', 'mean'),
+    ('melt', 'SummaryId', 'EventId', 'SampleType', 'MeanLoss'),
+]
+
+
+def summarise_locations(locations):
+    '''
+    Number of locations and total insured values of a `location.csv`
+    dataframe as a single row dataframe.
+    '''
+    summary = pd.Series()
+
+    # summary info
+    summary['number_locations'] = locations.shape[0]
+
+    # add tiv sums
+    tiv_cols = ['BuildingTIV', 'OtherTIV', 'ContentsTIV', 'BITIV']
+    tiv_cols = [c for c in tiv_cols if c in locations.columns]
+    sums = locations[tiv_cols].sum()
+    summary = pd.concat((summary, sums))
+
+    summary['TotalTIV'] = sums.sum()
+
+    return pd.DataFrame(summary).T
+
+
+def _find_output(get_frame, perspective, candidates, summary_level=1):
+    for spec in candidates:
+        result = get_frame(f'{perspective}_S{summary_level}_{spec[0]}.csv')
+        if result is not None:
+            return result, spec
+    return None, None
+
+
+def summarise_aal(get_frame, perspective):
+    '''
+    Total average annual loss of `perspective` for each loss type.
+
+    Parameters
+    ----------
+    get_frame : Callable
+                Returns the dataframe of an output file name, or `None`.
+    perspective : str
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns `type` and `mean`, or `None` if no AAL output exists.
+    '''
+    result, spec = _find_output(get_frame, perspective, AAL_FILES)
+    if result is None:
+        return None
+    _, _, _, type_col, loss_col = spec
+
+    aal = result.groupby(type_col, as_index=False)[loss_col].sum()
+    aal.columns = ['type', 'mean']
+    aal['type'] = aal['type'].replace(TYPE_MAP)
+    return aal
+
+
+def summarise_event_losses(get_frame, perspective, top_n=TOP_N_EVENTS,
+                           breakdown_fields=None):
+    '''
+    Largest event losses of `perspective` and the total loss broken down by
+    each of `breakdown_fields` found in the summary info.
+
+    Sample losses are used where present, matching the maps shown in the
+    output views.
+
+    Returns
+    -------
+    top_events : pd.DataFrame
+                 Columns `event_id` and `mean` of the `top_n` events.
+    breakdowns : dict
+                 `pd.DataFrame` of the loss per value of each breakdown field.
+    '''
+    if breakdown_fields is None:
+        breakdown_fields = BREAKDOWN_FIELDS
+
+    result, spec = _find_output(get_frame, perspective, EVENT_LOSS_FILES)
+    if result is None:
+        return None, {}
+    _, summary_col, event_col, type_col, loss_col = spec
+
+    if (result[type_col] == 2).any():
+        result = result[result[type_col] == 2]
+
+    top_events = result.groupby(event_col)[loss_col].sum().nlargest(top_n)
+    top_events = pd.DataFrame({'event_id': top_events.index, 'mean': top_events.to_numpy()})
+
+    breakdowns = {}
+    summary_info = get_frame(f'{perspective}_S1_summary-info.csv')
+    if summary_info is not None:
+        summary_loss = result.groupby(summary_col)[loss_col].sum()
+        summary_info = summary_info.set_index('summary_id')
+        for field in breakdown_fields:
+            if field not in summary_info.columns:
+                continue
+            field_values = summary_info[field].reindex(summary_loss.index)
+            breakdown = summary_loss.groupby(field_values).sum().sort_values(ascending=False)
+            breakdowns[field] = pd.DataFrame({field: breakdown.index, 'mean': breakdown.to_numpy()})
+
+    return top_events, breakdowns
+
+
+class ResultsSummary:
+    '''
+    Compact summary of the results of a completed analysis, small enough to
+    display instantly before any full output table is loaded.
+
+    Attributes:
+        exposure: Output of `summarise_locations` or `None`.
+        aal: dict of perspective to the output of `summarise_aal`.
+        top_events: dict of perspective to the largest event losses.
+        breakdowns: dict of perspective to a dict of loss per OED field value.
+    '''
+    def __init__(self, locations=None, get_frame=None, top_n=TOP_N_EVENTS):
+        self.exposure = summarise_locations(locations) if locations is not None else None
+        self.aal = {}
+        self.top_events = {}
+        self.breakdowns = {}
+
+        if get_frame is None:
+            return
+
+        for p in PERSPECTIVES:
+            aal = summarise_aal(get_frame, p)
+            if aal is not None:
+                self.aal[p] = aal
+
+            top_events, breakdowns = summarise_event_losses(get_frame, p, top_n=top_n)
+            if top_events is not None:
+                self.top_events[p] = top_events
+                self.breakdowns[p] = breakdowns
+
+    @property
+    def perspectives(self):
+        return [p for p in PERSPECTIVES if p in self.aal or p in self.top_events]
+
+    def to_json(self):
+        '''
+        Serialise the summary as JSON, with each table in the JSON Table Schema
+        layout so its dtypes are restored by `from_json`.
+        '''
+        def table(df):
+            return json.loads(df.to_json(orient='table', index=False))
+
+        return json.dumps({
+            'format': SUMMARY_FORMAT,
+            'exposure': table(self.exposure) if self.exposure is not None else None,
+            'aal': {p: table(df) for p, df in self.aal.items()},
+            'top_events': {p: table(df) for p, df in self.top_events.items()},
+            'breakdowns': {p: {field: table(df) for field, df in breakdowns.items()}
+                           for p, breakdowns in self.breakdowns.items()},
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        '''
+        Summary serialised by `to_json`. Raises `ValueError` if `text` is not a
+        summary of the current `SUMMARY_FORMAT`.
+        '''
+        data = json.loads(text)
+        if not isinstance(data, dict) or data.get('format') != SUMMARY_FORMAT:
+            raise ValueError('Not a results summary of the current format')
+
+        def table(value):
+            return pd.read_json(io.StringIO(json.dumps(value)), orient='table')
+
+        summary = cls()
+        summary.exposure = table(data['exposure']) if data['exposure'] is not None else None
+        summary.aal = {p: table(v) for p, v in data['aal'].items()}
+        summary.top_events = {p: table(v) for p, v in data['top_events'].items()}
+        summary.breakdowns = {p: {field: table(v) for field, v in breakdowns.items()}
+                              for p, breakdowns in data['breakdowns'].items()}
+        return summary
+
+    @classmethod
+    def from_artifacts(cls, inputs=None, outputs=None, top_n=TOP_N_EVENTS):
+        '''
+        Summarise the `AnalysisArtifact`s of an analysis. Only the output files
+        used by the summary are parsed.
+        '''
+        locations = inputs.dataframe('location.csv') if inputs is not None else None
+        get_frame = outputs.dataframe if outputs is not None else None
+        return cls(locations, get_frame, top_n=top_n)
+
+
+def _read_summary(path):
+    try:
+        return ResultsSummary.from_json(read_persisted_bytes(path).decode())
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"Failed to read results summary {path}: {e}")
+        return None
+
+
+@cache_shared(show_spinner=False, max_entries=256)
+def get_results_summary(client_interface, analysis_id, modified=None):
+    '''
+    Retrieve the `ResultsSummary` of an analysis shared by every session of
+    the users who can get the analysis, built from the shared
+    `get_analysis_artifact` cache.
+
+    If `OASIS_UI_CACHE_DIR` is set, the summary is persisted as JSON
+    alongside the artifacts and read from it after a restart instead of
+    being built from the full outputs again.
+    '''
+    cache_dir = artifact_cache_dir()
+    path = None
+    if cache_dir and modified is not None:
+        path = artifact_cache_path(cache_dir, analysis_id, 'summary', modified, suffix='.json')
+
+    if path is not None and path.is_file():
+        summary = _read_summary(path)
+        if summary is not None:
+            logger.info(f"Loaded results summary of analysis {analysis_id} from {path}.")
+            return summary
+
+    logger.info(f"Summarising results of analysis {analysis_id}.")
+    inputs = get_analysis_artifact(client_interface, analysis_id, 'input_file', modified)
+    outputs = get_analysis_artifact(client_interface, analysis_id, 'output_file', modified)
+    summary = ResultsSummary.from_artifacts(inputs, outputs)
+    if path is not None:
+        persist_bytes(path, summary.to_json().encode())
+    return summary
@@ -139,6 +139,18 @@ class LenValidation(Validation):
         return True
 
 
+class MinLenValidation(Validation):
+    def __init__(self, pname="Parameter"):
+        self.message = f'{pname} is too small.'
+        super().__init__(self.message)
+
+    @staticmethod
+    def validation_func(param, required_n):
+        if len(param) < required_n:
+            return False
+        return True
+
+
 class ValidationGroup:
     def __init__(self, validations=None, args=None):
         if validations is None:
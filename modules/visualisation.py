@@ -1,8 +1,9 @@
 from oasis_data_manager.errors import OasisException
-import plotly.express as px
 import logging
 import streamlit as st
 
+from modules.profiling import profiled
+
 logger = logging.getLogger(__name__)
 
 TYPE_MAP = {
@@ -11,20 +12,26 @@ TYPE_MAP = {
 }
 
 class OutputInterface:
-    def __init__(self, output_file_dict):
+    def __init__(self, output_file_dict, result_store=None):
         '''
         Parameters
         ----------
         output_file_dict : dict
                            Dictionary of output files as pd.DataFrames with the
                            key as the output file name.
+        result_store : ResultStore
+                       Shared store the results of `get` are built once in
+                       and read from, if set. Results are then read only
+                       views.
         '''
         self.output_file_dict = output_file_dict
+        self.result_store = result_store
         self.oed_fields = {}
 
     def set_oed_fields(self, perspective, oed_fields):
         self.oed_fields[perspective] = oed_fields
 
+    @profiled()
     def get(self, summary_level, perspective, output_type, **kwargs):
         '''
         Generate graph from the output file.
@@ -75,6 +82,15 @@ class OutputInterface:
 
         fname = self._request_to_fname(summary_level, perspective, output_type,
                                            **kwargs)
+        if self.result_store is None:
+            return self._generate(fname, summary_level, perspective, output_type, **kwargs)
+
+        key = (fname, output_type, tuple(self.oed_fields.get(perspective) or ()),
+               tuple(sorted(kwargs.items())))
+        return self.result_store.get(key, lambda: self._generate(fname, summary_level, perspective,
+                                                                 output_type, **kwargs))
+
+    def _generate(self, fname, summary_level, perspective, output_type, **kwargs):
         results = self.output_file_dict.get(fname)
         if results is None:
             logger.error(f'Failed to find output file: {fname}')
@@ -126,28 +142,28 @@ class OutputInterface:
 
     @staticmethod
     def generate_eltcalc(results, **kwargs):
-        results['type'] = results['type'].replace(TYPE_MAP)
+        results = results.assign(type=results['type'].replace(TYPE_MAP))
         return results
 
     @staticmethod
     def generate_aalcalc(results, **kwargs):
-        results['type'] = results['type'].replace(TYPE_MAP)
+        results = results.assign(type=results['type'].replace(TYPE_MAP))
         return results
 
     @staticmethod
     def generate_leccalc(results, **kwargs):
         if 'type' in results.columns:
-            results['type'] = results['type'].replace(TYPE_MAP)
+            results = results.assign(type=results['type'].replace(TYPE_MAP))
         return results
 
     @staticmethod
     def generate_pltcalc(results, **kwargs):
-        results['type'] = results['type'].replace(TYPE_MAP)
+        results = results.assign(type=results['type'].replace(TYPE_MAP))
         return results
 
     @staticmethod
     def generate_elt_moment(results, **kwargs):
-        results['SampleType'] = results['SampleType'].replace(TYPE_MAP)
+        results = results.assign(SampleType=results['SampleType'].replace(TYPE_MAP))
         return results
 
     @staticmethod
@@ -164,7 +180,7 @@ class OutputInterface:
 
     @staticmethod
     def generate_plt_moment(results, **kwargs):
-        results['SampleType'] = results['SampleType'].replace(TYPE_MAP)
+        results = results.assign(SampleType=results['SampleType'].replace(TYPE_MAP))
         return results
 
     @staticmethod
@@ -173,12 +189,12 @@ class OutputInterface:
 
     @staticmethod
     def generate_alt_meanonly(results, **kwargs):
-        results['SampleType'] = results['SampleType'].replace(TYPE_MAP)
+        results = results.assign(SampleType=results['SampleType'].replace(TYPE_MAP))
         return results
 
     @staticmethod
     def generate_alt_period(results, **kwargs):
-        results['SampleType'] = results['SampleType'].replace(TYPE_MAP)
+        results = results.assign(SampleType=results['SampleType'].replace(TYPE_MAP))
         return results
 
     @staticmethod
@@ -0,0 +1,79 @@
+'''
+Module to prefetch the artifacts of completed analyses in the background.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import streamlit as st
+import logging
+
+from modules.artifacts import get_analysis_artifact
+from modules.summaries import get_results_summary
+
+logger = logging.getLogger(__name__)
+
+WARMER_MAX_WORKERS = 2
+
+
+class CacheWarmer:
+    '''
+    Background worker which downloads and parses the input and output files
+    of completed analyses into the shared `get_analysis_artifact` cache and
+    materialises their `get_results_summary`, so the first view of a fresh
+    result is as fast as a repeat view.
+
+    Parameters
+    ----------
+    max_workers : int
+                  Maximum number of analyses warmed concurrently.
+    '''
+    def __init__(self, max_workers=WARMER_MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='cache-warmer')
+        self._lock = threading.Lock()
+        self._submitted = set()
+
+    def warm(self, client_interface, analysis):
+        '''
+        Queue `analysis` to be warmed. Each `(id, modified)` pair is only
+        warmed once.
+
+        Parameters
+        ----------
+        client_interface : ClientInterface
+        analysis : dict
+                   Analysis as returned by the analyses endpoint.
+
+        Returns
+        -------
+        `Future` of the warming task or `None` if already submitted.
+        '''
+        if analysis.get('status') != 'RUN_COMPLETED':
+            return None
+
+        key = (analysis['id'], analysis.get('modified'))
+        with self._lock:
+            if key in self._submitted:
+                return None
+            self._submitted.add(key)
+
+        return self.executor.submit(self._warm, client_interface, *key)
+
+    def _warm(self, client_interface, analysis_id, modified):
+        try:
+            get_results_summary(client_interface, analysis_id, modified)
+
+            outputs = get_analysis_artifact(client_interface, analysis_id, 'output_file', modified)
+            if outputs is not None:
+                outputs.dataframes()
+            logger.info(f"Warmed cache for analysis {analysis_id}.")
+        except Exception as e:
+            logger.error(f"Failed to warm cache for analysis {analysis_id}: {e}")
+            with self._lock:
+                self._submitted.discard((analysis_id, modified))
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache_warmer():
+    '''Retrieve the process wide `CacheWarmer`.
+    '''
+    return CacheWarmer()
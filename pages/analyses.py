@@ -1,21 +1,24 @@
-from modules.settings import get_analyses_settings
+from modules.settings import get_default_settings
+from modules.artifacts import get_analysis_artifact
 from modules.authorisation import validate_page, handle_login
 from oasis_data_manager.errors import OasisException
 import streamlit as st
 from requests.exceptions import HTTPError
 from modules.nav import SidebarNav
 from modules.rerun import RefreshHandler
+from modules.warmer import get_cache_warmer
 from modules.validation import KeyInValuesValidation, KeyNotNoneValidation, KeyValueValidation, NotNoneValidation, ValidationGroup
 from modules.config import retrieve_ui_config
 import json
 from json import JSONDecodeError
 import time
+import pandas as pd
 from pages.components.create import consume_analysis_settings, create_analysis_form, create_portfolio_form, produce_analysis_settings
-from pages.components.display import DataframeView
+from pages.components.display import DataframeView, artifact_download
 import logging
 
 from pages.components.logs import display_traceback_file
-from pages.components.process import enrich_analyses
+from pages.components.process import enrich_analyses, list_models, list_portfolios
 from pages.components.output import summarise_inputs
 
 logger = logging.getLogger(__name__)
@@ -47,12 +50,15 @@ SidebarNav()
 client_interface = st.session_state["client_interface"]
 client = client_interface.client
 
+# Listed once per run, the fragment below lists them again on timed refreshes
+portfolios = list_portfolios(client_interface)
+
 "## Portfolios"
 
-def show_portfolio():
+def show_portfolio(portfolios):
     display_cols = [ 'name' ]
 
-    portfolios = client_interface.portfolios.get(df=True)
+    portfolios = pd.json_normalize(portfolios)
     portfolio_view = DataframeView(portfolios, display_cols=display_cols)
     portfolio_view.display()
 
@@ -72,13 +78,14 @@ def create_portfolio():
                                                reinsurance_scope_file = form_data.get('reinsurance_scope_file')
                                                )
         st.success("Successfully created portfolio")
+        list_portfolios.clear()
         time.sleep(0.5)
         st.rerun()
     except HTTPError as e:
         st.error(e)
 
 st.write("Available Portfolios: ")
-show_portfolio()
+show_portfolio(portfolios)
 if st.button("Create Portfolio"):
     create_portfolio()
 
@@ -91,10 +98,7 @@ analysis_container = st.container()
 rerun_interval_analysis = None
 
 @st.fragment
-def new_analysis():
-    portfolios = client_interface.portfolios.get()
-    models = client_interface.models.get()
-
+def new_analysis(portfolios, models):
     resp = create_analysis_form(portfolios, models)
     if resp:
         try:
@@ -107,17 +111,15 @@ def new_analysis():
 
 def analysis_summary_expander(selected):
     analysis_id = selected['id']
+    modified = selected.get('modified')
     with st.expander("Analysis Summary"):
 
         summary_tab, inputs_tab, outputs_tab = st.tabs(["Summary", "Inputs", "Outputs"])
 
-        @st.cache_data(show_spinner="Fetching input data...")
-        def get_input_file(analysis_id):
-            return client_interface.analyses.get_file(analysis_id, 'input_file', df=True)
+        with st.spinner("Fetching input data..."):
+            inputs = get_analysis_artifact(client_interface, analysis_id, 'input_file', modified)
 
-        inputs = get_input_file(analysis_id)
-
-        locations = inputs.get('location.csv', None)
+        locations = inputs.dataframe('location.csv') if inputs is not None else None
         if client.analyses.get(analysis_id).json().get('settings') is not None:
             a_settings = client.analyses.settings.get(analysis_id).json()
         else:
@@ -126,60 +128,28 @@ def analysis_summary_expander(selected):
         with summary_tab:
             summarise_inputs(locations, a_settings)
 
-        @st.cache_data
-        def convert_df(df):
-            return df.to_csv().encode("utf-8")
-
         with inputs_tab:
-            input_file_list = sorted(list(inputs.keys()))
-
-            st.write("Input files:")
-            for fname in input_file_list:
-
-                left, right, _ = st.columns([1, 1, 1])
-                left.write(fname)
-                right.download_button("Download", convert_df(inputs[fname]),
-                                      key=f'download_{fname}',
-                                      file_name=fname)
-
-
-        @st.cache_data(show_spinner="Fetching output data...")
-        def get_output_file(analysis_id):
-            return client_interface.analyses.get_file(analysis_id, 'output_file', df=True)
-
-        if selected['status'] == 'RUN_COMPLETED':
-            outputs = get_output_file(analysis_id)
-            with outputs_tab:
-                output_file_list = sorted(list(outputs.keys()))
+            if inputs is None:
+                st.info("Input files not available.")
+            else:
+                st.write("Input files:")
+                artifact_download(inputs, key=f'inputs_{analysis_id}')
 
+        with outputs_tab:
+            if selected['status'] == 'RUN_COMPLETED':
+                with st.spinner("Fetching output data..."):
+                    outputs = get_analysis_artifact(client_interface, analysis_id, 'output_file', modified)
                 st.write("Output files:")
-                for fname in output_file_list:
-
-                    left, right, _ = st.columns([1, 1, 1])
-                    left.write(fname)
-                    right.download_button("Download", convert_df(outputs[fname]),
-                                          key=f'download_{fname}',
-                                          file_name=fname)
-
-                fname = f"analysis_{analysis_id}_output.tar.gz"
-                @st.cache_data(show_spinner="Fetching output tar data...")
-                def get_output_tar(analysis_id):
-                    return client_interface.download_output(analysis_id)
-                fdata = get_output_tar(analysis_id)
-
-                st.download_button('Download All Outputs',
-                                   data=fdata,
-                                   file_name=fname)
-        else:
-            outputs = None
-            with outputs_tab:
+                artifact_download(outputs, key=f'outputs_{analysis_id}',
+                                  archive_name=f"analysis_{analysis_id}_output.tar.gz")
+            else:
                 st.info("Run not complete.")
 
 
-def run_analysis(re_handler):
+def run_analysis(re_handler, portfolios, models):
     analyses = client_interface.analyses.get(df=True)
-    portfolios = client_interface.portfolios.get(df=True)
-    models = client_interface.models.get(df=True)
+    portfolios = pd.json_normalize(portfolios)
+    models = pd.json_normalize(models)
 
     completed_statuses = ['RUN_COMPLETED', 'RUN_CANCELLED', 'RUN_ERROR']
     running_statuses = ['RUN_QUEUED', 'RUN_STARTED']
@@ -195,8 +165,6 @@ def run_analysis(re_handler):
     left, middle, right = st.columns(3, vertical_alignment='center')
     st.write('1) Select an analysis:')
 
-    portfolios = client_interface.portfolios.get(df=True)
-    models = client_interface.models.get(df=True)
     analyses = enrich_analyses(analyses, portfolios, models).sort_values('id', ascending=False)
 
     display_cols = ['name', 'portfolio_name', 'model_id', 'model_supplier', 'status']
@@ -268,13 +236,8 @@ def run_analysis(re_handler):
         try:
             default_settings = client_interface.analyses.settings.get(analysis['id'])
         except HTTPError as _:
-            default_paths = get_analyses_settings(model_name_id=model["model_id"], supplier_id=model["supplier_id"])
-
-            if default_paths:
-                with open(default_paths[0], 'r') as f:
-                    default_settings = json.load(f)
-            else:
-                default_settings = None
+            default_settings = get_default_settings(model_name_id=model["model_id"],
+                                                    supplier_id=model["supplier_id"])
 
         produce_analysis_settings(model, model_settings,
                                   oed_fields=valid_oed_fields,
@@ -396,17 +359,22 @@ def run_analysis(re_handler):
 
 
 # Initialise refreshing
-re_handler = RefreshHandler(client_interface)
+warmer = get_cache_warmer() if ui_config.cache_warmer else None
+re_handler = RefreshHandler(client_interface, warmer=warmer)
 run_every = re_handler.run_every()
 
 @st.fragment(run_every=run_every)
 def analysis_fragment():
+    # Listed within the fragment so refreshes join against current lists
+    portfolios = list_portfolios(client_interface)
+    models = list_models(client_interface)
+
     run_analysis_tab, create_analysis_tab = st.tabs(["Run Analysis", "Create Analysis"])
     with create_analysis_tab:
-        new_analysis()
+        new_analysis(portfolios, models)
 
     with run_analysis_tab:
-        run_analysis(re_handler)
+        run_analysis(re_handler, portfolios, models)
 
 analysis_fragment()
 if run_every is not None:
@@ -1,10 +1,11 @@
 from modules.authorisation import validate_page, handle_login
-from modules.visualisation import OutputInterface
+from modules.comparison import ComparisonSession
 import streamlit as st
 import pandas as pd
 from modules.nav import SidebarNav
 from modules.config import retrieve_ui_config
-from modules.validation import LenValidation, NotNoneValidation, ValidationGroup
+from modules.memory import register_data_cache
+from modules.validation import MinLenValidation, NotNoneValidation, ValidationGroup
 from pages.components.display import DataframeView
 from pages.components.output import generate_aalcalc_comparison_fragment, generate_leccalc_comparison_fragment
 from pages.components.output import generate_eltcalc_comparison_fragment, summarise_inputs
@@ -37,37 +38,26 @@ SidebarNav()
 client_interface = st.session_state["client_interface"]
 client = client_interface.client
 
-'## Compare two scenario loss estimates'
-'This tool enables two analyses to be compared to look at the difference in, for example - change in exposure, hazard or vulnerability.'
+'## Compare scenario loss estimates'
+'This tool enables analyses to be compared to look at the difference in, for example - change in exposure, hazard or vulnerability.'
 'A use case for this, would be to compare loss from flood in an area defended by a different level of flood protection, or no flood protection.'
-'It can also be used to test the impact of two different hazard scenarios, different vulnerability of the buildings in the portfolio, or of a different value/number of buildings in that portfolio.'
+'It can also be used to test the impact of different hazard scenarios, different vulnerability of the buildings in the portfolio, or of a different value/number of buildings in that portfolio.'
 
-"First, select two analyses, from the precomputed set. To add an analysis to the list, run it in the 'Scenario' tool."
+"First, select two or more analyses, from the precomputed set. To add an analysis to the list, run it in the 'Scenario' tool."
 'Currently, it is not possible to add your own scenarios directly; please describe any scenario you would like to add, here: https://github.com/OasisLMF/OasisPythonUI/issues'
 
 
 analyses = sorted(client_interface.analyses.search(metadata={'status': 'RUN_COMPLETED'}), key=lambda x: x['id'], reverse=True)
-cols = st.columns(2)
-selected = []
-with cols[0]:
-    selected_analysis = st.selectbox("Select Analysis 1", options=analyses,
-                            format_func= lambda x : x['name'], index=None)
-    if selected_analysis:
-        selected.append(selected_analysis)
-with cols[1]:
-    selected_analysis = st.selectbox("Select Analysis 2", options=analyses,
-                            format_func= lambda x : x['name'], index=None)
-    if selected_analysis:
-        selected.append(selected_analysis)
-
+selected = st.multiselect("Select Analyses", options=analyses,
+                          format_func= lambda x : x['name'])
 
 validations = ValidationGroup()
 none_validation = NotNoneValidation()
-none_validation.message = 'Select 2 analyses.'
+none_validation.message = 'Select at least 2 analyses.'
 validations.add_validation(none_validation, selected)
-len_validation = LenValidation()
-len_validation.message = 'Select 2 analyses.'
-validations.add_validation(len_validation, selected, 2)
+min_validation = MinLenValidation()
+min_validation.message = 'Select at least 2 analyses.'
+validations.add_validation(min_validation, selected, 2)
 
 if not validations.is_valid():
     st.info(validations.message)
@@ -75,7 +65,8 @@ if not validations.is_valid():
 
 selected = pd.DataFrame(selected)
 
-analysis_ids = [selected['id'][i] for i in range(2)]
+analysis_ids = selected['id'].tolist()
+n_analyses = len(analysis_ids)
 
 st.subheader("Analysis Summary")
 st.markdown("""
@@ -85,55 +76,40 @@ Under 'output settings', 'gul' referes to ground up loss, before insurance contr
 Annual Average Loss has been estimated; 'eltcalc' denotes that the per-event loss has been estimated.
 """)
 
-expander = st.expander('Analysis Summary')
-with expander:
-    cols = st.columns(2)
-@st.cache_data
-def get_analysis_inputs(ID):
-    return client_interface.analyses.get_file(ID, 'input_file', df=True)
-
-@st.cache_data
-def get_analysis_outputs(ID):
-    return client_interface.analyses.get_file(ID, 'output_file', df=True)
+def get_comparison_session(analyses):
+    '''Comparison session of the selected analyses, reused across reruns.'''
+    key = ComparisonSession.session_key(analyses)
+    session = st.session_state.get('comparison_session')
+    if session is None or session.key != key:
+        session = ComparisonSession(client_interface, analyses)
+        st.session_state['comparison_session'] = session
+    return session
 
-settings = []
-with cols[0]:
-    st.write(f"## {selected['name'][0]}")
-    with st.spinner("Loading data..."):
-        inputs = get_analysis_inputs(analysis_ids[0])
-        settings.append(client.analyses.settings.get(analysis_ids[0]).json())
+with st.spinner("Loading data..."):
+    session = get_comparison_session(selected.to_dict('records'))
 
-    with st.spinner('Loading analysis summary...'):
-        summarise_inputs(inputs.get('location.csv', None), settings[0], title_prefix='###')
+settings = session.settings
+session_locations = session.locations()
 
-with cols[1]:
-    st.write(f"## {selected['name'][1]}")
-    with st.spinner("Loading data..."):
-        inputs = get_analysis_inputs(analysis_ids[1])
-        settings.append(client.analyses.settings.get(analysis_ids[1]).json())
-
-    with st.spinner('Loading analysis summary...'):
-        summarise_inputs(inputs.get('location.csv', None), settings[1], title_prefix='###')
+expander = st.expander('Analysis Summary')
+with expander:
+    cols = st.columns(n_analyses)
 
-@st.cache_data
-def get_locations_file(ID):
-    inputs = client_interface.analyses.get_file(ID, 'input_file', df=True)
-    if inputs:
-        return inputs.get('location.csv')
-    return None
+for i, col in enumerate(cols):
+    with col:
+        st.write(f"## {selected['name'][i]}")
+        with st.spinner('Loading analysis summary...'):
+            summarise_inputs(session_locations[i], settings[i], title_prefix='###')
 
+@register_data_cache
 @st.cache_data
-def merge_locations(locations_1, locations_2):
-    if locations_1 is None or locations_2 is None:
+def merge_locations(*locations):
+    if any(loc is None for loc in locations):
         return None
-    locations_1 = locations_1[['LocNumber', 'Longitude', 'Latitude']]
-    locations_2 = locations_2[['LocNumber', 'Longitude', 'Latitude']]
-
-    locations = pd.merge(left=locations_1, right=locations_2, how='outer',
-                         on='LocNumber', suffixes=('_left', '_right'))
-    locations['Latitude'] = locations[['Latitude_left', 'Latitude_right']].mean(axis=1)
-    locations['Longitude'] = locations[['Longitude_left', 'Longitude_right']].mean(axis=1)
-    locations = locations[['LocNumber', 'Latitude', 'Longitude']]
+    cols = ['LocNumber', 'Longitude', 'Latitude']
+    locations = pd.concat([loc[cols] for loc in locations])
+    locations = locations.groupby('LocNumber', as_index=False).agg({'Latitude': 'mean',
+                                                                   'Longitude': 'mean'})
     return locations
 
 perspectives = ['gul', 'il', 'ri']
@@ -159,13 +135,7 @@ for p in perspectives:
     if no_outputs:
         st.error('No comparison available.')
 
-    with st.spinner("Loading data..."):
-        outputs = [OutputInterface(get_analysis_outputs(id)) for id in analysis_ids]
-
-    for output, s in zip(outputs, summaries):
-        oed_fields = s.get('oed_fields', None)
-        if oed_fields is not None:
-            output.set_oed_fields(p, oed_fields)
+    outputs = session.outputs(p)
 
     if all([s.get('aalcalc', False) for s in summaries]):
         st.write("### Mean loss comparison chart")
@@ -173,8 +143,7 @@ for p in perspectives:
 
     if all([s.get('eltcalc', False) for s in summaries]):
         st.write("### Per-location loss estimates")
-        locations = [get_locations_file(id) for id in analysis_ids]
-        locations = merge_locations(*locations)
+        locations = merge_locations(*session_locations)
 
         generate_eltcalc_comparison_fragment(p, outputs, names=names,
                                              locations=locations)
@@ -3,6 +3,7 @@ from copy import copy
 from pages.components.output import ViewSummarySettings, summarise_summary_level
 import streamlit as st
 from modules.validation import NameValidation, NotNoneValidation, ValidationError, ValidationGroup
+from modules.oed_validation import issues_dataframe, validate_portfolio_files
 
 
 class FormFragment():
@@ -98,7 +99,7 @@ def create_portfolio_form():
             st.error(validation.message)
             return None
 
-        return {
+        portfolio = {
                 'name': name,
                 'location_file': filesDict.get(loc_file),
                 'accounts_file': filesDict.get(acc_file),
@@ -106,6 +107,15 @@ def create_portfolio_form():
                 'reinsurance_scope_file': filesDict.get(rs_file)
         }
 
+        with st.spinner("Validating portfolio files..."):
+            issues = validate_portfolio_files(portfolio)
+        if issues:
+            st.error("Portfolio files failed validation.")
+            st.dataframe(issues_dataframe(issues), hide_index=True)
+            return None
+
+        return portfolio
+
 
 
 class ModelSettingsFragment:
@@ -1,16 +1,208 @@
 # Module to display inputs and views from api
 from oasis_data_manager.errors import OasisException
 import pandas as pd
+import numpy as np
 import streamlit as st
-import pydeck as pdk
-import plotly.express as px
-import geopandas
 from streamlit import column_config
 
+from modules.assets import get_zoom_levels
+from modules.geometry import get_country_geometries
 from modules.logging import get_session_logger
 
 logger = get_session_logger()
 
+STATUS_MARKERS = {
+    'READY': '🟢',
+    'RUN_STARTED': '🟡',
+    'RUN_CANCELLED': '🔴',
+    'RUN_ERROR': '🔴',
+}
+
+
+def format_status_column(status):
+    '''
+    Convert a column of analysis statuses into display labels, e.g.
+    `RUN_ERROR` becomes `🔴 Run Error`.
+
+    The labels are computed once per unique status and returned as a
+    categorical column, so the cost does not grow with the number of rows and
+    no per-cell `Styler` callbacks are needed.
+
+    Parameters
+    ----------
+    status : pd.Series
+             Column of status strings.
+
+    Returns
+    -------
+    pd.Series
+    '''
+    status = status.astype('category')
+
+    def format_status(s):
+        label = str(s).replace('_', ' ').title()
+        marker = STATUS_MARKERS.get(s)
+        if marker:
+            label = f'{marker} {label}'
+        return label
+
+    labels = [format_status(s) for s in status.cat.categories]
+    return status.cat.rename_categories(labels)
+
+
+MAP_BIN_THRESHOLD = 10000
+MAP_CELL_PIXELS = 4
+MAP_TILE_PIXELS = 256
+
+
+def find_zoom_level(lon_range):
+    '''
+    Find the map zoom level at which a longitude range fits in a single tile.
+    '''
+    zooms = np.flatnonzero(get_zoom_levels() < lon_range)
+    if len(zooms) == 0:
+        return 18
+    return min(max(int(zooms[0]) - 1, 0), 18)
+
+
+def bin_locations(data, longitude="Longitude", latitude="Latitude", weights=None,
+                  zoom=0, cell_pixels=MAP_CELL_PIXELS, count_col='count'):
+    '''
+    Aggregate locations onto a longitude/latitude grid.
+
+    The grid cell size is `cell_pixels` screen pixels at the map `zoom` level,
+    so the number of cells is bounded by the screen resolution rather than the
+    number of locations. Each cell is represented by the mean position of its
+    locations.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+           Locations data.
+    longitude : str
+                Longitude column name in `data`.
+    latitude : str
+               Latitude column name in `data`.
+    weights : list[str]
+              Columns in `data` summed in each cell.
+    zoom : int
+           Map zoom level, see `find_zoom_level`.
+    cell_pixels : int
+                  Width of a grid cell in pixels.
+    count_col : str
+                Name of the column holding the number of locations in each
+                cell.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per non-empty cell with `longitude`, `latitude`, `weights` and
+        `count_col` columns.
+    '''
+    if weights is None:
+        weights = []
+
+    lon = data[longitude].to_numpy(dtype='float64')
+    lat = data[latitude].to_numpy(dtype='float64')
+    valid = ~(np.isnan(lon) | np.isnan(lat))
+    lon = lon[valid]
+    lat = lat[valid]
+
+    cell_size = 360 / 2**zoom / MAP_TILE_PIXELS * cell_pixels
+    lon_idx = np.floor((lon + 180) / cell_size).astype('int64')
+    lat_idx = np.floor((lat + 90) / cell_size).astype('int64')
+    n_lat_cells = int(np.ceil(180 / cell_size)) + 1
+    cells, uniques = pd.factorize(lon_idx * n_lat_cells + lat_idx)
+
+    counts = np.bincount(cells, minlength=len(uniques))
+    binned = {
+        longitude: np.bincount(cells, weights=lon, minlength=len(uniques)) / counts,
+        latitude: np.bincount(cells, weights=lat, minlength=len(uniques)) / counts,
+    }
+    for w in weights:
+        w_vals = np.nan_to_num(data[w].to_numpy(dtype='float64')[valid])
+        binned[w] = np.bincount(cells, weights=w_vals, minlength=len(uniques))
+    binned[count_col] = counts
+
+    return pd.DataFrame(binned)
+
+
+def prune_map_data(data, longitude="Longitude", latitude="Latitude",
+                   columns=None, decimals=5):
+    '''
+    Reduce map data to the columns needed to draw it. The position columns
+    are renamed to `lon` and `lat` and rounded to `decimals` places (5 places
+    is roughly 1m) and numeric `columns` to 2 places, as every key and digit
+    is repeated for each row of the layer's JSON payload.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+           Map data.
+    longitude : str
+                Longitude column name in `data`.
+    latitude : str
+               Latitude column name in `data`.
+    columns : list[str]
+              Additional columns to keep, e.g. weights and tooltip fields.
+    decimals : int
+               Decimal places kept for the positions.
+
+    Returns
+    -------
+    pd.DataFrame
+    '''
+    if columns is None:
+        columns = []
+    columns = [c for c in columns if c in data.columns]
+
+    pruned = pd.DataFrame({
+        'lon': data[longitude].round(decimals),
+        'lat': data[latitude].round(decimals),
+    })
+    for c in columns:
+        pruned[c] = data[c]
+        if pd.api.types.is_float_dtype(pruned[c]):
+            pruned[c] = pruned[c].round(2)
+    return pruned.dropna(subset=['lon', 'lat'])
+
+
+def artifact_download(artifact, key, archive_name=None):
+    '''
+    Download widget for the files in an `AnalysisArtifact`.
+
+    Files are only extracted from the artifact once selected, so the render
+    cost does not depend on the size of the artifact.
+
+    Parameters
+    ----------
+    artifact : AnalysisArtifact
+    key : str
+          Unique key prefix for the widgets.
+    archive_name : str
+                   If set, the whole artifact is offered for download under
+                   this file name.
+    '''
+    options = artifact.names()
+    if archive_name is not None:
+        options = [archive_name] + options
+
+    left, right = st.columns([3, 1], vertical_alignment='bottom')
+    fname = left.selectbox('Select file', options, index=None, key=f'{key}_select',
+                           placeholder='Choose a file to download')
+
+    if fname is None:
+        right.button('Download', disabled=True, key=f'{key}_disabled')
+        return
+
+    if fname == archive_name:
+        data = artifact.content
+    else:
+        data = artifact.member_bytes(fname)
+    right.download_button('Download', data, file_name=fname, key=f'{key}_download',
+                          on_click='ignore')
+
+
 class View:
     '''
     Base class to create a view component.
@@ -112,25 +304,8 @@ class DataframeView(View):
         if n_rows > max_rows:
             data_styled = data_styled.iloc[:max_rows, :]
 
-
-        def format_status(status):
-            return status.replace('_', ' ').title()
-
-        def colour_status(status):
-            colour = 'black'
-            if status == 'READY':
-                colour = 'green'
-            elif status == 'RUN_STARTED':
-                colour = 'goldenrod'
-            elif status == 'RUN_COMPLETED':
-                colour = 'black'
-            elif status in ['RUN_CANCELLED', 'RUN_ERROR']:
-                colour = 'darkred'
-            return f'color: {colour}'
-
         if self.status_style and 'status' in self.data.columns:
-            data_styled = data_styled.style.format(format_status, subset=['status'])
-            data_styled = data_styled.map(colour_status, subset=['status'])
+            data_styled = data_styled.assign(status=format_status_column(data_styled['status']))
 
         logger.info(args)
         ret = st.dataframe(data_styled, **args)
@@ -206,7 +381,7 @@ class MapView(View):
 
         if self.map_type == "scatter":
             self.generate_location_map()
-        if self.map_type == "heatmap":
+        elif self.map_type == "heatmap":
             assert self.weight is not None, 'Weight column not set.'
             self.generate_heatmap()
         elif self.map_type == "choropleth":
@@ -217,12 +392,37 @@ class MapView(View):
 
 
     def generate_location_map(self):
+        import pydeck as pdk
         locations = self.data
 
+        viewstate = pdk.data_utils.compute_view(locations[[self.longitude, self.latitude]])
+
+        # Prevent over zooming
+        if viewstate.zoom > 18:
+            viewstate.zoom = 18
+
+        tooltip = {'text': ''}
+        tooltip_cols = []
+        if locations.shape[0] > MAP_BIN_THRESHOLD:
+            weights = [c for c in ['BuildingTIV'] if c in locations.columns]
+            locations = bin_locations(locations, self.longitude, self.latitude,
+                                      weights=weights, zoom=viewstate.zoom)
+            tooltip['text'] += "Locations: {count}"
+            tooltip_cols.append('count')
+        elif 'LocPerilsCovered' in locations.columns:
+            tooltip['text'] += "Peril: {LocPerilsCovered}"
+            tooltip_cols.append('LocPerilsCovered')
+        if 'BuildingTIV' in locations.columns:
+            tooltip['text'] += "\nBuilding TIV: {BuildingTIV}"
+            tooltip_cols.append('BuildingTIV')
+
+        locations = prune_map_data(locations, self.longitude, self.latitude,
+                                   columns=tooltip_cols)
+
         layer = pdk.Layer(
             'ScatterplotLayer',
             locations,
-            get_position=[self.longitude, self.latitude],
+            get_position='[lon, lat]',
             get_line_color = [0, 0, 0],
             get_fill_color = [255, 140, 0],
             radius_min_pixels = 1,
@@ -233,18 +433,6 @@ class MapView(View):
             get_line_width=0.5,
         )
 
-        viewstate = pdk.data_utils.compute_view(locations[[self.longitude, self.latitude]])
-
-        # Prevent over zooming
-        if viewstate.zoom > 18:
-            viewstate.zoom = 18
-
-
-        tooltip = {'text': ''}
-        if 'LocPerilsCovered' in locations.columns:
-            tooltip['text'] += "Peril: {LocPerilsCovered}"
-        if 'BuildingTIV' in locations.columns:
-            tooltip['text'] += "\nBuilding TIV: {BuildingTIV}"
         deck = pdk.Deck(layers=[layer], initial_view_state=viewstate,
                         tooltip=tooltip,
                         map_style='light')
@@ -252,19 +440,17 @@ class MapView(View):
         st.pydeck_chart(deck)
 
     def generate_heatmap(self):
+        import plotly.express as px
         locations = self.data
 
-        def find_zoom_level(lon_range):
-            zoom_df = pd.read_csv('./assets/zoom_levels_reduced.csv')
-            masked = zoom_df[zoom_df['tile_width_longitudes'] < lon_range]
-            if masked.empty:
-                return 18
-            return min(max(masked.iloc[0, :].name - 1, 0), 18)
-
         lon_range = locations[self.longitude].max() - locations[self.longitude].min()
 
         zoom = find_zoom_level(lon_range)
 
+        if locations.shape[0] > MAP_BIN_THRESHOLD:
+            locations = bin_locations(locations, self.longitude, self.latitude,
+                                      weights=[self.weight], zoom=zoom)
+
         format_weight = self.weight
         if len(format_weight) > 1:
             format_weight = format_weight[0].upper() + format_weight[1:]
@@ -290,18 +476,18 @@ class MapView(View):
         st.plotly_chart(fig, use_container_width=True)
 
     def generate_choropleth(self):
-        # Get country GeoJSON
-        # Source: geojson.xyz naturalearth-3.3.0 admin_0_countries
-        countries = geopandas.read_file("./assets/ne_50m_admin_0_countries_reduced.geojson")
+        import plotly.express as px
+        countries = get_country_geometries()
 
         # Aggregate relevant data
         cols = [self.country, self.weight]
         locations = self.data[cols]
         locations = locations.groupby(self.country, as_index=False).agg('sum')
 
-        merged = countries.merge(locations, right_on=self.country, left_on="iso_a2", how="right")
-        center = {'lat': merged.geometry.centroid.y.mean(),
-                  'lon': merged.geometry.centroid.x.mean()}
+        iso_codes = locations[self.country].tolist()
+        zoom = find_zoom_level(countries.lon_range(iso_codes))
+        geojson = countries.geojson(iso_codes, zoom=zoom)
+        center = countries.center(iso_codes)
 
         if len(locations) == 1:
             range_color = [0, max(locations[self.weight])]
@@ -313,13 +499,13 @@ class MapView(View):
         if len(format_weight) > 1:
             format_weight = format_weight[0].upper() + format_weight[1:]
 
-        fig = px.choropleth_map(locations, geojson=countries,
+        fig = px.choropleth_map(locations, geojson=geojson,
                                 color=self.weight,
                                 locations=self.country,
                                 featureidkey='properties.iso_a2',
                                 color_continuous_scale="YlOrRd",
                                 center=center,
-                                zoom=3,
+                                zoom=zoom,
                                 opacity=0.75,
                                 range_color=range_color,
                                 labels={self.weight: format_weight})
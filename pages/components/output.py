@@ -1,33 +1,21 @@
 # Module to display output of MDK
 import streamlit as st
 import pandas as pd
+import numpy as np
 import logging
-import plotly.express as px
-import plotly.graph_objects as go
 from math import log10
+# plotly.express is imported where figures are drawn to keep page imports light
 
+from modules.comparison import compare_results, pairwise_comparison, resample_ep_curves
+from modules.comparison import return_period_grid, unique_names
+from modules.memory import register_data_cache
+from modules.profiling import profiled
+from modules.summaries import summarise_locations
 from pages.components.display import DataframeView, MapView
 
 logger = logging.getLogger(__name__)
 
 
-def summarise_locations(locations):
-    summary = pd.Series()
-
-    # summary info
-    summary['number_locations'] = locations.shape[0]
-
-    # add tiv sums
-    tiv_cols = ['BuildingTIV', 'OtherTIV', 'ContentsTIV', 'BITIV']
-    tiv_cols = [c for c in tiv_cols if c in locations.columns]
-    sums = locations[tiv_cols].sum()
-    summary = pd.concat((summary, sums))
-
-    summary['TotalTIV'] = sums.sum()
-
-    return pd.DataFrame(summary).T
-
-
 def summarise_model_settings(model_settings):
     return pd.DataFrame([pd.Series(model_settings)])
 
@@ -176,14 +164,17 @@ def summarise_summary_level(summary_level_settings):
     curr_summary['level_id'] = summary_level_settings['id']
     return curr_summary
 
-def summarise_inputs(locations=None, analysis_settings=None, title_prefix='##'):
-    if locations is None and analysis_settings is None:
+def summarise_inputs(locations=None, analysis_settings=None, title_prefix='##',
+                     location_summary=None):
+    if locations is None and analysis_settings is None and location_summary is None:
         st.info('No locations or analysis settings.')
 
-    if locations is not None:
+    if location_summary is None and locations is not None:
+        location_summary = summarise_locations(locations)
+
+    if location_summary is not None:
         st.markdown(f'{title_prefix} Input Summary')
-        loc_summary = summarise_locations(locations)
-        loc_summary = DataframeView(loc_summary)
+        loc_summary = DataframeView(location_summary)
         loc_summary.display()
 
     if analysis_settings is not None:
@@ -213,6 +204,40 @@ def summarise_inputs(locations=None, analysis_settings=None, title_prefix='##'):
                     st.info("No summary settings found.")
 
 
+def results_summary_view(summary, title_prefix='##'):
+    '''
+    Display a `ResultsSummary`: the AAL, largest event losses and loss
+    breakdowns of each perspective.
+    '''
+    if len(summary.perspectives) == 0:
+        st.info('No results summary available.')
+        return
+
+    tabs = st.tabs([p.upper() for p in summary.perspectives])
+    for p, tab in zip(summary.perspectives, tabs):
+        with tab:
+            aal = summary.aal.get(p)
+            if aal is not None:
+                st.markdown(f'{title_prefix} Average Annual Loss')
+                cols = st.columns(max(len(aal), 1))
+                for col, (loss_type, mean) in zip(cols, aal.itertuples(index=False)):
+                    col.metric(str(loss_type), f'{mean:,.2f}')
+
+            top_events = summary.top_events.get(p)
+            if top_events is not None:
+                st.markdown(f'{title_prefix} Largest Event Losses')
+                view = DataframeView(top_events)
+                view.column_config['event_id'] = st.column_config.TextColumn('Event ID')
+                view.column_config['mean'] = st.column_config.NumberColumn('Mean Loss', format='%.2f')
+                view.display()
+
+            for field, breakdown in summary.breakdowns.get(p, {}).items():
+                st.markdown(f'{title_prefix} Loss by {field}')
+                view = DataframeView(breakdown.head(100))
+                view.column_config['mean'] = st.column_config.NumberColumn('Mean Loss', format='%.2f')
+                view.display()
+
+
 def ViewSummarySettings(summary_settings, key=None, selectable=False):
     '''
     Display the summary settings for a single perspective as a selectable dataframe.
@@ -376,13 +401,15 @@ def elt_group_fields(df, group_fields, agg_dict=None, categorical_cols=[]):
         if agg_dict.get(c, None) is None:
             agg_dict[c] = 'unique'
 
-    @st.cache_data(show_spinner=False, max_entries=1000)
-    def eltcalc_transform(df, group_fields, agg_dict):
-        return df.groupby(group_fields, as_index=False).agg(agg_dict)
-
     return eltcalc_transform(df, group_fields, agg_dict)
 
 
+@register_data_cache
+@st.cache_data(show_spinner=False, max_entries=1000)
+def eltcalc_transform(df, group_fields, agg_dict):
+    return df.groupby(group_fields, as_index=False).agg(agg_dict)
+
+
 def oed_fields_group(oed_fields, key_prefix=None, selection_mode='multi'):
     if key_prefix is None:
         key_prefix = ''
@@ -544,6 +571,7 @@ def valid_locations(loc_df):
 
 
 @st.fragment
+@profiled()
 def generate_eltcalc_fragment(perspective, output,
                               table = True, map = False, locations = None):
     '''
@@ -596,6 +624,7 @@ def generate_eltcalc_fragment(perspective, output,
                 eltcalc_table(eltcalc_result, perspective, oed_fields)
 
 @st.fragment
+@profiled()
 def generate_melt_fragment(p, vis, locations=None):
     data_df = vis.get(1, p, 'elt_moment')
     oed_fields = vis.oed_fields.get(p)
@@ -664,6 +693,7 @@ def generate_melt_fragment(p, vis, locations=None):
 
 
 @st.fragment
+@profiled()
 def generate_qelt_fragment(p, vis, locations=None):
     data_df = vis.get(1, p, 'elt_quantile')
     oed_fields = vis.oed_fields.get(p)
@@ -722,7 +752,9 @@ def generate_qelt_fragment(p, vis, locations=None):
 
 
 @st.fragment
+@profiled()
 def generate_aalcalc_fragment(p, vis):
+    import plotly.express as px
     result = vis.get(1, p, 'aalcalc')
 
     oed_fields = vis.oed_fields.get(p)
@@ -754,7 +786,9 @@ def generate_aalcalc_fragment(p, vis):
     st.plotly_chart(graph, use_container_width=True)
 
 @st.fragment
+@profiled()
 def generate_alt_fragment(p, vis, output_type='alt_meanonly'):
+    import plotly.express as px
     result = vis.get(1, p, output_type)
     type_field = 'SampleType'
     mean_field = 'MeanLoss'
@@ -790,7 +824,37 @@ def generate_alt_fragment(p, vis, output_type='alt_meanonly'):
 
     st.plotly_chart(graph, use_container_width=True, key=f'{output_type}_graph')
 
+def group_leccalc(result, analysis_type, selected_group, oed_fields=None):
+    '''
+    Total the leccalc losses of each `selected_group` value at each return
+    period, sorted by return period and descending loss. Wheatsheaf outputs
+    are reduced to the mean, max and min loss over samples first.
+    '''
+    if oed_fields is None:
+        oed_fields = []
+
+    if analysis_type == "wheatsheaf":
+        result_plot = result.groupby(["summary_id", "return_period"] + oed_fields, as_index=False).agg(min_loss = ("loss", "min"),
+                                                                                          max_loss = ("loss", "max"),
+                                                                                          mean_loss = ("loss", "mean"))
+
+        result_plot = result_plot[[selected_group, "return_period", "mean_loss", "max_loss", "min_loss"]]
+        result_plot = result_plot.groupby([selected_group, 'return_period'], as_index=False).agg({'mean_loss': 'sum',
+                                                                                                   'max_loss': 'sum',
+                                                                                                   'min_loss': 'sum',
+                                                                                                  })
+        return result_plot.sort_values(by=["return_period", "mean_loss"], ascending=[True, False])
+
+    result_plot = result[[selected_group, 'return_period', 'type', 'loss']]
+    result_plot = result_plot.groupby([selected_group, 'return_period', 'type'],
+                                      as_index=False).agg({'loss': 'sum'})
+    return result_plot.sort_values(by=['return_period', 'loss'], ascending=[True, False])
+
+
+@profiled()
 def generate_leccalc_fragment(p, vis, lec_outputs):
+    import plotly.express as px
+    import plotly.graph_objects as go
     lec_options = [option for option in lec_outputs.keys() if lec_outputs[option]]
     option = st.pills('Select Output:', options=lec_options)
 
@@ -809,23 +873,7 @@ def generate_leccalc_fragment(p, vis, lec_outputs):
         if selected_group is None:
             selected_group = 'summary_id'
 
-        if analysis_type == "wheatsheaf":
-            result_plot = result.groupby(["summary_id", "return_period"] + oed_fields, as_index=False).agg(min_loss = ("loss", "min"),
-                                                                                              max_loss = ("loss", "max"),
-                                                                                              mean_loss = ("loss", "mean"))
-
-            result_plot = result_plot[[selected_group, "return_period", "mean_loss", "max_loss", "min_loss"]]
-            result_plot = result_plot.groupby([selected_group, 'return_period'], as_index=False).agg({'mean_loss': 'sum',
-                                                                                                       'max_loss': 'sum',
-                                                                                                       'min_loss': 'sum',
-                                                                                                      })
-            result_plot = result_plot.sort_values(by=["return_period", "mean_loss"], ascending=[True, False])
-
-        else:
-            result_plot = result[[selected_group, 'return_period', 'type', 'loss']]
-            result_plot = result_plot.groupby([selected_group, 'return_period', 'type'],
-                                              as_index=False).agg({'loss': 'sum'})
-            result_plot = result_plot.sort_values(by=['return_period', 'loss'], ascending=[True, False])
+        result_plot = group_leccalc(result, analysis_type, selected_group, oed_fields)
 
         log_x = log10(result_plot['return_period'].max()) - log10(result_plot['return_period'].min()) > 2
         unique_group = result_plot[selected_group].unique().tolist()
@@ -866,10 +914,15 @@ def generate_leccalc_fragment(p, vis, lec_outputs):
                           log_x=log_x)
         st.plotly_chart(fig)
 
+@profiled()
 def generate_leccalc_comparison_fragment(perspective, outputs, lec_outputs, names=[]):
     '''
     Compare outputs from leccalc. Note that 'per_sample' or 'wheatsheaf' plots are not supported.
 
+    The EP curves of every analysis are resampled onto a shared log-spaced
+    return period grid so that the curves, and the ratios and differences
+    between them, are evaluated at the same return periods.
+
     Parameters
     ----------
     perspective : str
@@ -881,6 +934,8 @@ def generate_leccalc_comparison_fragment(perspective, outputs, lec_outputs, name
     names : List[str]
             Names of each analysis references to by `outputs`.
     '''
+    import plotly.express as px
+    import plotly.graph_objects as go
     lec_options = [option for option in lec_outputs.keys() if lec_outputs[option]]
     lec_options = [opt for opt in lec_options if opt not in ['wheatsheaf_aep', 'wheatsheaf_oep']]
 
@@ -892,18 +947,11 @@ def generate_leccalc_comparison_fragment(perspective, outputs, lec_outputs, name
         return f'{analysis_type}_{loss_type}'
 
     option = st.pills('Select Output:', options=lec_options,
-                      format_func=format_lec_options)
+                      format_func=format_lec_options,
+                      key=f'{perspective}_lec_comparison_output')
 
-    diff_names = len(outputs) - len(names)
-    offset = len(names)
-    if diff_names > 0:
-        for i in range(diff_names):
-            names.append(f'Analysis {i + offset + 1}')
-
-    if len(outputs) > 2:
-        st.error('Maximum 2 outputs for comparison')
-        logger.error(f'Too many outputs for leccalc comparison plot.\nOutputs: {outputs}')
-        return
+    names = [names[i] if i < len(names) and names[i] else f'Analysis {i+1}' for i in range(len(outputs))]
+    names = unique_names(names)
 
     if option is None:
         st.info('Output option not selected.')
@@ -917,7 +965,7 @@ def generate_leccalc_comparison_fragment(perspective, outputs, lec_outputs, name
     types = set()
     for r in results:
         types.update(r['type'].unique().tolist())
-    selected_type = st.radio('Type Filter:', options=types, index=0, horizontal=True,
+    selected_type = st.radio('Type Filter:', options=sorted(types), index=0, horizontal=True,
                              key=f'{perspective}_lec_comparison_type_filter')
     for i in range(len(results)):
         results[i] = results[i][results[i]['type'] == selected_type]
@@ -926,73 +974,167 @@ def generate_leccalc_comparison_fragment(perspective, outputs, lec_outputs, name
 
     selected_group = None
     if oed_fields and len(oed_fields) > 0:
-        selected_group = st.pills('Grouped OED Field: ', options=oed_fields, key='leccalc_group_field_pills')
+        selected_group = st.pills('Grouped OED Field: ', options=oed_fields,
+                                  key=f'{perspective}_lec_comparison_group_field_pills')
 
     if selected_group is None:
         selected_group = 'summary_id'
 
-    name_map = {i: names[i] for i in range(2)}
-    selected_analysis = st.segmented_control('Analysis Filter:',
-                                             options=name_map.keys(),
-                                             format_func = lambda x: name_map.get(x, x),
-                                             key=f'{perspective}_lec_name_filter')
+    selected_analyses = st.multiselect('Analysis Filter:', options=names, default=names,
+                                       key=f'{perspective}_lec_name_filter')
+    if len(selected_analyses) == 0:
+        st.info('No analyses selected.')
+        return
 
-    linestyles = ['dash', None]
-    if selected_analysis is not None:
-        results = [results[selected_analysis]]
-        names = [names[selected_analysis]]
-        linestyles = [linestyles[selected_analysis]]
-
-    results_plot = []
-    for result in results:
-        result_plot = result[[selected_group, 'return_period', 'loss']]
-        result_plot = result_plot.groupby([selected_group, 'return_period'],
-                                          as_index=False).agg({'loss': 'sum'})
-        result_plot = result_plot.sort_values(by=['return_period', 'loss'], ascending=[True, False])
-        results_plot.append(result_plot)
-
-    log_x = [log10(result_plot['return_period'].max()) - log10(result_plot['return_period'].min()) > 2 for result_plot in results_plot]
-    log_x = any(log_x)
-
-    unique_group = []
-    for result_plot in results_plot:
-        unique_group += result_plot[selected_group].unique().tolist()
-    unique_group = list(set(unique_group))
+    results = [r for r, n in zip(results, names) if n in selected_analyses]
+    names = [n for n in names if n in selected_analyses]
+
+    results = [r[[selected_group, 'return_period', 'loss']].groupby([selected_group, 'return_period'],
+                                                                  as_index=False).agg({'loss': 'sum'})
+               for r in results]
+
+    grid = cached_return_period_grid(results)
+    resampled = cached_resample_ep_curves(results, names, selected_group, grid)
+
+    log_x = log10(grid.max()) - log10(grid.min()) > 2
+
+    unique_group = resampled.index.get_level_values(selected_group).unique().tolist()
 
     graphed_group_fields = unique_group
     if len(unique_group) > 5:
-        filter_group = st.multiselect(f'Filtered {selected_group} Values:',
-                                      options = unique_group,
-                                      default = unique_group[:5])
-        for i in range(len(results_plot)):
-            results_plot[i] = results_plot[i][results_plot[i][selected_group].isin(filter_group)]
-        graphed_group_fields = filter_group
+        graphed_group_fields = st.multiselect(f'Filtered {selected_group} Values:',
+                                              options = unique_group,
+                                              default = unique_group[:5],
+                                              key=f'{perspective}_lec_comparison_group_filter')
+        resampled = resampled[resampled.index.get_level_values(selected_group).isin(graphed_group_fields)]
 
+    curves_tab, ratio_tab = st.tabs(['EP Curves', 'Comparison'])
 
-    fig = go.Figure()
     colors = px.colors.qualitative.Plotly
-    j = 0
-    for result, name in zip(results_plot, names):
-        for i, field in enumerate(graphed_group_fields):
-            curr_result = result[result[selected_group] == field]
-            hover_title = f'{name} - {field}'
-            fig.add_trace(go.Scatter(x=curr_result['return_period'], y=curr_result['loss'], name=field, legendgroup=name,
-                                     legendgrouptitle_text=name,
-                                     line=dict(color=colors[i % len(colors)], dash=linestyles[j % 2]),
-                                     hovertemplate= hover_title + '<br>Return Period: %{x}'+
-                                                   '<br><b>Loss: %{y}</b>',
-                                     customdata=[f'{name}']))
-        j += 1
-
-    fig.update_layout(
-        xaxis=dict(title=dict(text='Loss'), type="log" if log_x else None),
-        yaxis=dict(title=dict(text='Return Period')),
-        hovermode='closest',
-        showlegend=True
-    )
+    linestyles = ['solid', 'dash', 'dot', 'dashdot', 'longdash', 'longdashdot']
+
+    with curves_tab:
+        fig = go.Figure()
+        for j, name in enumerate(names):
+            for i, field in enumerate(graphed_group_fields):
+                curr_result = resampled.xs(field, level=selected_group)[name]
+                hover_title = f'{name} - {field}'
+                fig.add_trace(go.Scatter(x=curr_result.index, y=curr_result.values, name=str(field), legendgroup=name,
+                                         legendgrouptitle_text=name,
+                                         line=dict(color=colors[i % len(colors)], dash=linestyles[j % len(linestyles)]),
+                                         hovertemplate= hover_title + '<br>Return Period: %{x:.0f}'+
+                                                       '<br><b>Loss: %{y}</b>'))
+
+        fig.update_layout(
+            xaxis=dict(title=dict(text='Return Period'), type="log" if log_x else None),
+            yaxis=dict(title=dict(text='Loss')),
+            hovermode='closest',
+            showlegend=True
+        )
+
+        st.plotly_chart(fig, key=f'{perspective}_lec_comparison_graph')
+
+    with ratio_tab:
+        if len(names) < 2:
+            st.info('Select at least 2 analyses to compare.')
+            return
+
+        reference = st.selectbox('Reference Analysis:', options=names, index=0,
+                                 key=f'{perspective}_lec_reference')
+        metric = st.radio('Comparison:', options=['ratio', 'difference'], horizontal=True,
+                          format_func=lambda x: x.title(),
+                          key=f'{perspective}_lec_comparison_metric')
+
+        pairwise = pairwise_comparison(resampled)
+        pairwise = pairwise[pairwise['reference'] == reference].copy()
+        pairwise[selected_group] = pairwise[selected_group].astype(str)
+
+        fig = px.line(pairwise, x='return_period', y=metric, color='analysis',
+                      line_dash=selected_group,
+                      labels={'return_period': 'Return Period', 'analysis': 'Analysis Name',
+                              metric: f'{metric.title()} to {reference}'},
+                      log_x=log_x)
+        st.plotly_chart(fig, key=f'{perspective}_lec_comparison_ratio_graph')
 
-    st.plotly_chart(fig)
 
+@register_data_cache
+@st.cache_data(show_spinner=False, max_entries=100)
+def cached_return_period_grid(results, n_points=50):
+    return return_period_grid(results, n_points=n_points)
+
+
+@register_data_cache
+@st.cache_data(show_spinner="Resampling EP curves...", max_entries=100)
+def cached_resample_ep_curves(results, names, group_col, grid):
+    return resample_ep_curves(results, names, group_col, grid)
+
+def rank_plt_dates(result, number_shown=10, date_id=False, year='Year',
+                   month='Month', day='Day', loss='MeanLoss'):
+    '''
+    Rank the dates in a plt output by total loss and select the top
+    `number_shown` dates.
+
+    Dates are packed into integer `YYYYMMDD` keys and totalled with
+    `np.bincount`. The top dates are found with `np.argpartition`, so only
+    `number_shown` labels are ever formatted.
+
+    Parameters
+    ----------
+    result : pd.DataFrame
+             plt results dataframe.
+    number_shown : int
+                   Number of dates to select.
+    date_id : bool
+              If `True` then `result` has a `date_id` column. Otherwise `year`,
+              `month` and `day` columns expected in `result`.
+
+    Returns
+    -------
+    date_rank : np.ndarray
+                Rank of the date of each row of `result` among the selected
+                dates, `-1` where the date is not selected or missing.
+    labels : np.ndarray
+             `YYYY-MM-DD` label of each selected date in descending order of
+             total loss.
+    totals : np.ndarray
+             Total loss of each selected date.
+    '''
+    if date_id:
+        date_codes, uniques = pd.factorize(result['date_id'])
+    else:
+        # Rows missing part of their date, e.g. after an OED join, are left unranked
+        dates = result[[year, month, day]]
+        has_date = dates.notna().all(axis=1).to_numpy()
+        years, months, days = dates[has_date].to_numpy(dtype='int64').T
+        date_codes = np.full(len(result), -1, dtype='int64')
+        date_codes[has_date], uniques = pd.factorize(years * 10000 + months * 100 + days)
+
+    valid = date_codes >= 0
+    weights = np.nan_to_num(result[loss].to_numpy(dtype='float64'))
+    totals = np.bincount(date_codes[valid], weights=weights[valid],
+                         minlength=len(uniques))
+
+    n = min(number_shown, len(totals))
+    top_codes = np.argpartition(-totals, n - 1)[:n] if n > 0 else np.array([], dtype='int64')
+    top_codes = top_codes[np.argsort(-totals[top_codes], kind='stable')]
+
+    rank = np.full(len(totals) + 1, -1)
+    rank[top_codes] = np.arange(n)
+    # Missing dates have code -1 which maps to the trailing -1
+    date_rank = rank[date_codes]
+
+    if date_id:
+        labels = np.asarray(uniques, dtype=object)[top_codes]
+    else:
+        keys = np.asarray(uniques)[top_codes]
+        year_width = len(str(years.max())) if len(years) > 0 else 4
+        labels = np.array([f'{k // 10000:0{year_width}d}-{k // 100 % 100:02d}-{k % 100:02d}'
+                           for k in keys], dtype=object)
+
+    return date_rank, labels, totals[top_codes]
+
+
+@register_data_cache
 @st.cache_data(show_spinner='Creating pltcalc bar')
 def pltcalc_bar(result, selected_group=None, number_shown=10, date_id = False,
                 year='Year', month='Month', day='Day', loss='MeanLoss'):
@@ -1012,25 +1154,16 @@ def pltcalc_bar(result, selected_group=None, number_shown=10, date_id = False,
               Otherwise `occ_year`, `occ_month` and `occ_day` columns expected
               in `result`.
     '''
-    if not date_id:
-        result[[year, month, day]] = result[[year, month, day]].astype(str)
-        result[year] = result[year].str.zfill(result[year].str.len().max())
-        result[month] = result[month].str.zfill(2)
-        result[day] = result[day].str.zfill(2)
-        result['date_id'] = result[[year, month, day]].agg('-'.join, axis=1)
-
-    if selected_group:
-        result_df = result[[selected_group, 'date_id', loss]]
-    else:
-        result_df = result[['date_id', loss]]
+    import plotly.express as px
+    date_rank, labels, totals = rank_plt_dates(result, number_shown, date_id=date_id,
+                                               year=year, month=month, day=day,
+                                               loss=loss)
+    shown = date_rank >= 0
 
-    ranked_dates = result_df.groupby('date_id', as_index=False).agg({loss: 'sum'}).sort_values(by=loss, ascending=False)
-
-    ranked_dates = ranked_dates.iloc[:number_shown]
-    ranked_dates = ranked_dates.rename(columns={loss: f'total_{loss}'})
-
-    result_df = result_df[result_df['date_id'].isin(ranked_dates['date_id'])]
-    result_df = pd.merge(result_df, ranked_dates, how='left', on='date_id')
+    cols = [selected_group, loss] if selected_group else [loss]
+    result_df = result.loc[shown, cols]
+    result_df['date_id'] = labels[date_rank[shown]]
+    result_df[f'total_{loss}'] = totals[date_rank[shown]]
 
     if selected_group:
         result_df = result_df.groupby([selected_group, 'date_id'], as_index=False).agg({loss: 'sum', f'total_{loss}': 'first'})
@@ -1048,11 +1181,12 @@ def pltcalc_bar(result, selected_group=None, number_shown=10, date_id = False,
                  },
                  labels={'date_id': 'Date', f'total_{loss}': f'Total {loss_formatted}', loss: loss_formatted})
     fig.update_xaxes(type='category', categoryorder='array',
-                     categoryarray=ranked_dates['date_id'])
+                     categoryarray=labels.tolist())
 
     return fig
 
 @st.fragment
+@profiled()
 def generate_pltcalc_fragment(p, vis):
     result = vis.get(1, p, 'pltcalc')
     oed_fields = vis.oed_fields.get(p)
@@ -1089,6 +1223,7 @@ def generate_pltcalc_fragment(p, vis):
         st.error("Too many values in group field.")
 
 @st.fragment
+@profiled()
 def generate_mplt_fragment(p, vis):
     result = vis.get(1, p, 'plt_moment')
     oed_fields = vis.oed_fields.get(p)
@@ -1127,6 +1262,7 @@ def generate_mplt_fragment(p, vis):
     st.plotly_chart(fig)
 
 @st.fragment
+@profiled()
 def generate_qplt_fragment(p, vis):
     result = vis.get(1, p, 'plt_quantile')
     oed_fields = vis.oed_fields.get(p)
@@ -1160,8 +1296,32 @@ def generate_qplt_fragment(p, vis):
         st.error("Too many values in group field.")
     st.plotly_chart(fig)
 
+def group_ept(result, selected_group):
+    '''
+    Total the ept losses of each `selected_group` value at each return period.
+
+    Returns
+    -------
+    result : pd.DataFrame
+             Sorted by return period and descending loss.
+    unique_group : list
+                   Group values ordered by loss at the largest return period.
+    '''
+    result = result[[selected_group, 'ReturnPeriod', 'Loss']]
+    result = result.groupby([selected_group, 'ReturnPeriod'],
+                            as_index=False).agg({'Loss': 'sum'})
+
+    max_return_period = result['ReturnPeriod'].max()
+    unique_group = result[result['ReturnPeriod'] == max_return_period].sort_values(by='Loss', ascending=False)
+    unique_group = unique_group[selected_group].tolist()
+
+    return result.sort_values(by=['ReturnPeriod', 'Loss'], ascending=[True, False]), unique_group
+
+
 @st.fragment
+@profiled()
 def generate_ept_fragment(p, vis):
+    import plotly.express as px
     result = vis.get(1, p, 'ept')
 
     ep_type_map = {
@@ -1202,15 +1362,7 @@ def generate_ept_fragment(p, vis):
     if selected_group is None:
         selected_group = 'SummaryId'
 
-    result = result[[selected_group, 'ReturnPeriod', 'Loss']]
-    result = result.groupby([selected_group, 'ReturnPeriod'],
-                            as_index=False).agg({'Loss': 'sum'})
-
-    max_return_period = result['ReturnPeriod'].max()
-    unique_group = result[result['ReturnPeriod'] == max_return_period].sort_values(by='Loss', ascending=False)
-    unique_group = unique_group[selected_group].tolist()
-
-    result = result.sort_values(by=['ReturnPeriod', 'Loss'], ascending=[True, False])
+    result, unique_group = group_ept(result, selected_group)
     log_x = log10(result['ReturnPeriod'].max()) - log10(result['ReturnPeriod'].min()) > 2
 
     all_selected = result[selected_group].unique().tolist()
@@ -1229,18 +1381,19 @@ def generate_ept_fragment(p, vis):
     st.plotly_chart(fig)
 
 def shared_oed_fields(p, outputs):
-    oed_fields = [outputs[i].oed_fields.get(p) for i in (0, 1)]
+    oed_fields = [o.oed_fields.get(p) for o in outputs]
 
-    if not any(oed_fields):
+    if not all(oed_fields):
         return []
 
-    output = set()
-    for fields in oed_fields:
-        if fields is not None:
-            output = set(fields) & output
-    return list(output)
+    output = set(oed_fields[0])
+    for fields in oed_fields[1:]:
+        output = set(fields) & output
+    return [f for f in oed_fields[0] if f in output]
 
+@profiled()
 def generate_aalcalc_comparison_fragment(p, outputs, names = None):
+    import plotly.express as px
     results = [o.get(1, p, 'aalcalc') for o in outputs]
 
     oed_fields = shared_oed_fields(p, outputs)
@@ -1256,12 +1409,12 @@ def generate_aalcalc_comparison_fragment(p, outputs, names = None):
     types = results[0]['type'].unique()
     selected_type = st.radio('Type filter: ', options=types, index=0, horizontal=True)
 
-    for i in range(2):
+    for i in range(len(results)):
         results[i] = results[i][results[i]['type'] == selected_type]
 
     group_field = []
     if breakdown_field:
-        for i in range(2):
+        for i in range(len(results)):
             results[i][breakdown_field] = results[i][breakdown_field].astype(str)
         group_field += [breakdown_field]
 
@@ -1271,9 +1424,10 @@ def generate_aalcalc_comparison_fragment(p, outputs, names = None):
         results = list(map(lambda x: x.groupby(group_field, as_index=False).agg({'mean': 'sum'}), results))
 
     if names is None:
-        names = ['Analysis 1', 'Analysis 2']
+        names = [f'Analysis {i+1}' for i in range(len(results))]
+    names = unique_names(names)
 
-    for i in range(2):
+    for i in range(len(results)):
         results[i]['name'] = names[i]
 
     results = pd.concat(results)
@@ -1289,11 +1443,56 @@ def generate_aalcalc_comparison_fragment(p, outputs, names = None):
     if breakdown_field_invalid:
         st.error("Too many values in group field.")
 
+@register_data_cache
+@st.cache_data(show_spinner="Comparing outputs...", max_entries=100)
+def cached_compare_results(results, names, keys, value_col='mean', baseline=None):
+    return compare_results(results, names, keys, value_col=value_col, baseline=baseline)
+
+
+def comparison_table(comparison, names, keys, baseline, key_prefix=''):
+    '''
+    Display the output of `compare_results` sorted by the largest absolute
+    difference from the `baseline` analysis.
+    '''
+    import plotly.express as px
+    delta_cols = [f'{n}_delta' for n in names if n != baseline]
+    relative_cols = [f'{n}_relative_delta' for n in names if n != baseline]
+
+    if delta_cols:
+        max_delta = np.abs(comparison[delta_cols].to_numpy()).max(axis=1)
+        comparison = comparison.iloc[np.argsort(-max_delta, kind='stable')]
+
+    cols = keys + names + delta_cols + relative_cols
+    table_view = DataframeView(comparison, display_cols=cols)
+    for n in names:
+        table_view.column_config[n] = st.column_config.NumberColumn(n, format='%.2f')
+    for n, c in zip([n for n in names if n != baseline], delta_cols):
+        table_view.column_config[c] = st.column_config.NumberColumn(f'{n} Difference', format='%.2f')
+    for n, c in zip([n for n in names if n != baseline], relative_cols):
+        table_view.column_config[c] = st.column_config.NumberColumn(f'{n} Difference (%)', format='percent')
+    table_view.column_config['event_id'] = st.column_config.TextColumn('Event ID')
+    table_view.display(key=f'{key_prefix}_comparison_table')
+
+    totals = comparison[names].sum()
+    totals = pd.DataFrame({'name': names, 'difference': (totals - totals[baseline]).to_numpy()})
+    totals = totals[totals['name'] != baseline]
+    graph = px.bar(totals, x='name', y='difference',
+                   labels = {'name': 'Analysis Name', 'difference': f'Difference from {baseline}'},
+                   category_orders={'name': names})
+    st.plotly_chart(graph, use_container_width=True, key=f'{key_prefix}_comparison_graph')
+
+
+@profiled()
 def generate_eltcalc_comparison_fragment(perspective, outputs, names=None,
                                          locations=None):
     results = [o.get(1, perspective, 'eltcalc') for o in outputs]
     oed_fields = shared_oed_fields(perspective, outputs)
 
+    if names is None:
+        names = []
+    names = [names[i] if i < len(names) and names[i] else f'Analysis {i+1}' for i in range(len(results))]
+    names = unique_names(names)
+
     types = results[0]['type'].unique()
 
     selected_type = st.radio('Type Filter:', options=types, index=0, horizontal=True,
@@ -1301,21 +1500,25 @@ def generate_eltcalc_comparison_fragment(perspective, outputs, names=None,
 
     for i in range(len(results)):
         results[i] = results[i][results[i]['type'] == selected_type]
-        results[i]['name'] = names[i] if names[i] else f'Analysis {i+1}'
 
+    baseline = st.selectbox('Baseline Analysis:', options=names, index=0,
+                            key=f'{perspective}_elt_baseline')
+    keys = ['event_id'] + oed_fields
+    comparison = cached_compare_results(results, names, keys, value_col='mean',
+                                        baseline=baseline)
 
-    name_map = {i: names[i] for i in range(2)}
+    name_map = {i: names[i] for i in range(len(names))}
     selected_analysis = st.segmented_control('Analysis Filter:',
                                              options=name_map.keys(),
                                              format_func = lambda x: name_map.get(x, x),
                                              key=f'{perspective}_elt_name_filter')
 
     if selected_analysis is not None:
-        result = results[selected_analysis]
+        result = results[selected_analysis].assign(name=names[selected_analysis])
     else:
-        result = pd.concat(results)
+        result = pd.concat([r.assign(name=n) for r, n in zip(results, names)])
 
-    table_tab, map_tab = st.tabs(['Table', 'Map'])
+    table_tab, difference_tab, map_tab = st.tabs(['Table', 'Difference', 'Map'])
 
     with table_tab:
         result, selected = elt_ord_table(result, perspective=perspective, oed_fields=oed_fields,
@@ -1330,6 +1533,10 @@ def generate_eltcalc_comparison_fragment(perspective, outputs, names=None,
                                     },
                                  selectable='multi')
 
+    with difference_tab:
+        comparison_table(comparison, names, keys, baseline,
+                         key_prefix=f'{perspective}_elt')
+
     with map_tab:
         if locations is None:
             st.info('Locations files not found.')
@@ -1342,5 +1549,17 @@ def generate_eltcalc_comparison_fragment(perspective, outputs, names=None,
         elif 'CountryCode' in oed_fields:
             map_type = 'choropleth'
 
-        eltcalc_map(result, locations, oed_fields, map_type=map_type,
-                    intensity_col='mean')
+        map_values = st.radio('Map Values:', ['Loss', 'Difference'], horizontal=True,
+                              key=f'{perspective}_elt_map_values')
+
+        if map_values == 'Loss':
+            eltcalc_map(result, locations, oed_fields, map_type=map_type,
+                        intensity_col='mean')
+            return
+
+        if selected_analysis is None or names[selected_analysis] == baseline:
+            st.info('Select an analysis other than the baseline to map its difference.')
+            return
+
+        eltcalc_map(comparison, locations, oed_fields, map_type=map_type,
+                    intensity_col=f'{names[selected_analysis]}_delta')
@@ -8,6 +8,24 @@ from modules.logging import get_session_logger
 
 logger = get_session_logger()
 
+# Seconds the portfolio and model lists are reused for, so a page run and the
+# timed refreshes of its fragments share a listing which still picks up new entries
+LIST_TTL = 10
+
+
+@st.cache_data(ttl=LIST_TTL, show_spinner=False, hash_funcs={ClientInterface: lambda ci: ci.user_key})
+def list_portfolios(ci: ClientInterface):
+    '''List of the portfolios of the user, reused for `LIST_TTL` seconds.
+    '''
+    return ci.portfolios.get()
+
+
+@st.cache_data(ttl=LIST_TTL, show_spinner=False, hash_funcs={ClientInterface: lambda ci: ci.user_key})
+def list_models(ci: ClientInterface):
+    '''List of the models of the user, reused for `LIST_TTL` seconds.
+    '''
+    return ci.models.get()
+
 def number_rows(portfolio_ids, client_interface, filename='location_file', col_name='number_rows'):
     data = {'id': [], col_name: []}
     for id in portfolio_ids:
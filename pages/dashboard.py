@@ -2,15 +2,18 @@ from modules.config import retrieve_ui_config
 import streamlit as st
 from modules.client import ClientInterface
 from modules.nav import SidebarNav
-from modules.authorisation import validate_page
+from modules.authorisation import validate_page, handle_login
 import pandas as pd
 import altair as alt
 
 from pages.components.output import generate_alt_fragment, generate_eltcalc_fragment, generate_qplt_fragment
 from pages.components.output import generate_leccalc_fragment, generate_melt_fragment, generate_mplt_fragment
 from pages.components.output import generate_pltcalc_fragment, generate_qelt_fragment, summarise_inputs
-from pages.components.output import generate_aalcalc_fragment, generate_ept_fragment
+from pages.components.output import generate_aalcalc_fragment, generate_ept_fragment, results_summary_view
 from modules.visualisation import OutputInterface
+from modules.artifacts import get_analysis_artifact
+from modules.results import get_result_store
+from modules.summaries import get_results_summary
 
 st.set_page_config(
     page_title = "Dashboard",
@@ -41,27 +44,33 @@ if selected_analysis is None:
 
 analysis_id = selected_analysis['id']
 
-@st.cache_data
-def get_analysis_inputs(ID):
-    return client_interface.analyses.get_file(ID, 'input_file', df=True)
+modified = selected_analysis.get('modified')
 
 with st.spinner("Loading data..."):
-    inputs = get_analysis_inputs(analysis_id)
+    results_summary = get_results_summary(client_interface, analysis_id, modified)
     settings = client.analyses.settings.get(analysis_id).json()
 
+if results_summary is None:
+    st.error('Results of this analysis are not available.')
+    st.stop()
+
 st.write("# Analysis Summary")
 with st.spinner('Loading analysis summary...'):
-    summarise_inputs(inputs.get('location.csv', None), settings)
+    summarise_inputs(analysis_settings=settings, location_summary=results_summary.exposure)
 
-@st.cache_data
-def get_analysis_outputs(ID):
-    return client_interface.analyses.get_file(ID, 'output_file', df=True)
+st.write("# Results Summary")
+results_summary_view(results_summary, title_prefix='###')
 
-with st.spinner("Loading data..."):
-    outputs = get_analysis_outputs(analysis_id)
+if not st.toggle("Show full outputs"):
+    st.stop()
+
+# Artifacts are already cached by the summary
+inputs = get_analysis_artifact(client_interface, analysis_id, 'input_file', modified)
+results = get_result_store(client_interface, analysis_id, modified)
+locations = inputs.dataframe('location.csv') if inputs is not None else None
 
 # Set up visualisation interface
-vis = OutputInterface(outputs)
+vis = results.output_interface() if results is not None else OutputInterface({})
 perspectives = ['gul', 'il', 'ri']
 for p in perspectives:
     p_oed_fields = settings.get(f'{p}_summaries', [{}])[0].get('oed_fields', None)
@@ -81,9 +90,6 @@ with st.spinner("Loading visualisations..."):
         if summaries_settings.get('eltcalc', False):
             elt_expander = st.expander("ELT Output")
             with elt_expander:
-                locations = None
-                if inputs:
-                    locations = inputs.get('location.csv')
                 generate_eltcalc_fragment(p, vis, locations=locations, map=True)
 
         if summaries_settings.get('aalcalc', False):
@@ -109,9 +115,6 @@ with st.spinner("Loading visualisations..."):
         if ord_settings.get("elt_moment", False):
             expander = st.expander("MELT Output")
             with expander:
-                locations = None
-                if inputs:
-                    locations = inputs.get('location.csv')
                 generate_melt_fragment(p, vis, locations=locations)
 
         if ord_settings.get('elt_quantile', False):
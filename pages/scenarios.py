@@ -1,26 +1,28 @@
 from modules.authorisation import validate_page, handle_login
+from modules.artifacts import get_analysis_artifact
+from modules.results import get_result_store
+from modules.summaries import get_results_summary
+from modules.visualisation import OutputInterface
 from oasis_data_manager.errors import OasisException
-import tarfile
-from io import BytesIO
-from pathlib import Path
 from requests.exceptions import HTTPError
 import streamlit as st
 from modules.logging import get_session_logger
 from modules.nav import SidebarNav
 from modules.config import retrieve_ui_config
 from modules.rerun import RefreshHandler
-from modules.settings import get_analyses_settings
+from modules.warmer import get_cache_warmer
+from modules.settings import get_default_settings
 from pages.components.display import DataframeView, MapView
 from pages.components.create import create_analysis_form
 from pages.components.output import valid_locations
 from modules.validation import KeyInValuesValidation, NotNoneValidation, ValidationGroup, IsNoneValidation
-from modules.visualisation import OutputInterface
 import time
+import pandas as pd
 from json import JSONDecodeError
-import json
 
 from pages.components.output import generate_eltcalc_fragment, generate_leccalc_fragment, generate_pltcalc_fragment, model_summary, summarise_inputs, generate_aalcalc_fragment
-from pages.components.process import add_model_names_to_models, add_model_names_to_models_cached, enrich_analyses, enrich_portfolios
+from pages.components.output import results_summary_view
+from pages.components.process import add_model_names_to_models, add_model_names_to_models_cached, enrich_analyses, enrich_portfolios, list_models, list_portfolios
 
 logger = get_session_logger()
 
@@ -58,10 +60,14 @@ st.markdown("For more information on this tool and usage instructions please ref
 'To begin a scenario impact analysis, select one of the pre-loaded hazard scenarios (footprints) from the list below.'
 
 
-if len(client_interface.portfolios.get()) == 0:
+# Listed once per run, the run fragment lists them again on timed refreshes
+portfolio_list = list_portfolios(client_interface)
+model_list = list_models(client_interface)
+
+if len(portfolio_list) == 0:
     st.error('No Portfolios Found')
     st.stop()
-if len(client_interface.models.get()) == 0:
+if len(model_list) == 0:
     st.error('No Models Found')
     st.stop()
 create_container = st.container(border=True)
@@ -80,7 +86,7 @@ with create_container:
     '#### Scenario Selection'
     'Select an event scenarios by clicking the grey box on the left side of the table.'
 
-    models = client_interface.models.get(df=True)
+    models = pd.json_normalize(model_list)
     models = models.set_index('id', drop=False)
     models = add_model_names_to_models_cached(models, client_interface)
     display_cols = [ 'model_name', 'supplier_id' ]
@@ -102,7 +108,7 @@ with create_container:
     'The Exposure Map button will show the distribution of building TIV (total insured value) in the selected portfolio.'
 
     # Prepare portfolios data
-    portfolios = client_interface.portfolios.get(df=True)
+    portfolios = pd.json_normalize(portfolio_list)
 
     # Find the corresponding portfolios
     def filter_valid_rows(df, key, valid_map, filter_col):
@@ -198,7 +204,8 @@ with create_container:
             model_details_dialog()
 
 with run_container:
-    re_handler = RefreshHandler(client_interface)
+    warmer = get_cache_warmer() if ui_config.cache_warmer else None
+    re_handler = RefreshHandler(client_interface, warmer=warmer)
     run_every = re_handler.run_every()
 
     @st.fragment(run_every=run_every)
@@ -206,8 +213,8 @@ with run_container:
         re_handler.update_queue()
 
         analyses = client_interface.analyses.get(df=True)
-        portfolios = client_interface.portfolios.get(df=True)
-        models = client_interface.models.get(df=True)
+        portfolios = pd.json_normalize(list_portfolios(client_interface))
+        models = pd.json_normalize(list_models(client_interface))
         models = models.set_index('id', drop=False)
         models = add_model_names_to_models_cached(models, client_interface)
 
@@ -262,36 +269,35 @@ with run_container:
         with columns[0]:
             if st.button('Run', disabled = not run_enabled, help=msg, use_container_width=True):
                 model_id = client_interface.models.get(selected['model'])['model_id']
-                analysis_settings = get_analyses_settings(model_name_id = model_id)[0]
-
-                with open(analysis_settings, 'r') as f:
-                    analysis_settings = json.load(f)
-
-                if len(oed_group) > 0:
-                    oed_group_codes = [group_to_code[g] for g in oed_group]
-                    if analysis_settings.get('gul_output', False):
-                        analysis_settings['gul_summaries'][0]['oed_fields'] = oed_group_codes
-                    if analysis_settings.get('il_output', False):
-                        analysis_settings['il_summaries'][0]['oed_fields'] = oed_group_codes
-                    if analysis_settings.get('ri_output', False):
-                        analysis_settings['ri_summaries'][0]['oed_fields'] = oed_group_codes
-
-                try:
-                    client_interface.upload_settings(selected['id'], analysis_settings)
-                except (JSONDecodeError, HTTPError) as e:
-                    logger.error(e)
-                    st.error('Failed to upload settings')
-
-                try:
-                    if selected['status'] == 'NEW':
-                        client_interface.generate_and_run(selected['id'])
-                    else:
-                        client_interface.run(selected['id'])
+                analysis_settings = get_default_settings(model_name_id = model_id)
+                if analysis_settings is None:
+                    st.error(f'No default settings for model {model_id}.')
+                else:
+                    if len(oed_group) > 0:
+                        oed_group_codes = [group_to_code[g] for g in oed_group]
+                        if analysis_settings.get('gul_output', False):
+                            analysis_settings['gul_summaries'][0]['oed_fields'] = oed_group_codes
+                        if analysis_settings.get('il_output', False):
+                            analysis_settings['il_summaries'][0]['oed_fields'] = oed_group_codes
+                        if analysis_settings.get('ri_output', False):
+                            analysis_settings['ri_summaries'][0]['oed_fields'] = oed_group_codes
 
-                    run_started = True
+                    try:
+                        client_interface.upload_settings(selected['id'], analysis_settings)
+                    except (JSONDecodeError, HTTPError) as e:
+                        logger.error(e)
+                        st.error('Failed to upload settings')
 
-                except HTTPError as _:
-                    st.error('Starting run failed.')
+                    try:
+                        if selected['status'] == 'NEW':
+                            client_interface.generate_and_run(selected['id'])
+                        else:
+                            client_interface.run(selected['id'])
+
+                        run_started = True
+
+                    except HTTPError as _:
+                        st.error('Starting run failed.')
 
         if run_started:
             st.success("Run started.")
@@ -305,9 +311,14 @@ with run_container:
         def display_outputs(ci, analysis_id):
             st.markdown('# Analysis Summary')
             st.markdown('This section summarises the input data for this analysis, including the total values contained in the portfolio, and analysis / output settings.')
-            locations = ci.analyses.get_file(analysis_id, 'input_file', df=True)['location.csv']
+            modified_time = ci.analyses.get(analysis_id).get('modified', None)
+            with st.spinner("Summarising results..."):
+                results_summary = get_results_summary(ci, analysis_id, modified_time)
+            if results_summary is None:
+                st.error('Results of this analysis are not available.')
+                return
             a_settings = client.analyses.settings.get(analysis_id).json()
-            summarise_inputs(locations, a_settings)
+            summarise_inputs(analysis_settings=a_settings, location_summary=results_summary.exposure)
 
 
             st.markdown('# Results Summary')
@@ -318,15 +329,28 @@ with run_container:
             st.markdown("In addition to the table of mean loss, the spatial distribution is shown under 'map' and a chart shown below.")
             st.markdown('Sample results refer to outputs from running no sample - just one realisation of the event; Analytical results refer to running the number of samples (currently defaulting to 10 samples).')
 
-            # Graphs from output
+            results_summary_view(results_summary, title_prefix='###')
 
-            @st.cache_data(show_spinner="Fetching output data...")
-            def get_output_file(analysis_id, modified_time): # don't use cache if analysis modified
-                return ci.analyses.get_file(analysis_id, 'output_file', df=True)
+            # Artifacts are already cached by the summary
+            inputs = get_analysis_artifact(ci, analysis_id, 'input_file', modified_time)
+            outputs = get_analysis_artifact(ci, analysis_id, 'output_file', modified_time)
 
-            modified_time = ci.analyses.get(analysis_id).get('modified', None)
-            results_dict = get_output_file(analysis_id, modified_time)
-            output_interface = OutputInterface(results_dict)
+            if outputs is not None:
+                fname = f"analysis_{analysis_id}_output.tar.gz"
+                st.markdown(f"Output File Name: `{fname}`")
+                st.download_button('Download Results File',
+                                   data=outputs.content,
+                                   file_name=fname)
+            else:
+                st.error('Output file is not available.')
+
+            if not st.toggle("Show detailed results", key=f'detailed_results_{analysis_id}'):
+                return
+
+            # Graphs from output
+            locations = inputs.dataframe('location.csv') if inputs is not None else None
+            results = get_result_store(ci, analysis_id, modified_time)
+            output_interface = results.output_interface() if results is not None else OutputInterface({})
 
             for p in ['gul', 'il', 'ri']:
                 p_oed_fields = a_settings.get(f'{p}_summaries', [{}])[0].get('oed_fields', None)
@@ -367,18 +391,6 @@ with run_container:
                 st.write("## Loss Net of Reinsurance")
                 generate_perspective_visualisation('ri', a_settings['ri_summaries'])
 
-            fname = f"analysis_{analysis_id}_output.tar.gz"
-            st.markdown(f"Output File Name: `{fname}`")
-            fdata = ci.download_output(analysis_id)
-
-            tdata = tarfile.open(fileobj=BytesIO(fdata))
-            output_files = [m.name for m in tdata.getmembers() if m.isfile()]
-            output_files = [Path(p).name for p in output_files]
-
-            st.download_button('Download Results File',
-                               data=fdata,
-                               file_name=fname)
-
 
         valid_statuses = ['RUN_COMPLETED']
         validations = ValidationGroup()
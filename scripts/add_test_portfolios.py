@@ -1,9 +1,22 @@
+'''
+Script to upload the portfolios of a config file, e.g. `portfolios.json`.
+
+Portfolios are compared by the content hash of their OED files against a
+local manifest, `<config>.lock.json` by default, of the portfolios seeded
+before. The server does not store the hash, so this only works on the
+machine, or with the manifest file, which seeded them. Without the manifest
+existing portfolios are matched by name only: a portfolio of the same name
+is kept as is and renamed copies of seeded files are uploaded again.
+'''
 from oasis_data_manager.errors import OasisException
 from oasislmf.platform_api.client import APIClient
 from requests.exceptions import ConnectionError
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
 import logging
 from requests.exceptions import HTTPError
+from requests.adapters import HTTPAdapter
 import streamlit as st
 import argparse
 from pathlib import Path
@@ -13,15 +26,113 @@ import time
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def add_portfolio(client, input_args):
-    existing_names = [r['name'] for r in client.portfolios.get().json()]
-    logger.info('Adding portfolios...')
-
-    if input_args.get('portfolio_name') in existing_names:
-        logger.info(f'Skipping {input_args["portfolio_name"]}')
-    else:
-        logger.info(f'Adding {input_args["portfolio_name"]}')
-        client.upload_inputs(**input_args)
+OED_FILE_ARGS = ['location_fp', 'accounts_fp', 'ri_info_fp', 'ri_scope_fp']
+
+
+def content_hash(input_args, chunk_size=1 << 20):
+    '''SHA-256 of the OED files of a portfolio config entry.
+    '''
+    h = hashlib.sha256()
+    for arg in OED_FILE_ARGS:
+        fp = input_args.get(arg)
+        h.update(f'{arg}:'.encode())
+        if fp is None:
+            continue
+        with open(fp, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path):
+    if path.is_file():
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(path, manifest):
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def plan_uploads(config_entries, existing, manifest):
+    '''
+    Decide the action for each portfolio config entry.
+
+    Parameters
+    ----------
+    config_entries : dict
+                     Portfolio config entries keyed by config name, with the
+                     `content_hash` added.
+    existing : list[dict]
+               Portfolios on the server.
+    manifest : dict
+               Content hash to `{'id', 'name'}` of previously seeded portfolios.
+
+    Returns
+    -------
+    list[tuple]
+        `(action, config_name, portfolio_id)` where action is `skip`, `update`
+        or `create`.
+    '''
+    existing_ids = {p['id'] for p in existing}
+    existing_names = {p['name']: p['id'] for p in existing}
+    seeded_names = {v['name']: h for h, v in manifest.items()}
+
+    plan = []
+    planned_hashes = set()
+    for name, input_args in config_entries.items():
+        digest = input_args['content_hash']
+        seeded = manifest.get(digest)
+        portfolio_name = input_args.get('portfolio_name')
+
+        if digest in planned_hashes or (seeded and seeded['id'] in existing_ids):
+            plan.append(('skip', name, seeded['id'] if seeded else None))
+        elif portfolio_name in existing_names and portfolio_name in seeded_names:
+            # Seeded before with different files
+            plan.append(('update', name, existing_names[portfolio_name]))
+        elif portfolio_name in existing_names:
+            # Not seeded by this script, keep as is
+            plan.append(('skip', name, existing_names[portfolio_name]))
+        else:
+            plan.append(('create', name, None))
+        planned_hashes.add(digest)
+    return plan
+
+
+def record_uploads(manifest, entries, results):
+    '''
+    Manifest updated with the portfolios created or updated by `results`.
+    Skipped portfolios are not recorded, so a portfolio which was not seeded
+    by this script is never treated as seeded on a later run.
+
+    Parameters
+    ----------
+    manifest : dict
+               Content hash to `{'id', 'name'}` of previously seeded portfolios.
+    entries : dict
+              Portfolio config entries keyed by config name, with the
+              `content_hash` added.
+    results : list[tuple]
+              `(action, config_name, portfolio_id)` of each planned upload,
+              `portfolio_id` is `None` if the upload failed.
+    '''
+    manifest = dict(manifest)
+    for action, name, portfolio_id in results:
+        if action not in ('create', 'update') or portfolio_id is None:
+            continue
+        # Drop the hash of previously uploaded files of an updated portfolio
+        manifest = {h: v for h, v in manifest.items() if v['id'] != portfolio_id}
+        manifest[entries[name]['content_hash']] = {'id': portfolio_id,
+                                                   'name': entries[name].get('portfolio_name')}
+    return manifest
+
+
+def add_portfolio(client, input_args, portfolio_id=None):
+    upload_args = {k: v for k, v in input_args.items() if k != 'content_hash'}
+    logger.info(f'Adding {input_args["portfolio_name"]}')
+    return client.upload_inputs(portfolio_id=portfolio_id, **upload_args)
 
 def main():
     parser = argparse.ArgumentParser(description='Script to add portfolios')
@@ -35,6 +146,11 @@ def main():
                         help='Max number of retries')
     parser.add_argument('-i', '--interval-retries', default=10, type=int,
                         help='Interval between retries in seconds.')
+    parser.add_argument('-w', '--workers', default=4, type=int,
+                        help='Number of concurrent uploads.')
+    parser.add_argument('--manifest', default=None, type=Path,
+                        help='Path to record the content hash of seeded portfolios. Defaults to `<config>.lock.json`. '
+                             'Content is only compared for portfolios recorded in it, other portfolios by name.')
 
     logger.info("Initialising client")
     api_url = os.environ.get('API_URL', 'http://localhost:8000')
@@ -79,9 +195,36 @@ def main():
         logger.error(f'Config portfolios: {list(config.keys())}  Selected portfolios: {portfolios}')
         raise Exception('Selected portfolio not in config')
 
-    for p in portfolios:
-        input_args = config[p]
-        add_portfolio(client, input_args)
+    manifest_path = args['manifest'] or args['config'].with_suffix('.lock.json')
+    manifest = load_manifest(manifest_path)
+
+    entries = {p: {**config[p], 'content_hash': content_hash(config[p])} for p in portfolios}
+    existing = client.portfolios.get().json()
+    if existing and not manifest:
+        logger.warning(f'No manifest at {manifest_path}, existing portfolios are matched by name only.')
+    plan = plan_uploads(entries, existing, manifest)
+
+    # Allow a connection per worker
+    client.api.mount(client.api.url_base, HTTPAdapter(max_retries=client.api.retry_max,
+                                                      pool_connections=args['workers'],
+                                                      pool_maxsize=args['workers']))
+
+    def run(step):
+        action, name, portfolio_id = step
+        input_args = entries[name]
+        if action == 'skip':
+            logger.info(f'Skipping {input_args["portfolio_name"]}')
+            return step
+        try:
+            return action, name, add_portfolio(client, input_args, portfolio_id)['id']
+        except (HTTPError, OasisException) as e:
+            logger.error(f'Failed to add {input_args["portfolio_name"]}: {e}')
+            return action, name, None
+
+    with ThreadPoolExecutor(max_workers=args['workers']) as executor:
+        results = list(executor.map(run, plan))
+
+    save_manifest(manifest_path, record_uploads(manifest, entries, results))
 
 if __name__=="__main__":
     main()
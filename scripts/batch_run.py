@@ -0,0 +1,265 @@
+'''
+Script to create and run a sweep of analyses without the UI.
+
+Run from the repository root:
+
+    python -m scripts.batch_run sweep.json --window 4
+
+The sweep is either a JSON file of the form
+
+    {
+        "portfolios": [1, "piwind-small"],
+        "models": ["PiWind", {"model_id": "PiWind", "supplier_id": "OasisLMF"}],
+        "settings": ["defaults/1_piwind_oasislmf-analysis_settings.json", null],
+        "name": "{portfolio}-{model}-{settings}"
+    }
+
+which runs every combination, or has a `runs` list of
+`{"portfolio", "model", "settings", "name"}` entries. A CSV file with
+`portfolio`, `model`, `settings` and optional `name` columns is read as a
+list of runs. Portfolios and models are given by id or name. A `null` or
+empty `settings` uses the model's default settings from `defaults/`.
+'''
+from oasis_data_manager.errors import OasisException
+from requests.exceptions import HTTPError
+from itertools import product
+from pathlib import Path
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+from modules.client import ClientInterface
+from modules.settings import DEFAULTS_PATH, get_settings_registry, thaw
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = '{portfolio}-{model}-{settings}'
+FAILED_STATUSES = ['INPUTS_GENERATION_ERROR', 'INPUTS_GENERATION_CANCELLED',
+                   'RUN_ERROR', 'RUN_CANCELLED']
+COMPLETED_STATUS = 'RUN_COMPLETED'
+
+
+def load_sweep(path):
+    '''
+    Read a sweep spec from a JSON or CSV file as a list of run dicts with
+    `portfolio`, `model`, `settings` and `name` keys.
+    '''
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        runs = pd.read_csv(path, dtype=str).replace({float('nan'): None})
+        return runs.to_dict('records')
+
+    with open(path, 'r') as f:
+        spec = json.load(f)
+
+    if 'runs' in spec:
+        return spec['runs']
+
+    name = spec.get('name', DEFAULT_NAME)
+    return [{'portfolio': p, 'model': m, 'settings': s, 'name': name}
+            for p, m, s in product(spec['portfolios'], spec['models'],
+                                   spec.get('settings', [None]))]
+
+
+def _match(items, key, name_keys):
+    '''Find the item with id `key` or with `key` in one of `name_keys`.
+    '''
+    if isinstance(key, dict):
+        return next((i for i in items if all(str(i.get(k)) == str(v) for k, v in key.items())), None)
+
+    key = str(key)
+    for item in items:
+        if str(item['id']) == key or any(str(item.get(k)) == key for k in name_keys):
+            return item
+    return None
+
+
+def resolve_runs(runs, portfolios, models, defaults_path=None):
+    '''
+    Resolve the portfolios, models and settings of a sweep.
+
+    Returns
+    -------
+    list[dict]
+        Runs with `portfolio_id`, `model_id`, `settings` (dict) and `name`.
+    '''
+    registry = get_settings_registry(defaults_path or DEFAULTS_PATH)
+    resolved = []
+    for run in runs:
+        portfolio = _match(portfolios, run['portfolio'], ['name'])
+        if portfolio is None:
+            raise OasisException(f"Portfolio not found: {run['portfolio']}")
+
+        model = _match(models, run['model'], ['model_id'])
+        if model is None:
+            raise OasisException(f"Model not found: {run['model']}")
+
+        settings_path = run.get('settings')
+        if settings_path:
+            with open(settings_path, 'r') as f:
+                settings = json.load(f)
+        else:
+            default = registry.get(model_name_id=model['model_id'], supplier_id=model['supplier_id'])
+            if default is None:
+                raise OasisException(f"No default settings for model: {model['model_id']}")
+            settings_path = default.path
+            settings = thaw(default.settings)
+
+        name = (run.get('name') or DEFAULT_NAME).format(portfolio=portfolio['name'],
+                                                       model=model['model_id'],
+                                                       settings=Path(settings_path).stem)
+        resolved.append({'portfolio_id': portfolio['id'], 'model_id': model['id'],
+                         'settings': settings, 'name': name})
+    return resolved
+
+
+class BatchRunner:
+    '''
+    Submit runs keeping at most `window` analyses generating inputs or
+    running at once, printing every status transition.
+
+    Parameters
+    ----------
+    client_interface : ClientInterface
+    runs : list[dict]
+           Output of `resolve_runs`.
+    window : int
+             Maximum number of analyses in flight, e.g. the number of workers.
+    poll_interval : float
+                    Seconds between status polls.
+    '''
+    def __init__(self, client_interface, runs, window=4, poll_interval=10, out=print):
+        self.client_interface = client_interface
+        self.pending = list(runs)
+        self.window = window
+        self.poll_interval = poll_interval
+        self.out = out
+
+        self.active = {}
+        self.statuses = {}
+        self.results = []
+
+    def report(self, analysis_id, message):
+        timestamp = datetime.datetime.now().strftime('%H:%M:%S')
+        name = self.active.get(analysis_id, {}).get('name', '')
+        self.out(f'[{timestamp}] #{analysis_id} {name}: {message}')
+
+    def submit(self, run):
+        try:
+            analysis = self.client_interface.create_and_generate_analysis(run['portfolio_id'],
+                                                                          run['model_id'],
+                                                                          run['name'],
+                                                                          wait=False)
+        except (HTTPError, OasisException) as e:
+            self.out(f"Failed to create {run['name']}: {e}")
+            self.results.append({'id': None, 'name': run['name'], 'status': 'CREATE_ERROR'})
+            return
+
+        analysis_id = analysis['id']
+        self.active[analysis_id] = {**run, 'started': False}
+        self.statuses[analysis_id] = analysis.get('status')
+        self.report(analysis_id, f"created ({analysis.get('status')})")
+
+    def start_run(self, analysis_id):
+        run = self.active[analysis_id]
+        try:
+            self.client_interface.upload_settings(analysis_id, run['settings'])
+            self.client_interface.run(analysis_id)
+            run['started'] = True
+            self.report(analysis_id, 'run submitted')
+        except (HTTPError, OasisException) as e:
+            self.report(analysis_id, f'failed to start run: {e}')
+            self.finish(analysis_id, 'SUBMIT_ERROR')
+
+    def finish(self, analysis_id, status):
+        run = self.active.pop(analysis_id)
+        self.results.append({'id': analysis_id, 'name': run['name'], 'status': status})
+
+    def fetch_status(self, analysis_id):
+        '''
+        Status of an active analysis, or `None` if it no longer exists. The
+        last known status is kept if the request fails otherwise.
+        '''
+        try:
+            return self.client_interface.analyses.get(analysis_id).get('status')
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            self.report(analysis_id, f'failed to poll status: {e}')
+            return self.statuses.get(analysis_id)
+
+    def poll(self):
+        '''Update the statuses of the active analyses, requesting each by id.
+        '''
+        for analysis_id in list(self.active):
+            status = self.fetch_status(analysis_id)
+            previous = self.statuses.get(analysis_id)
+            if status != previous:
+                self.report(analysis_id, f'{previous} -> {status}')
+                self.statuses[analysis_id] = status
+
+            run = self.active[analysis_id]
+            if status in FAILED_STATUSES or status is None:
+                self.finish(analysis_id, status)
+            elif status == COMPLETED_STATUS and run['started']:
+                self.finish(analysis_id, status)
+            elif status == 'READY' and not run['started']:
+                self.start_run(analysis_id)
+
+    def run(self):
+        '''Run every analysis. Returns a list of the `id`, `name` and final `status` of each.
+        '''
+        while self.pending or self.active:
+            while self.pending and len(self.active) < self.window:
+                self.submit(self.pending.pop(0))
+
+            if not self.active:
+                continue
+
+            time.sleep(self.poll_interval)
+            self.poll()
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='batch-run',
+                                     description='Script to create and run a sweep of analyses.')
+    parser.add_argument('sweep', type=Path, help='Sweep spec as a JSON or CSV file.')
+    parser.add_argument('-w', '--window', default=4, type=int,
+                        help='Maximum number of analyses generating or running at once (default 4).')
+    parser.add_argument('-i', '--interval', default=10, type=float,
+                        help='Seconds between status polls (default 10).')
+    parser.add_argument('--defaults', default='defaults/', help='Directory of default analysis settings.')
+    parser.add_argument('--user', help='Username for oasislmf client.', default='admin')
+    parser.add_argument('--password', help='Password for oasislmf client.', default='password')
+    parser.add_argument('--log', help='Set logging level.', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log.upper())
+
+    client_interface = ClientInterface(username=args.user, password=args.password)
+    runs = resolve_runs(load_sweep(args.sweep),
+                        client_interface.portfolios.get(),
+                        client_interface.models.get(),
+                        defaults_path=args.defaults)
+    print(f'Submitting {len(runs)} analyses to {os.environ.get("API_URL", "http://localhost:8000")}.', flush=True)
+
+    results = BatchRunner(client_interface, runs, window=args.window,
+                          poll_interval=args.interval,
+                          out=lambda msg: print(msg, flush=True)).run()
+
+    failed = [r for r in results if r['status'] != COMPLETED_STATUS]
+    print(f'{len(results) - len(failed)}/{len(results)} analyses completed.')
+    for r in failed:
+        print(f"Failed: #{r['id']} {r['name']} ({r['status']})")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
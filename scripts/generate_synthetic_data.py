@@ -0,0 +1,345 @@
+'''
+Script to generate synthetic OED exposure and matching analysis outputs at
+production scale for benchmarks and load tests.
+
+Writes to the output directory:
+    location.csv, account.csv    OED exposure files.
+    analysis_settings.json       Settings matching the generated outputs.
+    input_file.tar.gz            Input tarball containing the exposure files.
+    output_file.tar.gz           Output tarball with legacy and/or ORD outputs.
+'''
+import argparse
+import json
+import logging
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# CountryCode: (latitude, longitude, spread in degrees, portfolio weight)
+COUNTRIES = {
+    'US': (37.0, -95.0, 8.0, 0.25),
+    'GB': (53.0, -1.5, 1.5, 0.12),
+    'FR': (46.5, 2.5, 2.0, 0.08),
+    'DE': (51.0, 10.0, 2.0, 0.08),
+    'JP': (36.0, 138.0, 2.5, 0.08),
+    'IT': (42.5, 12.5, 2.0, 0.05),
+    'ES': (40.0, -3.5, 2.0, 0.05),
+    'MX': (23.0, -102.0, 4.0, 0.05),
+    'PH': (12.5, 122.0, 2.5, 0.05),
+    'TR': (39.0, 35.0, 3.0, 0.04),
+    'TW': (23.7, 121.0, 0.7, 0.04),
+    'IN': (22.0, 79.0, 5.0, 0.04),
+    'AU': (-27.0, 134.0, 7.0, 0.03),
+    'GH': (7.9, -1.0, 1.5, 0.02),
+    'NP': (28.3, 84.0, 1.0, 0.02),
+}
+CITIES_PER_COUNTRY = 20
+CITY_SPREAD = 0.15
+
+OCCUPANCY_CODES = np.array([1050, 1051, 1052, 1100, 1101, 1150, 1300])
+CONSTRUCTION_CODES = np.array([5000, 5050, 5100, 5150, 5200])
+
+
+def generate_locations(n_locations, rng, locations_per_account=10):
+    '''
+    OED locations clustered around cities of each country in `COUNTRIES`,
+    with lognormal TIVs.
+
+    Rows are ordered by country so spatially close locations are adjacent.
+    '''
+    codes = np.array(list(COUNTRIES.keys()))
+    lat0, lon0, spread, weights = (np.array(v) for v in zip(*COUNTRIES.values()))
+    weights = weights / weights.sum()
+
+    country = np.sort(rng.choice(len(codes), size=n_locations, p=weights))
+    city_lat = lat0[:, None] + rng.normal(0, 1, (len(codes), CITIES_PER_COUNTRY)) * spread[:, None] / 2
+    city_lon = lon0[:, None] + rng.normal(0, 1, (len(codes), CITIES_PER_COUNTRY)) * spread[:, None]
+
+    # Zipf-like city sizes
+    city_weights = 1 / np.arange(1, CITIES_PER_COUNTRY + 1)
+    city = rng.choice(CITIES_PER_COUNTRY, size=n_locations, p=city_weights / city_weights.sum())
+
+    latitude = city_lat[country, city] + rng.normal(0, CITY_SPREAD, n_locations)
+    longitude = city_lon[country, city] + rng.normal(0, CITY_SPREAD, n_locations)
+
+    building_tiv = rng.lognormal(mean=12.5, sigma=1.0, size=n_locations).round(0)
+
+    return pd.DataFrame({
+        'PortNumber': 1,
+        'AccNumber': np.arange(n_locations) // locations_per_account + 1,
+        'LocNumber': np.arange(1, n_locations + 1),
+        'CountryCode': codes[country],
+        'Latitude': np.clip(latitude, -89.9, 89.9).round(5),
+        'Longitude': ((longitude + 180) % 360 - 180).round(5),
+        'OccupancyCode': rng.choice(OCCUPANCY_CODES, n_locations),
+        'ConstructionCode': rng.choice(CONSTRUCTION_CODES, n_locations),
+        'LocPerilsCovered': 'WTC',
+        'BuildingTIV': building_tiv,
+        'ContentsTIV': (building_tiv * rng.uniform(0.1, 0.5, n_locations)).round(0),
+        'BITIV': (building_tiv * rng.uniform(0, 0.2, n_locations)).round(0),
+        'OtherTIV': 0.0,
+        'LocCurrency': 'USD',
+    })
+
+
+def generate_accounts(locations):
+    '''One OED account with a single policy for each account in `locations`.
+    '''
+    acc_numbers = locations['AccNumber'].unique()
+    return pd.DataFrame({
+        'PortNumber': 1,
+        'AccNumber': acc_numbers,
+        'PolNumber': 1,
+        'PolPerilsCovered': 'WTC',
+        'AccCurrency': 'USD',
+    })
+
+
+def generate_event_losses(locations, n_rows, n_events, rng):
+    '''
+    Per event, per location mean losses with `n_rows` (event, location) pairs,
+    fewer if an event would need to hit more than every location.
+
+    Each event hits a contiguous block of locations within one country, so
+    losses are spatially correlated, with a heavy tailed number of locations
+    per event. Damage ratios are beta distributed and scaled by a lognormal
+    event severity.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns `event_id`, `summary_id` (1-based location index), `mean`,
+        `standard_deviation` and `exposure_value`.
+    '''
+    n_locations = len(locations)
+    tiv = locations[['BuildingTIV', 'ContentsTIV', 'BITIV', 'OtherTIV']].sum(axis=1).to_numpy()
+
+    n_events = min(n_events, n_rows)
+    weights = rng.pareto(1.5, n_events) + 1
+    sizes = rng.multinomial(n_rows - n_events, weights / weights.sum()) + 1
+    # An event hits each location at most once
+    sizes = np.minimum(sizes, n_locations)
+
+    countries = locations['CountryCode'].to_numpy()
+    country_starts = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]])
+    country_ends = np.r_[country_starts[1:], n_locations]
+    country = rng.integers(0, len(country_starts), n_events)
+    block_start = country_starts[country]
+    block_len = country_ends[country] - block_start
+
+    # Start each event at a random offset within its country, wrapping into the portfolio
+    offsets = (rng.random(n_events) * np.maximum(block_len - sizes, 1)).astype('int64')
+    starts = block_start + offsets
+
+    event_idx = np.repeat(np.arange(n_events), sizes)
+    within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    loc_idx = (np.repeat(starts, sizes) + within) % n_locations
+
+    severity = np.clip(rng.lognormal(-3, 1, n_events), 0, 1)
+    damage = rng.beta(0.5, 8, len(event_idx)) * severity[event_idx]
+    loss = tiv[loc_idx] * np.clip(damage, 0, 1)
+
+    return pd.DataFrame({
+        'event_id': event_idx + 1,
+        'summary_id': loc_idx + 1,
+        'mean': loss.round(2),
+        'standard_deviation': (loss * rng.uniform(0.2, 0.8, len(loss))).round(2),
+        'exposure_value': tiv[loc_idx],
+    })
+
+
+def summary_info(locations):
+    '''Summary info for summary level 1 grouped by location.
+    '''
+    return pd.DataFrame({
+        'summary_id': np.arange(1, len(locations) + 1),
+        'LocNumber': locations['LocNumber'].to_numpy(),
+        'CountryCode': locations['CountryCode'].to_numpy(),
+        'tiv': locations[['BuildingTIV', 'ContentsTIV', 'BITIV', 'OtherTIV']].sum(axis=1).to_numpy(),
+    })
+
+
+def exceedance_curves(elt, n_years, max_points=20):
+    '''
+    Occurrence loss exceedance curve of each summary id from the largest
+    `max_points` event losses, with return period `n_years / rank`.
+    '''
+    ranked = elt.sort_values(['summary_id', 'mean'], ascending=[True, False])
+    rank = ranked.groupby('summary_id').cumcount() + 1
+    ranked = ranked[rank <= max_points]
+    return pd.DataFrame({
+        'summary_id': ranked['summary_id'].to_numpy(),
+        'return_period': n_years / rank[rank <= max_points].to_numpy(),
+        'loss': ranked['mean'].to_numpy(),
+    })
+
+
+def legacy_outputs(elt, info, n_years, perspective='gul'):
+    '''Legacy `eltcalc`, `aalcalc` and `leccalc` outputs keyed by file name.
+    '''
+    sample = elt.assign(mean=(elt['mean'] * 0.95).round(2))
+    eltcalc = pd.concat([elt.assign(type=1), sample.assign(type=2)], ignore_index=True)
+    eltcalc = eltcalc[['summary_id', 'type', 'event_id', 'mean', 'standard_deviation', 'exposure_value']]
+
+    aalcalc = eltcalc.groupby(['summary_id', 'type'], as_index=False).agg(
+        mean=('mean', 'sum'), standard_deviation=('standard_deviation', 'mean'))
+    aalcalc['mean'] = aalcalc['mean'] / n_years
+
+    leccalc = exceedance_curves(elt, n_years)
+    leccalc.insert(1, 'type', 1)
+
+    prefix = f'{perspective}_S1_'
+    return {
+        f'{prefix}summary-info.csv': info,
+        f'{prefix}eltcalc.csv': eltcalc,
+        f'{prefix}aalcalc.csv': aalcalc,
+        f'{prefix}leccalc_full_uncertainty_aep.csv': leccalc,
+    }
+
+
+def ord_outputs(elt, info, n_years, perspective='gul'):
+    '''ORD `melt`, `altmeanonly` and `ept` outputs keyed by file name.
+    '''
+    melt = pd.DataFrame({
+        'EventId': elt['event_id'],
+        'SummaryId': elt['summary_id'],
+        'SampleType': 2,
+        'EventRate': 1 / n_years,
+        'ChanceOfLoss': 1.0,
+        'MeanLoss': elt['mean'],
+        'SDLoss': elt['standard_deviation'],
+        'MaxLoss': (elt['mean'] * 2).round(2),
+        'FootprintExposure': elt['exposure_value'],
+        'MeanImpactedExposure': elt['exposure_value'],
+        'MaxImpactedExposure': elt['exposure_value'],
+    })
+
+    alt = melt.groupby(['SummaryId', 'SampleType'], as_index=False).agg(
+        MeanLoss=('MeanLoss', 'sum'), MeanLossSD=('SDLoss', 'mean'))
+    alt['MeanLoss'] = alt['MeanLoss'] / n_years
+
+    curves = exceedance_curves(elt, n_years)
+    ept = pd.DataFrame({
+        'SummaryId': curves['summary_id'],
+        'EPCalc': 1,
+        'EPType': 1,
+        'ReturnPeriod': curves['return_period'],
+        'Loss': curves['loss'],
+    })
+
+    prefix = f'{perspective}_S1_'
+    return {
+        f'{prefix}summary-info.csv': info,
+        f'{prefix}melt.csv': melt,
+        f'{prefix}altmeanonly.csv': alt,
+        f'{prefix}ept.csv': ept,
+    }
+
+
+def analysis_settings(output_format='both', perspective='gul'):
+    '''Analysis settings requesting the generated outputs.
+    '''
+    summary = {'id': 1, 'oed_fields': ['LocNumber', 'CountryCode']}
+    if output_format in ('legacy', 'both'):
+        summary.update({'eltcalc': True, 'aalcalc': True, 'lec_output': True,
+                        'leccalc': {'full_uncertainty_aep': True}})
+    if output_format in ('ord', 'both'):
+        summary['ord_output'] = {'elt_moment': True, 'alt_meanonly': True,
+                                 'ept_full_uncertainty_aep': True}
+    return {
+        'model_name_id': 'Synthetic',
+        'model_supplier_id': 'OasisLMF',
+        'number_of_samples': 10,
+        f'{perspective}_output': True,
+        f'{perspective}_summaries': [summary],
+    }
+
+
+def generate(n_locations, n_rows, n_events=None, n_years=1000, output_format='both', seed=0):
+    '''
+    Generate the synthetic exposure and outputs.
+
+    Returns
+    -------
+    inputs : dict
+             `location.csv` and `account.csv` dataframes.
+    outputs : dict
+              Output dataframes keyed by file name.
+    settings : dict
+               Matching analysis settings.
+    '''
+    rng = np.random.default_rng(seed)
+    if n_events is None:
+        n_events = max(1, n_rows // 100)
+
+    locations = generate_locations(n_locations, rng)
+    inputs = {'location.csv': locations, 'account.csv': generate_accounts(locations)}
+
+    elt = generate_event_losses(locations, n_rows, n_events, rng)
+    info = summary_info(locations)
+
+    outputs = {}
+    if output_format in ('legacy', 'both'):
+        outputs.update(legacy_outputs(elt, info, n_years))
+    if output_format in ('ord', 'both'):
+        outputs.update(ord_outputs(elt, info, n_years))
+
+    return inputs, outputs, analysis_settings(output_format)
+
+
+def write_tar(path, dataframes, prefix=''):
+    '''Write dataframes as csv members of a `tar.gz` file.
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir, tarfile.open(path, 'w:gz') as tar:
+        for name, df in dataframes.items():
+            csv_path = Path(tmpdir) / name
+            df.to_csv(csv_path, index=False, chunksize=1_000_000)
+            tar.add(csv_path, arcname=f'{prefix}{name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Script to generate synthetic exposure and outputs.')
+    parser.add_argument('-o', '--output-dir', default='./synthetic', type=Path,
+                        help='Directory to write the generated files.')
+    parser.add_argument('-l', '--locations', default=10_000, type=int,
+                        help='Number of locations.')
+    parser.add_argument('-r', '--rows', default=100_000, type=int,
+                        help='Number of (event, location) loss rows.')
+    parser.add_argument('-e', '--events', default=None, type=int,
+                        help='Number of events. Defaults to rows / 100.')
+    parser.add_argument('-y', '--years', default=1000, type=int,
+                        help='Number of years the events are spread over.')
+    parser.add_argument('-f', '--format', default='both', choices=['legacy', 'ord', 'both'],
+                        help='Output format.')
+    parser.add_argument('-s', '--seed', default=0, type=int, help='Random seed.')
+    parser.add_argument('--log', help='Set logging level.', default='INFO')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log.upper())
+
+    start = time.perf_counter()
+    inputs, outputs, settings = generate(args.locations, args.rows, n_events=args.events,
+                                         n_years=args.years, output_format=args.format,
+                                         seed=args.seed)
+    logger.info(f'Generated data in {time.perf_counter() - start:.1f}s')
+
+    output_dir = args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, df in inputs.items():
+        df.to_csv(output_dir / name, index=False)
+    with open(output_dir / 'analysis_settings.json', 'w') as f:
+        json.dump(settings, f, indent=2)
+
+    write_tar(output_dir / 'input_file.tar.gz', inputs, prefix='input/')
+    write_tar(output_dir / 'output_file.tar.gz', outputs, prefix='output/')
+    logger.info(f'Written to {output_dir} in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,102 @@
 from oasislmf.platform_api.client import APIClient
 from oasis_data_manager.errors import OasisException
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
 import time
 import os
 import datetime
 import argparse
 import logging
-from requests import HTTPError
+from requests import HTTPError, RequestException
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    '''
+    Thread safe limiter spacing calls at least `1 / rate` seconds apart.
+    '''
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def analysis_files(analysis):
+    '''URLs of the stored files of an analysis.
+    '''
+    return [v for k, v in analysis.items()
+            if k.endswith('_file') and isinstance(v, str) and v.startswith('http')]
+
+
+def file_size(client, url, limiter):
+    limiter.wait()
+    try:
+        r = client.api.head(url, allow_redirects=True, timeout=client.api.timeout)
+        r.raise_for_status()
+        return int(r.headers.get('Content-Length', 0))
+    except (RequestException, ValueError) as e:
+        logger.debug(f'Failed to get size of {url}: {e}')
+        return 0
+
+
+def cached_artifacts(cache_dir, analysis_ids):
+    '''
+    Local UI artifact cache files of the analyses, named
+    `analysis_{id}_{filename}_{modified}` by `modules.artifacts`.
+    '''
+    if cache_dir is None or not Path(cache_dir).is_dir():
+        return []
+    return [p for id in analysis_ids for p in Path(cache_dir).glob(f'analysis_{id}_*')]
+
+
+def format_size(n_bytes):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if n_bytes < 1024:
+            return f'{n_bytes:.1f} {unit}'
+        n_bytes /= 1024
+    return f'{n_bytes:.1f} TB'
+
+
+def storage_report(client, analyses, cache_files, executor, limiter):
+    '''Print the storage which would be freed by deleting `analyses`.
+    '''
+    def analysis_size(analysis):
+        return sum(file_size(client, url, limiter) for url in analysis_files(analysis))
+
+    sizes = list(executor.map(analysis_size, analyses))
+    for analysis, size in zip(analyses, sizes):
+        print(f"{analysis['id']} : {analysis['name']} : {format_size(size)}")
+
+    cache_size = sum(p.stat().st_size for p in cache_files)
+    print(f'Server storage to free: {format_size(sum(sizes))} across {len(analyses)} analyses.')
+    print(f'Local cache to free: {format_size(cache_size)} across {len(cache_files)} files.')
+
+
+def delete_analyses(client, analysis_ids, executor, limiter):
+    '''Delete the analyses concurrently. Returns the ids deleted.
+    '''
+    def delete(id):
+        limiter.wait()
+        try:
+            client.analyses.delete(id)
+            print(f'Anlaysis #{id} deleted.')
+            return id
+        except (HTTPError, OasisException):
+            logger.error(f'Failed to delete: {id}.')
+            return None
 
+    return [id for id in executor.map(delete, analysis_ids) if id is not None]
 
 
 def main():
@@ -28,11 +118,18 @@ def main():
     parser.add_argument('--log', help='Set logging level.', default='WARNING')
     parser.add_argument('--retry_time', help='Time between retries (s).', default=60, type=int)
     parser.add_argument('--n_retries', help='Number of retries.', default=30, type=int)
+    parser.add_argument('-w', '--workers', help='Number of concurrent requests (default 8).',
+                        default=8, type=int)
+    parser.add_argument('--rate', help='Maximum requests per second, 0 for no limit (default 10).',
+                        default=10, type=float)
+    parser.add_argument('--dry-run', help='Report the storage which would be freed without deleting.',
+                        default=False, action='store_true')
+    parser.add_argument('--cache-dir', help='Local UI artifact cache to prune (default $OASIS_UI_CACHE_DIR).',
+                        default=os.environ.get('OASIS_UI_CACHE_DIR'))
 
     args = parser.parse_args()
 
     logging.basicConfig(level=args.log.upper())
-    logger = logging.getLogger(__name__)
 
     week_ago = datetime.datetime.today() - datetime.timedelta(days=args.days)
     week_ago = week_ago.strftime('%Y-%m-%d')
@@ -59,28 +156,39 @@ def main():
     old_analyses = client.analyses.search(metadata={'created__lt': week_ago}).json()
     analysis_ids = [a['id'] for a in old_analyses]
 
-    confirmed = 'n'
-    if not args.force:
-        print('Deleting the following analyses: ')
-        for analysis in old_analyses:
-            print(f"{analysis['id']} : {analysis['name']}")
-
-        while True:
-            try:
-                confirmed = input('Confirm deletion [y/n]: ')
-                if confirmed not in ['y', 'n', 'Y', 'N']:
-                    raise ValueError
-                break
-            except ValueError:
-                print('Invalid input. Please enter y/n')
-
-    if args.force or confirmed in ['y', 'Y']:
-        for id in analysis_ids:
-            try:
-                client.analyses.delete(id)
-                print(f'Anlaysis #{id} deleted.')
-            except HTTPError:
-                logger.error(f'Failed to delete: {id}.')
+    cache_files = cached_artifacts(args.cache_dir, analysis_ids)
+
+    # Allow a connection per worker
+    client.api.mount(client.api.url_base, HTTPAdapter(max_retries=client.api.retry_max,
+                                                      pool_connections=args.workers,
+                                                      pool_maxsize=args.workers))
+    limiter = RateLimiter(args.rate)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        if args.dry_run:
+            storage_report(client, old_analyses, cache_files, executor, limiter)
+            return
+
+        confirmed = 'n'
+        if not args.force:
+            print('Deleting the following analyses: ')
+            for analysis in old_analyses:
+                print(f"{analysis['id']} : {analysis['name']}")
+
+            while True:
+                try:
+                    confirmed = input('Confirm deletion [y/n]: ')
+                    if confirmed not in ['y', 'n', 'Y', 'N']:
+                        raise ValueError
+                    break
+                except ValueError:
+                    print('Invalid input. Please enter y/n')
+
+        if args.force or confirmed in ['y', 'Y']:
+            deleted = delete_analyses(client, analysis_ids, executor, limiter)
+            for path in cached_artifacts(args.cache_dir, deleted):
+                path.unlink(missing_ok=True)
+                print(f'Removed cached artifact {path.name}.')
 
 if __name__=="__main__":
     main()
@@ -1,5 +1,9 @@
 import pytest
+import streamlit as st
+from modules.artifacts import get_analysis_artifact
 from modules.client import ClientInterface
+from modules.results import get_result_store
+from modules.summaries import get_results_summary
 from tests.mocks import MockApiClient
 from streamlit.testing.v1 import AppTest
 
@@ -9,6 +13,15 @@ def no_requests(monkeypatch):
     monkeypatch.delattr("requests.sessions.Session.request")
 
 
+@pytest.fixture(autouse=True)
+def clear_shared_caches():
+    """Clear the process wide caches of analysis files and access checks between tests."""
+    st.cache_data.clear()
+    get_analysis_artifact.clear()
+    get_results_summary.clear()
+    get_result_store.clear()
+
+
 def pytest_configure(config):
     config.portfolio_ID = 2
     config.portfolios_data = [{
@@ -1,4 +1,26 @@
+from collections import Counter
+from types import SimpleNamespace
+import io
+import tarfile
+import threading
+import time
+
+import pandas as pd
 from oasis_data_manager.errors import OasisException
+from requests.exceptions import HTTPError
+
+from scripts.generate_synthetic_data import generate
+
+
+def make_tar(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
 
 class MockJsonObject:
     def __init__(self, data = {}):
@@ -42,3 +64,158 @@ class MockApiClient:
                     'name': portfolio_name
                 }
             ]
+
+
+class MockResponse:
+    '''Response of the `SlowMockApiClient` with json data or file content.
+    '''
+    def __init__(self, data=None, content=b''):
+        self.data = data
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+    def json(self):
+        return self.data
+
+
+class RequestLog:
+    '''
+    Request counter shared by the endpoints of a `SlowMockApiClient`, sleeping
+    `latency` seconds on every request like a remote server.
+    '''
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def request(self, route):
+        with self._lock:
+            self.requests.append(route)
+        time.sleep(self.latency)
+
+    def counts(self):
+        '''Number of requests to each route, e.g. `GET analyses/{id}/settings/`.
+        '''
+        return Counter(self.requests)
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+
+class SlowMockFileEndpoint:
+    '''File endpoint, e.g. `analyses/{id}/output_file/`, serving raw bytes.
+    '''
+    def __init__(self, log, route, files):
+        self.log = log
+        self.route = route
+        self.files = files
+
+    def get(self, ID):
+        self.log.request(f'GET {self.route}')
+        if ID not in self.files:
+            raise HTTPError(f'404 Client Error: Not Found for url: {self.route.format(id=ID)}')
+        return MockResponse(content=self.files[ID])
+
+    def get_dataframe(self, ID):
+        return pd.read_csv(io.BytesIO(self.get(ID).content))
+
+
+class SlowMockEndpoint:
+    '''
+    Json endpoint of the `SlowMockApiClient`, e.g. `analyses/`, with a file
+    endpoint attribute for each name in `files`.
+    '''
+    def __init__(self, log, name, records, files=None):
+        self.log = log
+        self.name = name
+        self.records = {r['id']: r for r in records}
+        for filename, contents in (files or {}).items():
+            setattr(self, filename, SlowMockFileEndpoint(log, f'{name}/{{id}}/{filename}/', contents))
+
+    def get(self, ID=None):
+        if ID is None:
+            self.log.request(f'GET {self.name}/')
+            return MockResponse(list(self.records.values()))
+
+        self.log.request(f'GET {self.name}/{{id}}/')
+        if ID not in self.records:
+            raise HTTPError(f'404 Client Error: Not Found for url: {self.name}/{ID}/')
+        return MockResponse(self.records[ID])
+
+    def search(self, metadata={}):
+        self.log.request(f'GET {self.name}/?search')
+        return MockResponse([r for r in self.records.values()
+                             if all(r.get(k) == v for k, v in metadata.items())])
+
+
+class SlowMockSettingsEndpoint:
+    def __init__(self, log, route, settings):
+        self.log = log
+        self.route = route
+        self.settings = settings
+
+    def get(self, ID):
+        self.log.request(f'GET {self.route}')
+        if ID not in self.settings:
+            raise HTTPError(f'404 Client Error: Not Found for url: {self.route.format(id=ID)}')
+        return MockResponse(self.settings[ID])
+
+
+class SlowMockApiClient:
+    '''
+    Stand in for the `APIClient` serving synthetic portfolios, models and
+    completed analyses, with `latency` seconds added to every request.
+    Requests are recorded in `log`.
+
+    Every portfolio shares one synthetic exposure and every analysis one set
+    of synthetic outputs from `scripts.generate_synthetic_data`.
+
+    Parameters
+    ----------
+    n_portfolios : int
+    n_models : int
+    n_analyses : int
+    n_locations : int
+                  Locations in each portfolio.
+    n_rows : int
+             Event loss rows in each analysis output.
+    latency : float
+              Seconds each request takes.
+    '''
+    def __init__(self, n_portfolios=3, n_models=2, n_analyses=3, n_locations=1000,
+                 n_rows=10_000, latency=0.0, seed=0):
+        inputs, outputs, settings = generate(n_locations, n_rows, seed=seed)
+        location_csv = inputs['location.csv'].to_csv(index=False).encode()
+        input_tar = make_tar({f'input/{n}': df.to_csv(index=False).encode() for n, df in inputs.items()})
+        output_tar = make_tar({f'output/{n}': df.to_csv(index=False).encode() for n, df in outputs.items()})
+
+        created = '2026-01-01T00:00:00.000000Z'
+        portfolios = [{'id': i, 'name': f'portfolio {i}', 'created': created, 'modified': created,
+                       'location_file': {'name': 'location.csv', 'stored': 'location.csv'},
+                       'accounts_file': None}
+                      for i in range(1, n_portfolios + 1)]
+        models = [{'id': i, 'supplier_id': 'OasisLMF', 'model_id': f'model{i}', 'version_id': '1',
+                   'run_mode': 'V2', 'created': created, 'modified': created}
+                  for i in range(1, n_models + 1)]
+        analyses = [{'id': i, 'name': f'analysis {i}', 'portfolio': (i - 1) % n_portfolios + 1,
+                     'model': (i - 1) % n_models + 1, 'status': 'RUN_COMPLETED',
+                     'created': created, 'modified': created, 'settings': 'settings',
+                     'input_file': 'input_file', 'output_file': 'output_file'}
+                    for i in range(1, n_analyses + 1)]
+
+        self.log = RequestLog(latency)
+        self.api = SimpleNamespace(tkn_access=f'mock-token-{id(self)}')
+        self.portfolios = SlowMockEndpoint(self.log, 'portfolios', portfolios,
+                                           files={'location_file': {p['id']: location_csv for p in portfolios}})
+        self.models = SlowMockEndpoint(self.log, 'models', models)
+        self.models.settings = SlowMockSettingsEndpoint(self.log, 'models/{id}/settings/',
+                                                        {m['id']: {'name': f"Model {m['id']}"} for m in models})
+        self.analyses = SlowMockEndpoint(self.log, 'analyses', analyses,
+                                         files={'input_file': {a['id']: input_tar for a in analyses},
+                                                'output_file': {a['id']: output_tar for a in analyses}})
+        self.analyses.settings = SlowMockSettingsEndpoint(self.log, 'analyses/{id}/settings/',
+                                                          {a['id']: settings for a in analyses})
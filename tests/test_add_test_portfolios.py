@@ -0,0 +1,60 @@
+from scripts.add_test_portfolios import content_hash, plan_uploads, record_uploads
+
+
+def write_entry(tmp_path, name, location):
+    path = tmp_path / f'{name}_location.csv'
+    path.write_bytes(location)
+    return {'portfolio_name': name, 'location_fp': str(path)}
+
+
+def test_content_hash(tmp_path):
+    a = write_entry(tmp_path, 'a', b'LocNumber\n1\n')
+    b = write_entry(tmp_path, 'b', b'LocNumber\n1\n')
+    c = write_entry(tmp_path, 'c', b'LocNumber\n2\n')
+
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash(c)
+    assert content_hash(a, chunk_size=2) == content_hash(a)
+    # The same file as accounts is a different portfolio
+    assert content_hash({'accounts_fp': a['location_fp']}) != content_hash(a)
+
+
+def test_plan_uploads():
+    manifest = {'h1': {'id': 1, 'name': 'seeded'}, 'h2': {'id': 2, 'name': 'changed'}}
+    existing = [{'id': 1, 'name': 'seeded'}, {'id': 2, 'name': 'changed'},
+                {'id': 3, 'name': 'manual'}]
+    entries = {
+        'seeded': {'portfolio_name': 'seeded', 'content_hash': 'h1'},
+        'changed': {'portfolio_name': 'changed', 'content_hash': 'h3'},
+        'manual': {'portfolio_name': 'manual', 'content_hash': 'h4'},
+        'new': {'portfolio_name': 'new', 'content_hash': 'h5'},
+        'duplicate': {'portfolio_name': 'duplicate', 'content_hash': 'h5'},
+    }
+
+    assert plan_uploads(entries, existing, manifest) == [
+        ('skip', 'seeded', 1),
+        ('update', 'changed', 2),
+        ('skip', 'manual', 3),
+        ('create', 'new', None),
+        ('skip', 'duplicate', None),
+    ]
+
+
+def test_record_uploads_only_seeded():
+    manifest = {'h2': {'id': 2, 'name': 'changed'}}
+    entries = {
+        'changed': {'portfolio_name': 'changed', 'content_hash': 'h3'},
+        'manual': {'portfolio_name': 'manual', 'content_hash': 'h4'},
+        'new': {'portfolio_name': 'new', 'content_hash': 'h5'},
+        'failed': {'portfolio_name': 'failed', 'content_hash': 'h6'},
+    }
+    results = [('update', 'changed', 2), ('skip', 'manual', 3), ('create', 'new', 4),
+               ('create', 'failed', None)]
+
+    manifest = record_uploads(manifest, entries, results)
+    assert manifest == {'h3': {'id': 2, 'name': 'changed'}, 'h5': {'id': 4, 'name': 'new'}}
+
+    # A portfolio not seeded by the script is still left alone once its files change
+    existing = [{'id': 3, 'name': 'manual'}]
+    changed = {'manual': {'portfolio_name': 'manual', 'content_hash': 'h7'}}
+    assert plan_uploads(changed, existing, manifest) == [('skip', 'manual', 3)]
@@ -0,0 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+import pandas as pd
+from requests import HTTPError
+
+import modules.artifacts
+from modules.artifacts import (AnalysisArtifact, artifact_cache_path, get_analysis_artifact,
+                               persist_bytes, prune_artifact_cache, read_persisted_bytes)
+from tests.mocks import make_tar
+
+
+def test_analysis_artifact():
+    location = b'LocNumber,Latitude\n1,0.5\n2,1.5\n'
+    content = make_tar({'input/location.csv': location, 'input/run.log': b'log'})
+    artifact = AnalysisArtifact(content)
+
+    assert artifact.names() == ['location.csv', 'run.log']
+    assert artifact.dataframe_names() == ['location.csv']
+    assert artifact.member_bytes('location.csv') == location
+    assert artifact.dataframe('missing.csv') is None
+
+    dataframes = artifact.dataframes()
+    assert list(dataframes) == ['location.csv']
+    pd.testing.assert_frame_equal(dataframes['location.csv'],
+                                  pd.DataFrame({'LocNumber': [1, 2], 'Latitude': [0.5, 1.5]}))
+    assert artifact.dataframe('location.csv') is dataframes['location.csv']
+
+
+def test_artifact_frames_parse_on_access():
+    artifact = AnalysisArtifact(make_tar({'a.csv': b'x\n1\n', 'b.csv': b'y\n2\n', 'run.log': b'log'}))
+    frames = artifact.frames()
+
+    assert list(frames) == ['a.csv', 'b.csv']
+    assert frames.get('run.log') is None
+    assert frames['b.csv']['y'].tolist() == [2]
+    assert list(artifact._dataframes) == ['b.csv']
+
+
+class FakeAnalyses:
+    def __init__(self, available=True, accessible=True):
+        self.calls = 0
+        self.available = available
+        self.accessible = accessible
+
+    def get(self, ID):
+        if not self.accessible:
+            raise HTTPError(f'403 Forbidden: analyses/{ID}/')
+        return {'id': ID}
+
+    def get_artifact(self, ID, filename):
+        self.calls += 1
+        if not self.available:
+            return None
+        return AnalysisArtifact(make_tar({'a.csv': b'x\n1\n'}))
+
+
+class FakeClientInterface:
+    def __init__(self, user_key='user', **kwargs):
+        self.user_key = user_key
+        self.analyses = FakeAnalyses(**kwargs)
+
+
+def test_get_analysis_artifact_shared():
+    ci = FakeClientInterface()
+    artifact = get_analysis_artifact(ci, 1, 'output_file', 'a')
+    assert get_analysis_artifact(ci, 1, 'output_file', modified='a') is artifact
+    assert ci.analyses.calls == 1
+
+    # One copy serves every user who can get the analysis
+    other = FakeClientInterface(user_key='other')
+    assert get_analysis_artifact(other, 1, 'output_file', 'a') is artifact
+    assert other.analyses.calls == 0
+
+    denied = FakeClientInterface(user_key='denied', accessible=False)
+    assert get_analysis_artifact(denied, 1, 'output_file', 'a') is None
+    assert denied.analyses.calls == 0
+
+
+def test_get_analysis_artifact_unavailable_not_cached():
+    ci = FakeClientInterface(available=False)
+    assert get_analysis_artifact(ci, 1, 'output_file', 'a') is None
+
+    ci.analyses.available = True
+    assert get_analysis_artifact(ci, 1, 'output_file', 'a') is not None
+    assert ci.analyses.calls == 2
+
+
+def test_get_analysis_artifact_persisted(tmp_path, monkeypatch):
+    monkeypatch.setenv('OASIS_UI_CACHE_DIR', str(tmp_path))
+    ci = FakeClientInterface()
+    artifact = get_analysis_artifact(ci, 1, 'output_file', '2026-01-01T00:00')
+    path = artifact_cache_path(tmp_path, 1, 'output_file', '2026-01-01T00:00')
+    assert path.name == 'analysis_1_output_file_20260101T0000.tar.gz'
+    assert path.read_bytes() == artifact.content
+
+    get_analysis_artifact.clear()
+    assert get_analysis_artifact(ci, 1, 'output_file', '2026-01-01T00:00').content == artifact.content
+    assert ci.analyses.calls == 1
+
+    # Persisted artifacts are only read for users with access to the analysis
+    denied = FakeClientInterface(user_key='other', accessible=False)
+    assert get_analysis_artifact(denied, 1, 'output_file', '2026-01-01T00:00') is None
+
+
+def test_artifact_parses_once_across_threads():
+    artifact = AnalysisArtifact(make_tar({'a.csv': b'x\n1\n'}))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        frames = list(executor.map(lambda _: artifact.dataframe('a.csv'), range(8)))
+    assert all(df is frames[0] for df in frames)
+
+
+def test_prune_artifact_cache(tmp_path):
+    paths = [tmp_path / f'analysis_{i}_output_file_a.tar.gz' for i in range(4)]
+    for i, path in enumerate(paths):
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (i, i))
+    read_persisted_bytes(paths[0])
+
+    removed = prune_artifact_cache(tmp_path, max_bytes=300, keep=paths[1])
+    assert removed == [paths[2]]
+    assert sorted(tmp_path.iterdir()) == [paths[0], paths[1], paths[3]]
+
+
+def test_persist_bytes_removes_temp_files(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    path = tmp_path / 'analysis_1_output_file_a.tar.gz'
+    monkeypatch.setattr(modules.artifacts.os, 'replace', fail)
+    assert not persist_bytes(path, b'x')
+    assert list(tmp_path.iterdir()) == []
+    monkeypatch.undo()
+
+    # Temporary files of interrupted writes are pruned once old
+    old, recent = tmp_path / 'old.tmp', tmp_path / 'recent.tmp'
+    old.write_bytes(b'x')
+    recent.write_bytes(b'x')
+    stale = time.time() - modules.artifacts.TEMP_FILE_MAX_AGE - 1
+    os.utime(old, (stale, stale))
+    assert prune_artifact_cache(tmp_path, max_bytes=0) == [old]
+    assert list(tmp_path.iterdir()) == [recent]
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from modules.assets import ZOOM_LEVELS_CSV, get_zoom_levels, warm_up
+from pages.components.display import find_zoom_level
+
+
+def test_find_zoom_level():
+    zoom_df = pd.read_csv(ZOOM_LEVELS_CSV)
+    for lon_range in [500, 360, 200, 90, 10, 0.5, 1e-6, 0]:
+        masked = zoom_df[zoom_df['tile_width_longitudes'] < lon_range]
+        expected = 18 if masked.empty else min(max(masked.iloc[0, :].name - 1, 0), 18)
+        assert find_zoom_level(lon_range) == expected
+
+    with pytest.raises(ValueError):
+        get_zoom_levels()[0] = 1
+
+
+def test_warm_up():
+    def fail():
+        raise OSError('missing')
+
+    timings = warm_up([('ok', lambda: None), ('broken', fail)])
+    assert list(timings) == ['ok']
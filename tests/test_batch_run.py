@@ -0,0 +1,62 @@
+import json
+
+from scripts.batch_run import BatchRunner, load_sweep, resolve_runs
+
+
+class FakeClientInterface:
+    '''Analyses step through generation and running on each poll.'''
+    progress = {
+        'INPUTS_GENERATION_QUEUED': 'READY',
+        'RUN_QUEUED': 'RUN_STARTED',
+        'RUN_STARTED': 'RUN_COMPLETED',
+    }
+
+    def __init__(self):
+        self.analyses = self
+        self.created = {}
+        self.max_active = 0
+
+    def create_and_generate_analysis(self, portfolio_id, model_id, name, wait=True):
+        assert not wait
+        analysis = {'id': len(self.created) + 1, 'name': name, 'status': 'INPUTS_GENERATION_QUEUED'}
+        self.created[analysis['id']] = analysis
+        return dict(analysis)
+
+    def upload_settings(self, analysis_id, settings):
+        self.created[analysis_id]['settings'] = settings
+
+    def run(self, analysis_id):
+        self.created[analysis_id]['status'] = 'RUN_QUEUED'
+
+    def get(self, ID=None):
+        assert ID is not None, 'Polling lists every analysis'
+        active = [a for a in self.created.values() if a['status'] != 'RUN_COMPLETED']
+        self.max_active = max(self.max_active, len(active))
+        analysis = self.created[ID]
+        snapshot = dict(analysis)
+        analysis['status'] = self.progress.get(analysis['status'], analysis['status'])
+        return snapshot
+
+
+def test_batch_run(tmp_path):
+    settings_path = tmp_path / 'settings.json'
+    settings_path.write_text(json.dumps({'gul_output': True}))
+    sweep_path = tmp_path / 'sweep.json'
+    sweep_path.write_text(json.dumps({'portfolios': [1, 'large'], 'models': ['PiWind'],
+                                      'settings': [str(settings_path)] * 3}))
+
+    runs = resolve_runs(load_sweep(sweep_path),
+                        portfolios=[{'id': 1, 'name': 'small'}, {'id': 2, 'name': 'large'}],
+                        models=[{'id': 5, 'model_id': 'PiWind', 'supplier_id': 'OasisLMF'}])
+    assert len(runs) == 6
+    assert runs[3] == {'portfolio_id': 2, 'model_id': 5, 'settings': {'gul_output': True},
+                       'name': 'large-PiWind-settings'}
+
+    ci = FakeClientInterface()
+    messages = []
+    results = BatchRunner(ci, runs, window=2, poll_interval=0, out=messages.append).run()
+
+    assert [r['status'] for r in results] == ['RUN_COMPLETED'] * 6
+    assert ci.max_active == 2
+    assert all(a['settings'] == {'gul_output': True} for a in ci.created.values())
+    assert any('RUN_STARTED -> RUN_COMPLETED' in m for m in messages)
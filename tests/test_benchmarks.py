@@ -0,0 +1,224 @@
+'''
+Benchmarks of the output processing hot paths on synthetic outputs.
+
+Each case records its best wall time and peak traced memory and fails if
+either regresses beyond the tolerance of its baseline in `benchmarks.json`.
+Wall times depend on the machine, so they are compared relative to a fixed
+reference pandas operation timed in the same run. Only the 10k row size
+runs by default:
+
+    OASIS_BENCHMARK_SIZES=10k,1m python -m pytest tests/test_benchmarks.py
+
+Environment variables:
+    OASIS_BENCHMARK_SIZES: Comma separated sizes from `SIZES`.
+    OASIS_BENCHMARK_TOLERANCE: Allowed fractional slowdown, default 1.0.
+    OASIS_BENCHMARK_UPDATE: If set, write the results as the new baselines.
+    OASIS_BENCHMARK_REPORT: Path to write the results to as json.
+'''
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+from modules.assets import start_warm_up
+from modules.geometry import get_country_geometries
+from modules.summaries import summarise_locations
+from modules.visualisation import OutputInterface
+from pages.components.output import elt_group_fields, eltcalc_map, group_ept, group_leccalc, pltcalc_bar
+from scripts.generate_synthetic_data import generate
+
+SIZES = {'10k': 10_000, '1m': 1_000_000}
+BASELINE_PATH = Path(__file__).parent / 'benchmarks.json'
+
+TIME_TOLERANCE = float(os.environ.get('OASIS_BENCHMARK_TOLERANCE', 1.0))
+MEMORY_TOLERANCE = 0.5
+# Absolute slack so timer and allocator noise on small sizes never fails
+MIN_TIME_DELTA = 0.05
+MIN_MEMORY_DELTA = 4
+# Rows of the reference operation wall times are measured relative to
+REFERENCE_ROWS = 1_000_000
+
+OED_FIELDS = ['LocNumber', 'CountryCode']
+
+
+def selected_sizes():
+    sizes = os.environ.get('OASIS_BENCHMARK_SIZES', '10k').lower().split(',')
+    return [s.strip() for s in sizes if s.strip()]
+
+
+def load_baselines():
+    if not BASELINE_PATH.exists():
+        return {}
+    return json.loads(BASELINE_PATH.read_text())
+
+
+def measure(func, repeats):
+    '''Best wall time of `repeats` calls and the peak traced memory of one call in MiB.
+    '''
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': round(min(times), 4), 'peak_mb': round(peak / 2**20, 2)}
+
+
+def reference_seconds():
+    '''Best wall time of a fixed pandas grouped sum and sort, the unit of the relative times.
+    '''
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'key': rng.integers(0, 1000, REFERENCE_ROWS), 'value': rng.random(REFERENCE_ROWS)})
+    return measure(lambda: df.groupby('key')['value'].sum().sort_values(), repeats=5)['seconds']
+
+
+def output_interface(outputs):
+    vis = OutputInterface(outputs)
+    vis.set_oed_fields('gul', OED_FIELDS)
+    return vis
+
+
+def plt_from_melt(melt, info, seed=0):
+    '''Period loss table with a random date for each event of `melt`.
+    '''
+    rng = np.random.default_rng(seed)
+    n_events = melt['EventId'].max()
+    years = rng.integers(1, 1001, n_events + 1)
+    months = rng.integers(1, 13, n_events + 1)
+    days = rng.integers(1, 29, n_events + 1)
+    plt = melt[['EventId', 'SummaryId', 'MeanLoss']].assign(Year=years[melt['EventId']],
+                                                          Month=months[melt['EventId']],
+                                                          Day=days[melt['EventId']])
+    return OutputInterface.add_oed_fields(plt, info, OED_FIELDS)
+
+
+# Each case prepares its inputs outside the timed call
+def case_output_get(inputs, outputs):
+    vis = output_interface(outputs)
+    return lambda: vis.get(1, 'gul', 'eltcalc')
+
+
+def case_add_oed_fields(inputs, outputs):
+    elt = outputs['gul_S1_eltcalc.csv']
+    info = outputs['gul_S1_summary-info.csv']
+    return lambda: OutputInterface.add_oed_fields(elt, info, OED_FIELDS)
+
+
+def case_elt_group_fields(inputs, outputs):
+    map_df = output_interface(outputs).get(1, 'gul', 'eltcalc')[['mean'] + OED_FIELDS]
+
+    def run():
+        st.cache_data.clear()
+        elt_group_fields(map_df, ['CountryCode'], categorical_cols=OED_FIELDS)
+    return run
+
+
+def case_eltcalc_map_heatmap(inputs, outputs):
+    map_df = output_interface(outputs).get(1, 'gul', 'eltcalc')
+    locations = inputs['location.csv']
+
+    def run():
+        st.cache_data.clear()
+        eltcalc_map(map_df, locations, OED_FIELDS, map_type='heatmap')
+    return run
+
+
+def case_eltcalc_map_choropleth(inputs, outputs):
+    map_df = output_interface(outputs).get(1, 'gul', 'eltcalc')
+    locations = inputs['location.csv']
+    get_country_geometries()
+
+    def run():
+        st.cache_data.clear()
+        eltcalc_map(map_df, locations, OED_FIELDS, map_type='choropleth')
+    return run
+
+
+def case_pltcalc_bar(inputs, outputs):
+    plt = plt_from_melt(outputs['gul_S1_melt.csv'], outputs['gul_S1_summary-info.csv'])
+    return lambda: st.plotly_chart(pltcalc_bar(plt, 'CountryCode'))
+
+
+def case_group_leccalc(inputs, outputs):
+    result = output_interface(outputs).get(1, 'gul', 'leccalc', analysis_type='full_uncertainty',
+                                           loss_type='aep')
+    return lambda: group_leccalc(result, 'full_uncertainty', 'CountryCode', OED_FIELDS)
+
+
+def case_group_ept(inputs, outputs):
+    result = output_interface(outputs).get(1, 'gul', 'ept')
+    return lambda: group_ept(result, 'CountryCode')
+
+
+def case_summarise_locations(inputs, outputs):
+    locations = inputs['location.csv']
+    return lambda: summarise_locations(locations)
+
+
+CASES = {name[len('case_'):]: func for name, func in globals().items() if name.startswith('case_')}
+
+
+@pytest.fixture(scope='module', params=selected_sizes())
+def synthetic(request):
+    # Measure on a quiet process, not alongside the background asset loading
+    start_warm_up().join()
+
+    n_rows = SIZES[request.param]
+    inputs, outputs, _ = generate(max(n_rows // 10, 100), n_rows, seed=0)
+    return request.param, inputs, outputs
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return reference_seconds()
+
+
+@pytest.fixture(scope='module')
+def benchmark_results():
+    results = {}
+    yield results
+
+    if os.environ.get('OASIS_BENCHMARK_UPDATE'):
+        baselines = load_baselines()
+        for (case, size), result in results.items():
+            baselines.setdefault(case, {})[size] = result
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+
+    report_path = os.environ.get('OASIS_BENCHMARK_REPORT')
+    if report_path:
+        report = {f'{case}[{size}]': result for (case, size), result in results.items()}
+        Path(report_path).write_text(json.dumps(report, indent=2))
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('case', list(CASES))
+def test_benchmark(case, synthetic, reference, benchmark_results):
+    size, inputs, outputs = synthetic
+    func = CASES[case](inputs, outputs)
+    result = measure(func, repeats=3 if SIZES[size] <= 10_000 else 1)
+    result['relative'] = round(result['seconds'] / reference, 3)
+    benchmark_results[(case, size)] = result
+
+    baseline = load_baselines().get(case, {}).get(size)
+    if baseline is None or os.environ.get('OASIS_BENCHMARK_UPDATE'):
+        return
+
+    max_peak = max(baseline['peak_mb'] * (1 + MEMORY_TOLERANCE), baseline['peak_mb'] + MIN_MEMORY_DELTA)
+    assert result['peak_mb'] <= max_peak, f"{case}[{size}] peaked at {result['peak_mb']}MiB, baseline {baseline['peak_mb']}MiB"
+
+    max_relative = max(baseline['relative'] * (1 + TIME_TOLERANCE), baseline['relative'] + MIN_TIME_DELTA / reference)
+    assert result['relative'] <= max_relative, (f"{case}[{size}] took {result['relative']} reference times, "
+                                                f"baseline {baseline['relative']}")
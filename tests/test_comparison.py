@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from modules.artifacts import AnalysisArtifact
+
+from modules.comparison import compare_results, interpolate_ep_curves, pairwise_comparison
+from modules.comparison import resample_ep_curves, unique_names, ComparisonSession
+from tests.mocks import make_tar
+
+
+def test_compare_results():
+    results = [
+        pd.DataFrame({'event_id': [1, 1, 2], 'LocNumber': ['A', 'B', 'A'], 'mean': [1.0, 2.0, 4.0]}),
+        pd.DataFrame({'event_id': [1, 2, 3], 'LocNumber': ['A', 'A', 'A'], 'mean': [2.0, 2.0, 1.0]}),
+        pd.DataFrame({'event_id': [1], 'LocNumber': ['A'], 'mean': [0.5]}),
+    ]
+    names = ['base', 'defended', 'undefended']
+
+    comparison = compare_results(results, names, ['event_id', 'LocNumber'])
+    comparison = comparison.set_index(['event_id', 'LocNumber'])
+
+    assert comparison.loc[(1, 'B'), 'defended'] == 0
+    assert comparison.loc[(3, 'A'), 'base'] == 0
+    np.testing.assert_allclose(comparison.loc[(1, 'A'), ['defended_delta', 'undefended_delta']],
+                               [1.0, -0.5])
+    np.testing.assert_allclose(comparison.loc[(2, 'A'), 'defended_relative_delta'], -0.5)
+    assert np.isnan(comparison.loc[(3, 'A'), 'defended_relative_delta'])
+    assert (comparison['base_delta'] == 0).all()
+
+
+def test_compare_results_baseline():
+    results = [
+        pd.DataFrame({'event_id': [1], 'mean': [1.0]}),
+        pd.DataFrame({'event_id': [1], 'mean': [4.0]}),
+    ]
+
+    comparison = compare_results(results, ['a', 'b'], ['event_id'], baseline='b')
+
+    assert comparison['a_delta'].tolist() == [-3.0]
+    assert comparison['a_relative_delta'].tolist() == [-0.75]
+
+
+def test_unique_names():
+    assert unique_names(['a', 'b', 'a', 'a']) == ['a', 'b', 'a (2)', 'a (3)']
+
+
+def test_interpolate_ep_curves():
+    rng = np.random.default_rng(0)
+    groups = np.repeat([0, 1, 2], 10)
+    return_periods = np.concatenate([np.sort(rng.uniform(1, 1000, 10)) for _ in range(3)])
+    losses = rng.uniform(0, 100, 30)
+    grid = np.geomspace(1, 1000, 25)
+
+    interpolated = interpolate_ep_curves(groups, return_periods, losses, grid)
+
+    for g in range(3):
+        rp = return_periods[groups == g]
+        expected = np.interp(np.log(grid), np.log(rp), losses[groups == g])
+        in_range = (grid >= rp.min()) & (grid <= rp.max())
+        np.testing.assert_allclose(interpolated[g][in_range], expected[in_range])
+        assert np.isnan(interpolated[g][~in_range]).all()
+
+
+def test_resample_ep_curves_and_pairwise_comparison():
+    results = [
+        pd.DataFrame({'summary_id': [1, 1, 2, 2], 'return_period': [10, 100, 10, 100],
+                      'loss': [1.0, 2.0, 10.0, 20.0]}),
+        pd.DataFrame({'summary_id': [1, 1], 'return_period': [10, 100],
+                      'loss': [2.0, 4.0]}),
+    ]
+    grid = np.array([10, 100])
+
+    resampled = resample_ep_curves(results, ['a', 'b'], 'summary_id', grid)
+
+    assert resampled['a'].tolist() == [1.0, 2.0, 10.0, 20.0]
+    assert resampled['b'].iloc[:2].tolist() == [2.0, 4.0]
+    assert resampled['b'].iloc[2:].isna().all()
+
+    pairwise = pairwise_comparison(resampled)
+    b_to_a = pairwise[(pairwise['analysis'] == 'b') & (pairwise['reference'] == 'a')]
+    assert b_to_a['ratio'].iloc[:2].tolist() == [2.0, 2.0]
+    assert b_to_a['difference'].iloc[:2].tolist() == [1.0, 2.0]
+    assert len(pairwise) == 2 * len(resampled)
+
+
+def test_comparison_session_fetches_once():
+    class FakeSettings:
+        def __init__(self, calls):
+            self.calls = calls
+
+        def get(self, ID):
+            self.calls.append((ID, 'settings'))
+            return {'gul_summaries': [{'oed_fields': ['LocNumber']}]}
+
+    class FakeAnalyses:
+        def __init__(self):
+            self.calls = []
+            self.settings = FakeSettings(self.calls)
+
+        def get(self, ID):
+            return {'id': ID}
+
+        def get_artifact(self, ID, filename):
+            self.calls.append((ID, filename))
+            if filename == 'input_file':
+                return AnalysisArtifact(make_tar({'location.csv': f'LocNumber\n{ID}\n'.encode()}))
+            return AnalysisArtifact(make_tar({'gul_S1_aalcalc.csv': b'summary_id\n1\n'}))
+
+    class FakeClientInterface:
+        analyses = FakeAnalyses()
+        user_key = 'user'
+
+    ci = FakeClientInterface()
+    session = ComparisonSession(ci, [{'id': 101, 'modified': 'a'}, {'id': 102, 'modified': 'b'}])
+
+    assert session.key == ((101, 'a'), (102, 'b'))
+    assert [loc['LocNumber'].iloc[0] for loc in session.locations()] == [101, 102]
+
+    gul = session.outputs('gul')
+    il = session.outputs('il')
+    assert gul[0] is il[0]
+    assert gul[0].oed_fields['gul'] == ['LocNumber']
+    assert sorted(ci.analyses.calls) == sorted((ID, f) for ID in [101, 102]
+                                               for f in ['settings', 'input_file', 'output_file'])
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from pages.components.display import bin_locations, prune_map_data
+
+
+def test_bin_locations():
+    locations = pd.DataFrame({
+        'Longitude': [0.001, 0.002, 10.0, np.nan],
+        'Latitude': [51.001, 51.003, 20.0, 1.0],
+        'BuildingTIV': [1.0, 2.0, 4.0, 8.0]
+    })
+
+    binned = bin_locations(locations, weights=['BuildingTIV'], zoom=5)
+    binned = binned.sort_values('Longitude').reset_index(drop=True)
+
+    assert binned['count'].tolist() == [2, 1]
+    assert binned['BuildingTIV'].tolist() == [3.0, 4.0]
+    np.testing.assert_allclose(binned['Longitude'], [0.0015, 10.0])
+    np.testing.assert_allclose(binned['Latitude'], [51.002, 20.0])
+
+
+def test_bin_locations_bounded_by_resolution():
+    rng = np.random.default_rng(0)
+    n = 100000
+    locations = pd.DataFrame({
+        'Longitude': rng.uniform(-5, 5, n),
+        'Latitude': rng.uniform(45, 55, n),
+    })
+
+    binned = bin_locations(locations, zoom=4)
+
+    assert binned['count'].sum() == n
+    assert len(binned) < 100 * 100
+
+
+def test_prune_map_data():
+    locations = pd.DataFrame({
+        'Longitude': [0.123456789, np.nan],
+        'Latitude': [51.987654321, 1.0],
+        'BuildingTIV': [1.005, 2.0],
+        'LocPerilsCovered': ['WTC', 'WTC'],
+        'AccNumber': ['A1', 'A2'],
+    })
+
+    pruned = prune_map_data(locations, columns=['BuildingTIV', 'LocPerilsCovered', 'Missing'])
+
+    assert pruned.columns.tolist() == ['lon', 'lat', 'BuildingTIV', 'LocPerilsCovered']
+    assert len(pruned) == 1
+    assert pruned['lon'].iloc[0] == 0.12346
+    assert pruned['lat'].iloc[0] == 51.98765
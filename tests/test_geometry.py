@@ -0,0 +1,15 @@
+from modules.geometry import CountryGeometries
+
+
+def test_country_geometries():
+    countries = CountryGeometries(tiers=[(2, 0.25), (None, 0)])
+
+    geojson = countries.geojson(['GH', 'NP', 'XX'], zoom=1)
+    assert [f['properties']['iso_a2'] for f in geojson['features']] == ['GH', 'NP']
+
+    center = countries.center(['GH'])
+    assert 5 < center['lat'] < 11
+    assert -3 < center['lon'] < 1
+
+    assert countries.center(['XX']) is None
+    assert countries.lon_range(['GH']) < 5
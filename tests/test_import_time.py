@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# Loaded only when a map, chart or portfolio validation is rendered
+HEAVY_MODULES = ['geopandas', 'pydeck', 'plotly.express', 'ods_tools']
+
+# Background threads started on import, e.g. the asset warm up, are waited for
+SCRIPT = '''
+import json, logging, sys, threading
+logging.disable(logging.CRITICAL)
+import {module}
+for thread in threading.enumerate():
+    if thread is not threading.main_thread():
+        thread.join(30)
+print(json.dumps([m for m in {heavy} if m in sys.modules]))
+'''
+
+
+def import_cold(module):
+    '''Import `module` in a fresh interpreter, returning the heavy modules loaded.
+    '''
+    script = SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', [
+    'pages.components.display',
+    'pages.components.output',
+    'pages.components.create',
+    'modules.visualisation',
+    'modules.geometry',
+    'modules.nav',
+])
+def test_page_import_time(module):
+    # Wall clock import times vary too much between machines to assert on
+    assert import_cold(module) == []
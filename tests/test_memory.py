@@ -0,0 +1,127 @@
+import pandas as pd
+import streamlit as st
+
+import modules.artifacts
+import modules.memory
+from modules.artifacts import AnalysisArtifact
+from modules.memory import MemoryGovernor, deep_size, register_data_cache
+from tests.mocks import make_tar
+
+
+def test_governor_evicts_least_recently_used():
+    # Registered data caches filled by other tests count towards the budget
+    st.cache_data.clear()
+    released = []
+    governor = MemoryGovernor(budget=100)
+    governor.track('a', 'a', 40, lambda: released.append('a'))
+    governor.track('b', 'b', 40, lambda: released.append('b'))
+    governor.touch('a')
+    governor.track('c', 'c', 40, lambda: released.append('c'))
+
+    assert released == ['b']
+    assert governor.tracked_size() == 80
+    assert governor.usage()['name'].tolist()[:2] == ['c', 'a']
+
+    # Entries which cannot be released are kept over budget
+    governor.track('d', 'd', 200)
+    assert released == ['b', 'a', 'c']
+    assert governor.tracked_size() == 200
+    assert governor.evictions == 3
+
+
+def test_artifact_parses_again_after_eviction(monkeypatch):
+    governor = MemoryGovernor(budget=1)
+    monkeypatch.setattr(modules.artifacts, 'get_memory_governor', lambda: governor)
+    artifact = AnalysisArtifact(make_tar({'a.csv': b'x\n1\n', 'b.csv': b'y\n2\n'}))
+
+    a = artifact.dataframe('a.csv')
+    assert artifact.dataframe('a.csv') is a
+    artifact.dataframe('b.csv')
+    assert list(artifact._dataframes) == ['b.csv']
+
+    reparsed = artifact.dataframe('a.csv')
+    assert reparsed is not a
+    pd.testing.assert_frame_equal(reparsed, a)
+    assert deep_size(reparsed) == deep_size(a)
+
+    token = artifact._token
+    del artifact, a, reparsed
+    assert all(key[0] != token for key in governor._entries)
+
+
+def test_persisted_artifact_content_reloaded(tmp_path, monkeypatch):
+    governor = MemoryGovernor(budget=1)
+    monkeypatch.setattr(modules.artifacts, 'get_memory_governor', lambda: governor)
+    content = make_tar({'a.csv': b'x\n1\n'})
+    path = tmp_path / 'artifact.tar.gz'
+    path.write_bytes(content)
+
+    artifact = AnalysisArtifact(content, path=path)
+    assert artifact.dataframe('a.csv')['x'].tolist() == [1]
+    assert artifact._content is None
+    assert artifact.content == content
+    assert artifact.size == len(content)
+
+
+def test_governor_clears_registered_data_cache():
+    calls = []
+
+    @register_data_cache
+    @st.cache_data
+    def double(df):
+        calls.append(1)
+        return df * 2
+
+    df = pd.DataFrame({'x': range(1000)})
+    double(df)
+    double(df)
+    assert len(calls) == 1
+
+    governor = MemoryGovernor(budget=1)
+    assert governor.data_cache_sizes()[f'{__name__}.{double.__qualname__}'] > 0
+    governor.enforce()
+    double(df)
+    assert len(calls) == 2
+
+
+def test_artifact_larger_than_budget(tmp_path, monkeypatch):
+    governor = MemoryGovernor(budget=1)
+    monkeypatch.setattr(modules.artifacts, 'get_memory_governor', lambda: governor)
+    content = make_tar({'a.csv': b'x\n1\n', 'b.csv': b'y\n2\n'})
+    path = tmp_path / 'artifact.tar.gz'
+    path.write_bytes(content)
+    reads = []
+    monkeypatch.setattr(modules.artifacts, 'read_persisted_bytes',
+                        lambda p: reads.append(p) or p.read_bytes())
+
+    # Persisted contents are read back from disk each time they are released
+    persisted = AnalysisArtifact(content, path=path)
+    for name in ['a.csv', 'b.csv', 'a.csv']:
+        assert persisted.dataframe(name).shape == (1, 1)
+    assert reads == [path, path]
+
+    # Contents only held in memory are kept over budget
+    kept = AnalysisArtifact(content)
+    for name in ['a.csv', 'b.csv', 'a.csv']:
+        assert kept.dataframe(name).shape == (1, 1)
+    assert kept._content is content
+
+
+def test_governor_throttles_data_cache_stats(monkeypatch):
+    calls = []
+
+    class Provider:
+        def get_stats(self):
+            calls.append(1)
+            return []
+
+    monkeypatch.setitem(modules.memory._data_caches, 'cache', None)
+    monkeypatch.setattr(modules.memory, 'get_data_cache_stats_provider', Provider)
+    governor = MemoryGovernor(budget=10**9)
+    for i in range(10):
+        governor.track(i, str(i), 10)
+    assert len(calls) == 1
+
+    # Data caches are not counted if the internal Streamlit API is missing
+    monkeypatch.setattr(modules.memory, 'get_data_cache_stats_provider', None)
+    assert set(MemoryGovernor().data_cache_sizes().values()) == {0}
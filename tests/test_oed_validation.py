@@ -0,0 +1,37 @@
+import io
+
+from modules.oed_validation import validate_oed_file, validate_portfolio_files
+
+LOCATIONS = '''PortNumber,AccNumber,LocNumber,CountryCode,LocPerilsCovered,LocCurrency,Latitude,Longitude,BuildingTIV
+1,A1,L1,GB,WTC;WSS,GBP,51.5,-0.1,1000
+1,A1,L2,GB,AA1,GBP,95.0,-0.1,1000
+1,A1,L3,GB,XYZ,GBP,51.5,-0.1,-5
+1,A1,L4,GB,WTC,GBP,51.5,abc,1000
+1,A1,L1,GB,WTC,GBP,51.5,-0.1,1000
+1,A1,L6,GB,WTC,,51.5,-0.1,1000
+'''
+
+
+def test_validate_oed_file():
+    file = io.BytesIO(LOCATIONS.encode())
+    issues = validate_oed_file(file, 'Loc', name='location.csv', chunksize=2)
+    found = {(i.column, i.message): i.rows for i in issues}
+
+    assert found == {
+        ('Latitude', 'Value out of range'): (2,),
+        ('BuildingTIV', 'Value out of range'): (3,),
+        ('LocPerilsCovered', 'Invalid peril code'): (3,),
+        ('Longitude', 'Value is not a number'): (4,),
+        ('PortNumber, AccNumber, LocNumber', 'Duplicate location'): (5,),
+        ('LocCurrency', 'Missing required value'): (6,),
+    }
+    assert file.tell() == 0
+
+
+def test_validate_portfolio_files():
+    valid = '\n'.join(LOCATIONS.splitlines()[:2]).encode()
+    assert validate_portfolio_files({'location_file': io.BytesIO(valid), 'accounts_file': None}) == []
+
+    issues = validate_portfolio_files({'location_file': io.BytesIO(b'PortNumber,AccNumber\n1,1\n')})
+    assert len(issues) == 1
+    assert issues[0].message.startswith('Missing required columns: LocNumber')
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from pages.components.output import rank_plt_dates
+
+
+def test_rank_plt_dates():
+    result = pd.DataFrame({
+        'Year': [1, 1, 2, 10, 10, 3],
+        'Month': [1, 1, 6, 12, 12, 2],
+        'Day': [5, 5, 30, 1, 1, 9],
+        'MeanLoss': [1.0, 2.0, 10.0, 4.0, np.nan, 0.5]
+    })
+
+    date_rank, labels, totals = rank_plt_dates(result, number_shown=3)
+
+    assert labels.tolist() == ['02-06-30', '10-12-01', '01-01-05']
+    np.testing.assert_allclose(totals, [10.0, 4.0, 3.0])
+    assert date_rank.tolist() == [2, 2, 0, 1, 1, -1]
+
+
+def test_rank_plt_dates_missing_dates():
+    result = pd.DataFrame({
+        'Year': [1, np.nan, 2, 1],
+        'Month': [1, 1, np.nan, 1],
+        'Day': [5, 5, 30, 5],
+        'MeanLoss': [1.0, 20.0, 10.0, 2.0]
+    })
+
+    date_rank, labels, totals = rank_plt_dates(result, number_shown=3)
+
+    assert labels.tolist() == ['1-01-05']
+    np.testing.assert_allclose(totals, [3.0])
+    assert date_rank.tolist() == [0, -1, -1, 0]
+
+
+def test_rank_plt_dates_date_id():
+    result = pd.DataFrame({
+        'date_id': ['2000-01-01', '2000-01-02', '2000-01-01', None],
+        'mean': [1.0, 1.5, 1.0, 5.0]
+    })
+
+    date_rank, labels, totals = rank_plt_dates(result, number_shown=10,
+                                               date_id=True, loss='mean')
+
+    assert labels.tolist() == ['2000-01-01', '2000-01-02']
+    np.testing.assert_allclose(totals, [2.0, 1.5])
+    assert date_rank.tolist() == [0, 1, 0, -1]
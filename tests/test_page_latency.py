@@ -0,0 +1,149 @@
+'''
+API call regression tests of the pages against a slow mock API.
+
+Each scenario renders a page with `AppTest` against a `SlowMockApiClient`,
+which adds a fixed latency to every request, and checks the requests made
+by the rerun exactly match the expected counts. Every scenario runs with a
+small and a larger number of portfolios and analyses, so a request made per
+portfolio or analysis fails the test.
+
+Render times depend on the machine, so they are only checked on request:
+each render may then take at most `RENDER_BUDGET` seconds on top of the
+time spent waiting on the API.
+
+Environment variables:
+    OASIS_PAGE_LATENCY: Seconds each mock API request takes, default 0.02.
+    OASIS_PAGE_ROWS: Event loss rows in each mock analysis, default 20000.
+    OASIS_PAGE_TIMING: If set, check the render times.
+    OASIS_PAGE_RENDER_BUDGET: Seconds allowed for a render, default 1.5.
+'''
+import json
+import os
+import time
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from modules.client import ClientInterface
+from modules.config import UIConfig
+from tests.mocks import SlowMockApiClient
+
+LATENCY = float(os.environ.get('OASIS_PAGE_LATENCY', 0.02))
+N_ROWS = int(os.environ.get('OASIS_PAGE_ROWS', 20_000))
+# Seconds allowed for a render on top of the time spent waiting on the API
+RENDER_BUDGET = float(os.environ.get('OASIS_PAGE_RENDER_BUDGET', 1.5))
+CHECK_TIMING = bool(os.environ.get('OASIS_PAGE_TIMING'))
+# Seconds before AppTest gives up on a render
+RENDER_TIMEOUT = 60
+# Number of portfolios and analyses served by the mock API
+SIZES = [3, 12]
+
+PAGES = ['Analyses', 'Scenarios', 'Dashboard', 'Comparison']
+
+
+@pytest.fixture(scope='module')
+def ui_config(tmp_path_factory):
+    path = tmp_path_factory.mktemp('config') / 'ui-config.json'
+    path.write_text(json.dumps({
+        'pages': [{'path': f'pages/{p.lower()}.py', 'label': p} for p in PAGES],
+        'skip_login': False,
+    }))
+    return UIConfig(str(path))
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda n: f'{n}_analyses')
+def api_client(request):
+    return SlowMockApiClient(n_portfolios=request.param, n_analyses=request.param,
+                             n_rows=N_ROWS, latency=LATENCY)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    st.cache_data.clear()
+
+
+def page_app(page, api_client, ui_config):
+    at = AppTest.from_file('app.py', default_timeout=RENDER_TIMEOUT)
+    at.session_state['client'] = api_client
+    at.session_state['client_interface'] = ClientInterface(client=api_client)
+    at.session_state['ui-config'] = ui_config
+    at.switch_page(page)
+    return at
+
+
+def timed_run(at, api_client):
+    '''Rerun `at`, returning the count of requests to each route.
+    '''
+    api_client.log.reset()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+
+    assert not at.exception, [e.value for e in at.exception]
+    counts = dict(api_client.log.counts())
+    waiting = LATENCY * sum(counts.values())
+    if CHECK_TIMING:
+        assert elapsed <= waiting + RENDER_BUDGET, f'Render took {elapsed:.2f}s, {waiting:.2f}s waiting on the API'
+    return counts
+
+
+def latest_analyses(api_client, n):
+    '''The `n` analyses listed first on the dashboard and comparison pages.
+    '''
+    analyses = sorted(api_client.analyses.records.values(), key=lambda a: a['id'], reverse=True)
+    return analyses[:n]
+
+
+def test_analyses_page(api_client, ui_config):
+    at = page_app('pages/analyses.py', api_client, ui_config)
+
+    assert timed_run(at, api_client) == {'GET portfolios/': 1, 'GET models/': 1, 'GET analyses/': 1}
+    # Portfolio and model lists are reused by reruns within `LIST_TTL`
+    assert timed_run(at, api_client) == {'GET analyses/': 1}
+
+
+def test_scenarios_page(api_client, ui_config):
+    at = page_app('pages/scenarios.py', api_client, ui_config)
+
+    # Model names need the settings of each model, cached for later reruns
+    assert timed_run(at, api_client) == {
+        'GET portfolios/': 1,
+        'GET models/': 1,
+        'GET models/{id}/settings/': 2,
+        'GET analyses/': 2,
+    }
+    assert timed_run(at, api_client) == {'GET analyses/': 2}
+
+
+def test_dashboard_page(api_client, ui_config):
+    at = page_app('pages/dashboard.py', api_client, ui_config)
+    assert timed_run(at, api_client) == {'GET analyses/?search': 1}
+
+    # The analysis is got to check access to the shared files and before each download
+    at.selectbox[0].set_value(latest_analyses(api_client, 1)[0])
+    assert timed_run(at, api_client) == {
+        'GET analyses/?search': 1,
+        'GET analyses/{id}/': 3,
+        'GET analyses/{id}/input_file/': 1,
+        'GET analyses/{id}/output_file/': 1,
+        'GET analyses/{id}/settings/': 1,
+    }
+
+    # Full outputs reuse the cached artifacts
+    at.toggle[0].set_value(True)
+    assert timed_run(at, api_client) == {'GET analyses/?search': 1, 'GET analyses/{id}/settings/': 1}
+
+
+def test_comparison_page(api_client, ui_config):
+    at = page_app('pages/comparison.py', api_client, ui_config)
+    assert timed_run(at, api_client) == {'GET analyses/?search': 1}
+
+    at.multiselect[0].set_value(latest_analyses(api_client, 2))
+    assert timed_run(at, api_client) == {
+        'GET analyses/?search': 1,
+        'GET analyses/{id}/settings/': 2,
+        'GET analyses/{id}/': 6,
+        'GET analyses/{id}/input_file/': 2,
+        'GET analyses/{id}/output_file/': 2,
+    }
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+
+import pandas as pd
+import requests
+
+from modules import profiling
+from modules.profiling import (_count_response, profiled, span, submit_in_context,
+                               summarise_records, track_transfers)
+
+
+class FakeEndpoint:
+    endpoint_name = 'analyses'
+
+    def __init__(self, session):
+        self.session = session
+
+    @profiled('{self.endpoint_name}.get')
+    def get(self, ID, df=False):
+        response = requests.Response()
+        response.headers['Content-Length'] = '120'
+        for hook in self.session.hooks['response']:
+            hook(response)
+        return pd.DataFrame({'id': [ID] * 3})
+
+
+def test_profiled(monkeypatch):
+    records = []
+    monkeypatch.setattr(profiling, '_record', records.append)
+    session = requests.Session()
+    track_transfers(session)
+    track_transfers(session)
+    endpoint = FakeEndpoint(session)
+
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: False)
+    assert len(endpoint.get(1)) == 3
+    assert records == []
+
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: True)
+    endpoint.get(2, df=True)
+    with span('block') as s:
+        s.result = 'not a dataframe'
+
+    assert [r['name'] for r in records] == ['analyses.get', 'block']
+    assert records[0]['detail'] == '2, df=True'
+    assert records[0]['received'] == 120
+    assert records[0]['rows'] == 3
+    assert records[1]['rows'] is None
+
+    summary = summarise_records(records)
+    assert summary['calls'].tolist() == [1, 1]
+
+
+def test_chunked_response_counted_when_read(monkeypatch):
+    records = []
+    monkeypatch.setattr(profiling, '_record', records.append)
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: True)
+
+    response = requests.Response()
+    response.raw = io.BytesIO(b'x' * 1000)
+    with span('download'):
+        _count_response(response)
+        assert not response._content_consumed
+        assert len(response.content) == 1000
+    assert records[0]['received'] == 1000
+
+
+def test_submit_in_context(monkeypatch):
+    records = []
+    monkeypatch.setattr(profiling, '_record', records.append)
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: True)
+
+    def download():
+        response = requests.Response()
+        response.headers['Content-Length'] = '50'
+        _count_response(response)
+
+    with span('compare'):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [submit_in_context(executor, download) for _ in range(4)]
+            [f.result() for f in futures]
+            executor.submit(download).result()
+    assert records[0]['received'] == 200
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import time
+
+from requests import ConnectionError, HTTPError
+
+from scripts.prune_analysis import (RateLimiter, cached_artifacts, delete_analyses, file_size,
+                                    storage_report)
+
+
+class FakeApi:
+    timeout = 1
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+
+    def head(self, url, allow_redirects=True, timeout=None):
+        size = self.sizes[url]
+        if isinstance(size, Exception):
+            raise size
+        return SimpleNamespace(headers={'Content-Length': str(size)}, raise_for_status=lambda: None)
+
+
+class FakeAnalyses:
+    def __init__(self, fail=()):
+        self.fail = fail
+        self.deleted = []
+
+    def delete(self, ID):
+        if ID in self.fail:
+            raise HTTPError(f'500 Server Error: analyses/{ID}/')
+        self.deleted.append(ID)
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - start >= 4 / 50
+
+    unlimited = RateLimiter(0)
+    start = time.monotonic()
+    for _ in range(100):
+        unlimited.wait()
+    assert time.monotonic() - start < 0.5
+
+
+def test_file_size_connection_error():
+    api = FakeApi({'a': 10, 'b': ConnectionError('refused')})
+    client = SimpleNamespace(api=api)
+    assert file_size(client, 'a', RateLimiter(0)) == 10
+    assert file_size(client, 'b', RateLimiter(0)) == 0
+
+
+def test_dry_run_report(tmp_path, capsys):
+    (tmp_path / 'analysis_1_output_file_a.tar.gz').write_bytes(b'x' * 2048)
+    (tmp_path / 'analysis_1_summary_a.json').write_bytes(b'x' * 1024)
+    (tmp_path / 'analysis_12_output_file_a.tar.gz').write_bytes(b'x')
+    cache_files = cached_artifacts(tmp_path, [1])
+    assert sorted(p.name for p in cache_files) == ['analysis_1_output_file_a.tar.gz',
+                                                   'analysis_1_summary_a.json']
+
+    analyses = [
+        {'id': 1, 'name': 'a', 'input_file': 'http://x/1/input', 'output_file': 'http://x/1/output'},
+        {'id': 2, 'name': 'b', 'input_file': 'http://x/2/input', 'output_file': None},
+    ]
+    api = FakeApi({'http://x/1/input': 1024, 'http://x/1/output': ConnectionError('reset'),
+                   'http://x/2/input': 2048})
+    client = SimpleNamespace(api=api, analyses=FakeAnalyses())
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        storage_report(client, analyses, cache_files, executor, RateLimiter(0))
+
+    out = capsys.readouterr().out
+    assert '1 : a : 1.0 KB' in out
+    assert 'Server storage to free: 3.0 KB across 2 analyses.' in out
+    assert 'Local cache to free: 3.0 KB across 2 files.' in out
+    assert client.analyses.deleted == []
+
+
+def test_delete_analyses():
+    client = SimpleNamespace(analyses=FakeAnalyses(fail={2}))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        deleted = delete_analyses(client, [1, 2, 3], executor, RateLimiter(0))
+    assert deleted == [1, 3]
+    assert sorted(client.analyses.deleted) == [1, 3]
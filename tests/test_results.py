@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+from requests import HTTPError
+
+import modules.results
+from modules.artifacts import AnalysisArtifact
+from modules.memory import MemoryGovernor, deep_size
+from modules.results import ResultStore, freeze_dataframe, frozen_view, get_result_store
+from tests.mocks import make_tar
+
+
+def test_freeze_dataframe_shares_read_only_columns():
+    df = pd.DataFrame({'x': np.arange(5), 'y': np.linspace(0, 1, 5), 'z': list('abcde')})
+    frozen = freeze_dataframe(df)
+
+    pd.testing.assert_frame_equal(frozen, df)
+    assert np.shares_memory(frozen['x'].to_numpy(), df['x'].to_numpy())
+    with pytest.raises(ValueError):
+        frozen.iloc[0, 0] = 10
+    with pytest.raises(ValueError):
+        frozen.loc[0, 'z'] = 'changed'
+    assert deep_size(frozen) >= deep_size(df['z'])
+
+    view = frozen.copy(deep=False)
+    view['x'] = view['x'] * 2
+    view['w'] = 1
+    assert frozen['x'].tolist() == list(range(5))
+    assert 'w' not in frozen
+
+
+def test_result_store_builds_once(monkeypatch):
+    governor = MemoryGovernor(budget=10 ** 9)
+    monkeypatch.setattr(modules.results, 'get_memory_governor', lambda: governor)
+    store = ResultStore(AnalysisArtifact(b''))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({'loss': [1.0, 2.0]})
+
+    first = store.get(('a.csv',), build)
+    second = store.get(('a.csv',), build)
+    assert len(calls) == 1
+    assert first is not second
+    assert np.shares_memory(first['loss'].to_numpy(), second['loss'].to_numpy())
+
+    first['loss'] = 0.0
+    assert store.get(('a.csv',), build)['loss'].tolist() == [1.0, 2.0]
+
+
+def test_frozen_view_copies_extension_columns():
+    frozen = freeze_dataframe(pd.DataFrame({'c': pd.Categorical(['a', 'b']),
+                                            'n': pd.array([1, 2], dtype='Int64'),
+                                            'x': [1.0, 2.0]}))
+    view = frozen_view(frozen)
+    view.loc[0, 'c'] = 'b'
+    view.loc[0, 'n'] = 5
+    assert frozen['c'].tolist() == ['a', 'b']
+    assert frozen['n'].tolist() == [1, 2]
+    assert np.shares_memory(view['x'].to_numpy(), frozen['x'].to_numpy())
+
+
+def test_result_store_builds_again_after_eviction(monkeypatch):
+    governor = MemoryGovernor(budget=1)
+    monkeypatch.setattr(modules.results, 'get_memory_governor', lambda: governor)
+    store = ResultStore(AnalysisArtifact(b''))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({'loss': np.arange(100.0)})
+
+    store.get(('a.csv',), build)
+    store.get(('b.csv',), build)
+    assert len(store) == 1
+    store.get(('a.csv',), build)
+    assert len(calls) == 3
+
+    token = store._token
+    del store
+    assert all(key[0] != token for key in governor._entries)
+
+
+def test_get_result_store_shared():
+    class FakeAnalyses:
+        def __init__(self, accessible=True):
+            self.accessible = accessible
+            self.calls = 0
+
+        def get(self, ID):
+            if not self.accessible:
+                raise HTTPError(f'403 Forbidden: analyses/{ID}/')
+            return {'id': ID}
+
+        def get_artifact(self, ID, filename):
+            self.calls += 1
+            return AnalysisArtifact(make_tar({'a.csv': b'x\n1\n'}))
+
+    class FakeClientInterface:
+        def __init__(self, user_key, accessible=True):
+            self.user_key = user_key
+            self.analyses = FakeAnalyses(accessible)
+
+    ci = FakeClientInterface('user')
+    store = get_result_store(ci, 1, 'a')
+    assert store is not None
+    assert get_result_store(FakeClientInterface('other'), 1, 'a') is store
+    assert get_result_store(FakeClientInterface('denied', accessible=False), 1, 'a') is None
+    assert ci.analyses.calls == 1
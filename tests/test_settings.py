@@ -0,0 +1,73 @@
+import json
+import time
+import pytest
+
+from modules.settings import SettingsRegistry, get_analyses_settings, thaw
+
+SETTINGS = {'gul_output': True, 'gul_summaries': [{'id': 1, 'eltcalc': True}]}
+
+
+def write_settings(path, settings=SETTINGS):
+    path.write_text(json.dumps(settings))
+
+
+def test_settings_registry(tmp_path):
+    write_settings(tmp_path / '1_PiWind_OasisLMF-analysis_settings.json')
+    write_settings(tmp_path / '2_philippines-taiwan-defended_jba-analysis_settings.json')
+    write_settings(tmp_path / '3_broken_jba-analysis_settings.json', {'gul_output': True})
+    (tmp_path / '4_invalid_jba-analysis_settings.json').write_text('{')
+    (tmp_path / 'notes.txt').write_text('')
+
+    registry = SettingsRegistry(tmp_path, watch=False)
+
+    assert len(registry.find()) == 2
+    assert registry.get(model_name_id='piwind').model_id == '1'
+    assert registry.get('2', 'Philippines Taiwan Defended', 'JBA').supplier_id == 'jba'
+    assert [e.model_id for e in registry.find(supplier_id='jba')] == ['2']
+    assert registry.get(model_name_id='broken') is None
+    assert registry.find(model_id='5') == ()
+
+    default = registry.get(model_name_id='piwind')
+    with pytest.raises(TypeError):
+        default.settings['gul_output'] = False
+
+    settings = thaw(default.settings)
+    assert settings == SETTINGS
+    settings['gul_summaries'][0]['oed_fields'] = ['PortNumber']
+    assert 'oed_fields' not in default.settings['gul_summaries'][0]
+
+    write_settings(tmp_path / '5_new_jba-analysis_settings.json')
+    assert registry.get(model_name_id='new') is None
+    registry.mark_stale()
+    assert registry.get(model_name_id='new').model_id == '5'
+
+
+def test_get_analyses_settings():
+    assert get_analyses_settings(model_name_id='PiWind') == ['defaults/1_piwind_oasislmf-analysis_settings.json']
+    assert len(get_analyses_settings(supplier_id='jba')) > 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_settings_registry_watch(tmp_path, monkeypatch):
+    pytest.importorskip('watchdog')
+    write_settings(tmp_path / '1_PiWind_OasisLMF-analysis_settings.json')
+    registry = SettingsRegistry(tmp_path)
+    loads = []
+    load = registry.load
+    monkeypatch.setattr(registry, 'load', lambda: (loads.append(1), load()))
+
+    # Reading the files during a load does not mark the registry stale
+    for _ in range(5):
+        assert registry.get(model_name_id='piwind') is not None
+        time.sleep(0.1)
+    assert len(loads) == 1
+
+    write_settings(tmp_path / '5_new_jba-analysis_settings.json')
+    assert wait_for(lambda: registry.get(model_name_id='new') is not None)
+    assert len(loads) >= 2
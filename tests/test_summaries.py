@@ -0,0 +1,76 @@
+import pandas as pd
+
+from modules.artifacts import AnalysisArtifact, artifact_cache_path, get_analysis_artifact
+from modules.summaries import ResultsSummary, get_results_summary
+from tests.mocks import make_tar
+
+
+def test_results_summary():
+    inputs = AnalysisArtifact(make_tar({
+        'location.csv': b'LocNumber,BuildingTIV\nA,100\nB,50\n'
+    }))
+    outputs = AnalysisArtifact(make_tar({
+        'gul_S1_aalcalc.csv': b'summary_id,type,mean\n1,1,5\n2,1,1\n1,2,6\n',
+        'gul_S1_eltcalc.csv': (b'summary_id,type,event_id,mean\n'
+                               b'1,2,10,3\n2,2,10,1\n1,2,11,7\n1,1,12,100\n'),
+        'gul_S1_summary-info.csv': b'summary_id,LocNumber\n1,A\n2,B\n',
+        'gul_S1_pltcalc.csv': b'unused\n1\n',
+    }))
+
+    summary = ResultsSummary.from_artifacts(inputs, outputs, top_n=1)
+
+    assert summary.exposure['TotalTIV'].iloc[0] == 150
+    assert summary.perspectives == ['gul']
+    pd.testing.assert_frame_equal(summary.aal['gul'],
+                                  pd.DataFrame({'type': ['Analytical', 'Sample'], 'mean': [6, 6]}))
+    assert summary.top_events['gul'].to_dict('list') == {'event_id': [11], 'mean': [7]}
+    assert summary.breakdowns['gul']['LocNumber'].to_dict('list') == {'LocNumber': ['A', 'B'],
+                                                                      'mean': [10, 1]}
+    assert 'gul_S1_pltcalc.csv' not in outputs._dataframes
+
+    restored = ResultsSummary.from_json(summary.to_json())
+    pd.testing.assert_frame_equal(restored.exposure, summary.exposure)
+    pd.testing.assert_frame_equal(restored.aal['gul'], summary.aal['gul'])
+    pd.testing.assert_frame_equal(restored.top_events['gul'], summary.top_events['gul'])
+    pd.testing.assert_frame_equal(restored.breakdowns['gul']['LocNumber'],
+                                  summary.breakdowns['gul']['LocNumber'])
+
+
+def test_results_summary_persisted(tmp_path, monkeypatch):
+    class FakeAnalyses:
+        def __init__(self):
+            self.calls = []
+
+        def get(self, ID):
+            return {'id': ID}
+
+        def get_artifact(self, ID, filename):
+            self.calls.append(filename)
+            if filename == 'input_file':
+                return AnalysisArtifact(make_tar({'location.csv': b'LocNumber,BuildingTIV\nA,100\n'}))
+            return AnalysisArtifact(make_tar({'gul_S1_aalcalc.csv': b'summary_id,type,mean\n1,1,5\n'}))
+
+    class FakeClientInterface:
+        analyses = FakeAnalyses()
+        user_key = 'user'
+
+    monkeypatch.setenv('OASIS_UI_CACHE_DIR', str(tmp_path))
+    ci = FakeClientInterface()
+    summary = get_results_summary(ci, 1, 'a')
+    assert artifact_cache_path(tmp_path, 1, 'summary', 'a', suffix='.json').is_file()
+
+    # A restart loses the in memory caches and persisted artifacts
+    get_results_summary.clear()
+    get_analysis_artifact.clear()
+    for path in tmp_path.glob('*.tar.gz'):
+        path.unlink()
+
+    restored = get_results_summary(ci, 1, 'a')
+    assert restored is not summary
+    pd.testing.assert_frame_equal(restored.aal['gul'], summary.aal['gul'])
+    assert sorted(ci.analyses.calls) == ['input_file', 'output_file']
+
+    # Files of another format are built again rather than breaking the page
+    path = artifact_cache_path(tmp_path, 1, 'summary', 'b', suffix='.json')
+    path.write_text('{"format": 0}')
+    assert get_results_summary(ci, 1, 'b').aal.keys() == {'gul'}
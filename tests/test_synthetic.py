@@ -0,0 +1,30 @@
+from modules.artifacts import AnalysisArtifact
+from modules.summaries import ResultsSummary
+from modules.visualisation import OutputInterface
+from scripts.generate_synthetic_data import generate, write_tar
+
+
+def test_generate_synthetic_data(tmp_path):
+    inputs, outputs, settings = generate(500, 2000, n_events=20, seed=1)
+
+    locations = inputs['location.csv']
+    assert len(locations) == 500
+    assert locations['LocNumber'].is_unique
+    assert set(inputs['account.csv']['AccNumber']) == set(locations['AccNumber'])
+
+    elt = outputs['gul_S1_eltcalc.csv']
+    assert len(elt) == 2 * 2000
+    assert not elt.duplicated(['summary_id', 'type', 'event_id']).any()
+    assert len(outputs['gul_S1_melt.csv']) == 2000
+
+    write_tar(tmp_path / 'output_file.tar.gz', outputs, prefix='output/')
+    artifact = AnalysisArtifact((tmp_path / 'output_file.tar.gz').read_bytes())
+    assert set(artifact.dataframe_names()) == set(outputs)
+
+    output = OutputInterface(artifact.frames())
+    output.set_oed_fields('gul', settings['gul_summaries'][0]['oed_fields'])
+    result = output.get(1, 'gul', 'eltcalc')
+    assert {'LocNumber', 'CountryCode'} <= set(result.columns)
+
+    summary = ResultsSummary(locations, artifact.dataframe)
+    assert set(summary.breakdowns['gul']['CountryCode']['CountryCode']) <= set(locations['CountryCode'])
@@ -0,0 +1,36 @@
+from modules.artifacts import AnalysisArtifact, get_analysis_artifact
+from modules.warmer import CacheWarmer
+from tests.mocks import make_tar
+
+
+class FakeAnalyses:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, ID):
+        return {'id': ID}
+
+    def get_artifact(self, ID, filename):
+        self.calls.append((ID, filename))
+        return AnalysisArtifact(make_tar({'location.csv': b'LocNumber\n1\n'}))
+
+
+class FakeClientInterface:
+    def __init__(self):
+        self.analyses = FakeAnalyses()
+        self.user_key = 'user'
+
+
+def test_cache_warmer():
+    ci = FakeClientInterface()
+    warmer = CacheWarmer(max_workers=1)
+    analysis = {'id': 1, 'modified': 'a', 'status': 'RUN_COMPLETED'}
+
+    assert warmer.warm(ci, {**analysis, 'status': 'RUN_STARTED'}) is None
+    warmer.warm(ci, analysis).result()
+    assert warmer.warm(ci, analysis) is None
+    assert sorted(ci.analyses.calls) == [(1, 'input_file'), (1, 'output_file')]
+
+    artifact = get_analysis_artifact(ci, 1, 'output_file', 'a')
+    assert artifact._dataframes.keys() == {'location.csv'}
+    assert len(ci.analyses.calls) == 2